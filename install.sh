@@ -281,8 +281,8 @@ install_tools() {
     fi
     
     # Install main scripts
-    $install_cmd cp bin/code2pdf bin/code2txt "$INSTALL_DIR/"
-    $install_cmd chmod +x "$INSTALL_DIR/code2pdf" "$INSTALL_DIR/code2txt"
+    $install_cmd cp bin/code2pdf bin/code2txt bin/code2export "$INSTALL_DIR/"
+    $install_cmd chmod +x "$INSTALL_DIR/code2pdf" "$INSTALL_DIR/code2txt" "$INSTALL_DIR/code2export"
     
     # Create scripts directory and install processing scripts
     local scripts_install_dir
@@ -298,6 +298,7 @@ install_tools() {
         
         # Update code2txt to use the correct scripts directory  
         sudo sed -i "s|SCRIPTS_DIR=\"\$INSTALL_DIR/scripts\"|SCRIPTS_DIR=\"$scripts_install_dir/scripts\"|g" "$INSTALL_DIR/code2txt"
+        sudo sed -i "s|SCRIPTS_DIR=\"\$INSTALL_DIR/scripts\"|SCRIPTS_DIR=\"$scripts_install_dir/scripts\"|g" "$INSTALL_DIR/code2export"
     else
         scripts_install_dir="$HOME/.local/share/code2pdf"
         mkdir -p "$scripts_install_dir"
@@ -310,6 +311,7 @@ install_tools() {
         
         # Update code2txt to use the correct scripts directory
         sed -i "s|SCRIPTS_DIR=\"\$INSTALL_DIR/scripts\"|SCRIPTS_DIR=\"$scripts_install_dir/scripts\"|g" "$INSTALL_DIR/code2txt"
+        sed -i "s|SCRIPTS_DIR=\"\$INSTALL_DIR/scripts\"|SCRIPTS_DIR=\"$scripts_install_dir/scripts\"|g" "$INSTALL_DIR/code2export"
     fi
     
     print_success "Tools installed successfully!"
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Read source files straight from tar and zip archives.
+
+code2txt and code2pdf -a accept a source snapshot (.tar, .tar.gz/.tgz,
+.tar.bz2/.tbz2, .tar.xz/.txz or .zip) in place of a directory. Members are
+listed and read from the archive itself; nothing is extracted to disk:
+
+    python3 archive_source.py list ARCHIVE    # one member path per line
+
+Member paths are relative. A single top-level directory shared by all
+members (as in GitHub and `git archive --prefix` snapshots) is removed, so
+paths read as they would under the extracted tree. Like the directory
+walks, hidden entries are left out, as are links and other special members.
+
+Zip members are read on demand. A compressed tar can only be read front to
+back, so ArchiveSource reads it as a stream: asking for a member that lies
+ahead advances the stream, and the members passed over on the way that were
+announced with expect() are kept until they are asked for. Callers ask in
+sorted order, which is also how `git archive` stores members, so normally
+nothing is kept; asking for a member already passed starts a new pass.
+
+Given a `select` rule and a `sample_size`, the listing pass keeps only the
+selected members and takes the first sample_size bytes of each on the way,
+so the binary and generated-file checks read no further, and the bodies
+follow in one more forward pass. Members no larger than their sample are
+not read again.
+"""
+
+import posixpath
+import sys
+import tarfile
+import threading
+import zipfile
+
+# Names recognized as archives by both CLIs
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz", ".zip")
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _clean_name(name):
+    """Normalize a member name; None for names that leave the archive root."""
+    name = posixpath.normpath(name.lstrip("/"))
+    if name in (".", "") or name.startswith("../") or name == "..":
+        return None
+    return name
+
+
+def _common_prefix(names):
+    """The top-level directory shared by all names ("dir/"), or ""."""
+    tops = {name.split("/", 1)[0] for name in names}
+    if len(tops) == 1 and all("/" in name for name in names):
+        return f"{tops.pop()}/"
+    return ""
+
+
+class ArchiveSource:
+    """Lists the regular files of a tar or zip archive and reads them without extracting."""
+
+    def __init__(self, path, select=None, sample_size=0):
+        """
+        List the members of the archive at path, keeping those that pass `select` (a path predicate).
+
+        With a sample_size, the first sample_size bytes of every kept tar
+        member are read in the same pass.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._expected = set()
+        self._pending = {}
+        self._tar = None
+        self._position = 0
+        samples = {}
+        if zipfile.is_zipfile(path):
+            self._zip = zipfile.ZipFile(path)
+            entries = [(_clean_name(info.filename), info.file_size, info)
+                       for info in self._zip.infolist() if not info.is_dir()]
+        else:
+            self._zip = None
+            # For tars, the position of the member in the stream
+            entries = []
+            with tarfile.open(path, "r|*") as tar:
+                for number, member in enumerate(tar):
+                    if not member.isfile():
+                        continue
+                    name = _clean_name(member.name)
+                    entries.append((name, member.size, number))
+                    # The shared top directory is only known at the end, so
+                    # both readings of the name are tried
+                    if sample_size and name is not None and (
+                            select is None or select(name) or select(name.partition("/")[2])):
+                        with tar.extractfile(member) as f:
+                            samples[number] = f.read(sample_size)
+
+        cleaned = [entry for entry in entries if entry[0] is not None]
+        prefix = _common_prefix([name for name, _, _ in cleaned])
+        self._members = {}
+        self._samples = {}
+        for name, size, info in cleaned:
+            name = name[len(prefix):]
+            if any(part.startswith(".") for part in name.split("/")):
+                continue
+            if select is None or select(name):
+                self._members[name] = (size, info)
+                if info in samples:
+                    self._samples[name] = samples[info]
+        self._at_position = {info: name for name, (_, info) in self._members.items()
+                             if self._zip is None}
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
+
+    def names(self):
+        """Sorted member paths."""
+        return sorted(self._members)
+
+    def size(self, name):
+        return self._members[name][0]
+
+    def expect(self, names):
+        """Announce the members that will be read next; passed-over ones are kept for them."""
+        with self._lock:
+            self._expected = set(names)
+            self._pending.clear()
+
+    def read(self, name, limit=None):
+        """Return the contents of a member as bytes, or only its first `limit` bytes."""
+        if name not in self._members:
+            raise KeyError(f"'{name}' is not in {self.path}")
+        with self._lock:
+            sample = self._samples.get(name)
+            if sample is not None:
+                complete = self._holds_body(name)
+                if complete or (limit is not None and limit <= len(sample)):
+                    # A sample is only used once, unless it holds the whole body
+                    if limit is None or not complete:
+                        del self._samples[name]
+                    return sample if limit is None else sample[:limit]
+            if self._zip is not None:
+                with self._zip.open(self._members[name][1]) as f:
+                    return f.read(limit) if limit is not None else f.read()
+            if (name, limit) in self._pending:
+                return self._pending.pop((name, limit))
+            if self._tar is None or self._members[name][1] < self._position:
+                self._rewind()
+            while True:
+                member = self._tar.next()
+                if member is None:
+                    raise KeyError(f"'{name}' is not in {self.path}")
+                member_name = self._at_position.get(self._position)
+                self._position += 1
+                if member_name == name:
+                    return self._read_member(member, limit)
+                if member_name in self._expected and not self._holds_body(member_name):
+                    self._pending[member_name, limit] = self._read_member(member, limit)
+
+    def _holds_body(self, name):
+        return name in self._samples and len(self._samples[name]) >= self._members[name][0]
+
+    def _rewind(self):
+        if self._tar is not None:
+            self._tar.close()
+        self._tar = tarfile.open(self.path, "r|*")
+        self._position = 0
+
+    def _read_member(self, member, limit):
+        with self._tar.extractfile(member) as f:
+            return f.read(limit) if limit is not None else f.read()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "list":
+        print("Usage: archive_source.py list ARCHIVE", file=sys.stderr)
+        sys.exit(1)
+    try:
+        source = ArchiveSource(sys.argv[2])
+    except (OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+        print(f"Error: Could not read archive '{sys.argv[2]}': {e}", file=sys.stderr)
+        sys.exit(1)
+    for name in source.names():
+        print(name)
+    source.close()
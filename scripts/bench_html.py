@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare the stock and compact HTML formatters on real files.
+
+For each variant, reports the spans in the highlighted HTML and the time
+to format it; when WeasyPrint can be imported, also the number of layout
+boxes and the time to lay the document out (generate_html + render):
+
+    python scripts/bench_html.py src/*.py
+"""
+
+import argparse
+import sys
+import time
+
+from pygments import format as format_tokens
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_for_filename, TextLexer
+from compact_html import CompactHtmlFormatter
+from source_reader import read_source, close_source, decode_source
+
+VARIANTS = (("pygments", HtmlFormatter), ("compact", CompactHtmlFormatter))
+
+
+def count_boxes(document):
+    """Number of layout boxes on all pages of a rendered WeasyPrint document."""
+    return sum(1 for page in document.pages for _ in page._page_box.descendants())
+
+
+def measure(files, layout):
+    """Return {variant: totals} over files; layout is (generate_html, render_document) or None."""
+    results = {name: {"spans": 0, "format_seconds": 0.0, "boxes": 0, "layout_seconds": 0.0}
+               for name, _ in VARIANTS}
+    for path in files:
+        data = read_source(path)
+        try:
+            content, _ = decode_source(data)
+        finally:
+            close_source(data)
+        if content is None:
+            continue
+        try:
+            lexer = get_lexer_for_filename(path)
+        except Exception:
+            lexer = TextLexer()
+        tokens = list(lexer.get_tokens(content))
+
+        for name, formatter_class in VARIANTS:
+            totals = results[name]
+            start = time.perf_counter()
+            html = format_tokens(tokens, formatter_class(style='default', linenos='inline',
+                                                         cssclass='highlight'))
+            totals["format_seconds"] += time.perf_counter() - start
+            totals["spans"] += html.count("<span")
+            if layout:
+                generate_html, render_document = layout
+                start = time.perf_counter()
+                stats = {}
+                document = render_document(
+                    generate_html(path, content, path, stats=stats, compact=name == "compact"),
+                    stats['scripts'])
+                totals["layout_seconds"] += time.perf_counter() - start
+                totals["boxes"] += count_boxes(document)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the stock and compact HTML formatters.")
+    parser.add_argument("files", nargs="+", help="Source files to format")
+    parser.add_argument("--no-layout", action="store_true", help="Only format, do not run WeasyPrint")
+    args = parser.parse_args()
+
+    layout = None
+    if not args.no_layout:
+        try:
+            from code_to_pdf import generate_html, render_document
+            layout = (generate_html, render_document)
+        except (ImportError, OSError) as e:
+            print(f"Warning: WeasyPrint unavailable ({e}); reporting HTML only", file=sys.stderr)
+
+    results = measure(args.files, layout)
+    print(f"{'Formatter':<10}{'Spans':>10}{'Format':>10}" + (f"{'Boxes':>10}{'Layout':>10}" if layout else ""))
+    for name, totals in results.items():
+        row = f"{name:<10}{totals['spans']:>10}{totals['format_seconds']:>9.2f}s"
+        if layout:
+            row += f"{totals['boxes']:>10}{totals['layout_seconds']:>9.2f}s"
+        print(row)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Importable API for the scan, filter, combine and render stages.
+
+The bash CLIs discover files and hand them to write_combined.py and
+code_to_pdf.py; this module exposes the same stages as functions for
+services that render in-process:
+
+    from code2pdf_api import scan, filter_files, combine_text, render_pdf, export
+
+    files = filter_files(scan("src"))
+    text = combine_text(files, root="src")                 # bytes
+    render_pdf([("main.py", b"print(1)\\n")], out=response)  # any binary file-like object
+    export(files, root="src", txt=f, pdf=g, stats=stats)   # several outputs, one read per file
+
+Every stage takes an iterable of relative paths (resolved against `root`)
+or of (name, bytes) pairs, so content that is already in memory never
+touches the filesystem. Results are returned as bytes, or written to `out`
+when it is given. No subprocess is started, except Ghostscript to merge
+PDFs of more than MAX_BUFFERED_PAGES pages (see PdfBuilder), and the caches
+of code_to_pdf and font_stack (font configurations and stacks) stay warm
+between calls.
+
+The filter rules, code2txt's defaults and the language names come from
+source_rules.py, as for the CLIs. Rendering needs Pygments and WeasyPrint; the text stages only use
+the standard library.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+
+from write_combined import CountingWriter, write_toc, write_file_section, inspect_file
+from combined_index import count_lines
+from source_reader import read_source, close_source, decode_source, detect_encoding
+from generated_files import GeneratedFile, check
+from prefetch import map_ordered, prefetch_ordered, DEFAULT_JOBS, DEFAULT_MAX_BUFFERED
+from source_rules import DEFAULT_IGNORE_TYPES, DEFAULT_IGNORE_FOLDERS, language_for, selects_file
+
+DEFAULT_MAX_FILE_SIZE = 500 * 1024
+
+# Laid-out pages PdfBuilder keeps in memory before writing them to a part PDF
+MAX_BUFFERED_PAGES = 500
+
+
+def _name(item):
+    return item[0] if isinstance(item, tuple) else os.fspath(item)
+
+
+def scan(root=".", ignore_folders=DEFAULT_IGNORE_FOLDERS):
+    """
+    Return the sorted relative paths of the files under root.
+
+    Like the CLIs' directory walk, hidden entries are not listed, folders
+    named in ignore_folders are skipped and symbolic link cycles are followed
+    only once.
+    """
+    root = os.path.abspath(root)
+    visited = set()
+    paths = []
+
+    def walk(directory):
+        real_path = os.path.realpath(directory)
+        if real_path in visited:
+            return
+        visited.add(real_path)
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_file():
+                    paths.append(os.path.relpath(entry.path, root))
+                elif entry.is_dir() and entry.name not in ignore_folders:
+                    walk(entry.path)
+
+    walk(root)
+    return sorted(paths)
+
+
+def filter_files(files, ignore_types=DEFAULT_IGNORE_TYPES, ignore_files=(), include_types=None):
+    """
+    Keep the paths or (name, bytes) pairs whose names pass the type and name filters.
+
+    include_types, if given, overrides ignore_types (see source_rules.selects_file).
+    Size and binary checks happen when the files are combined or rendered.
+    """
+    return [item for item in files
+            if selects_file(_name(item), ignore_types, ignore_files, include_types)]
+
+
+def _inspect(root, item, max_file_size, generated):
+    """Return (size, encoding, reason, header) of a path or pair, like write_combined.inspect_file."""
+    if not isinstance(item, tuple):
+        return inspect_file(os.path.join(root, item), max_file_size, generated)
+    size = len(item[1])
+    if max_file_size is not None and size > max_file_size:
+        return size, None, None, None
+    encoding = detect_encoding(item[1])
+    return size, encoding, check(item[0], item[1], encoding, generated), None
+
+
+def _select(root, files, max_file_size, jobs, generated):
+    """Return (item, encoding, size) for the text files among files, in order."""
+    results = map_ordered(lambda item: _inspect(root, item, max_file_size, generated), files, jobs)
+    selected = []
+    for item, result in zip(files, results):
+        if isinstance(result, OSError):
+            # Unreadable files keep their place and report the error
+            selected.append((item, "utf-8", 0))
+        elif result[1] is None:
+            continue
+        elif result[2] is None:
+            selected.append((item, result[1], result[0]))
+        elif generated == "stub":
+            selected.append((item, GeneratedFile(result[2]), 0))
+    return selected
+
+
+def _load(root, item, encoding):
+    """Read a path or pair once and return (text, UTF-8 bytes, encoding actually used)."""
+    if isinstance(encoding, GeneratedFile):
+        return encoding
+    data = item[1] if isinstance(item, tuple) else read_source(os.path.join(root, item))
+    try:
+        text, encoding = decode_source(data, encoding)
+        if encoding == "utf-8":
+            return text, bytes(data), encoding
+        return text, text.encode("utf-8"), encoding
+    finally:
+        if not isinstance(item, tuple):
+            close_source(data)
+
+
+def _body(root, item, encoding):
+    """Return (UTF-8 bytes, encoding actually used) for a path or pair."""
+    loaded = _load(root, item, encoding)
+    return loaded if isinstance(loaded, GeneratedFile) else loaded[1:]
+
+
+def combine_text(files, out=None, root=".", no_toc=False, max_file_size=DEFAULT_MAX_FILE_SIZE,
+                 jobs=DEFAULT_JOBS, max_buffered=DEFAULT_MAX_BUFFERED, generated="skip"):
+    """
+    Combine paths or (name, bytes) pairs into the code2txt document.
+
+    Files are written in the given order (scan returns them sorted), with the
+    same sections code2txt writes. Binary files and files over max_file_size
+    are left out; generated files are skipped, written as stubs or kept
+    (generated="skip", "stub" or "keep"). Returns the document as bytes, or
+    writes it to the binary file-like `out` and returns None.
+    """
+    selected = _select(root, list(files), max_file_size, jobs, generated)
+    buffer = io.BytesIO() if out is None else out
+    writer = CountingWriter(buffer)
+    if not no_toc:
+        write_toc(writer, [(_name(item),) for item, _, _ in selected])
+    for (item, encoding, _), loaded in prefetch_ordered(
+            selected, lambda entry: _body(root, entry[0], entry[1]), jobs, max_buffered,
+            size_of=lambda entry: entry[2]):
+        name = _name(item)
+        write_file_section(writer, name, language_for(name), [], loaded)
+    return buffer.getvalue() if out is None else None
+
+
+class PdfBuilder:
+    """
+    Lays out files one at a time and writes them as one PDF, after a table of contents.
+
+    Each file gets the same pages as `code2pdf -a` (header with its name,
+    line numbers, highlighting budget). Used by render_pdf and export.
+
+    Laid-out documents are large, so at most about max_pages pages are kept
+    in memory: beyond that, the pages so far are written to a part PDF in a
+    temporary directory and released, and write() merges the parts with
+    Ghostscript, as code2pdf -a does. Smaller outputs are written directly.
+    """
+
+    def __init__(self, budget=None, toc=True, max_pages=MAX_BUFFERED_PAGES):
+        self.budget = budget
+        self.toc = toc
+        self.max_pages = max_pages
+        self.documents = []
+        self.names = []
+        self.parts = []
+        self._buffered_pages = 0
+        self._part_dir = None
+
+    def add(self, name, content, line_ranges=None, lexer=None):
+        """Lay out one file's text and return its number of pages."""
+        from code_to_pdf import generate_html, render_document
+
+        stats = {}
+        html = generate_html(name, content, name, line_ranges, self.budget, stats, lexer=lexer)
+        document = render_document(html, stats['scripts'])
+        self.documents.append(document)
+        self.names.append(name)
+        self._buffered_pages += len(document.pages)
+        if self._buffered_pages > self.max_pages:
+            self._write_part()
+        return len(document.pages)
+
+    def _write_part(self):
+        """Write the buffered documents to the next part PDF and release them."""
+        if self._part_dir is None:
+            self._part_dir = tempfile.TemporaryDirectory(prefix="code2pdf-")
+        path = os.path.join(self._part_dir.name, f"part-{len(self.parts):05d}.pdf")
+        pages = [page for document in self.documents for page in document.pages]
+        self.documents[0].copy(pages).write_pdf(path)
+        self.parts.append(path)
+        self.documents = []
+        self._buffered_pages = 0
+
+    def write(self, out=None):
+        """Return the PDF as bytes, or write it to the binary file-like `out` and return None."""
+        from code_to_pdf import generate_html, render_document
+
+        toc = None
+        if self.toc:
+            stats = {}
+            html = generate_html("table_of_contents", "".join(f"{name}\n" for name in self.names),
+                                 "Table of Contents", stats=stats)
+            toc = render_document(html, stats['scripts'])
+        try:
+            if not self.parts:
+                documents = ([toc] if toc is not None else []) + self.documents
+                if not documents:
+                    raise ValueError("No text files to render")
+                pages = [page for document in documents for page in document.pages]
+                pdf = documents[0].copy(pages).write_pdf(out)
+                return pdf if out is None else None
+
+            if self.documents:
+                self._write_part()
+            parts = list(self.parts)
+            if toc is not None:
+                parts.insert(0, os.path.join(self._part_dir.name, "contents.pdf"))
+                toc.write_pdf(parts[0])
+            merged = os.path.join(self._part_dir.name, "merged.pdf")
+            self._merge(parts, merged)
+            with open(merged, "rb") as f:
+                if out is None:
+                    return f.read()
+                shutil.copyfileobj(f, out)
+                return None
+        finally:
+            if self._part_dir is not None:
+                self._part_dir.cleanup()
+                self._part_dir = None
+                self.parts = []
+
+    def _merge(self, parts, output):
+        if not shutil.which("gs"):
+            raise OSError(f"Ghostscript (gs) is needed to merge PDFs of more than {self.max_pages} pages")
+        result = subprocess.run(
+            ["gs", "-q", "-dNOPAUSE", "-dBATCH", "-sDEVICE=pdfwrite", f"-sOutputFile={output}", *parts],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise OSError(f"PDF merge failed: {result.stderr.strip()}")
+
+
+def render_pdf(files, out=None, root=".", toc=True, line_ranges=None, budget=None, generated="skip"):
+    """
+    Render paths or (name, bytes) pairs into one PDF, in the given order.
+
+    Each file gets the same pages as `code2pdf -a`, preceded by a table of
+    contents unless toc is False (see PdfBuilder). line_ranges optionally
+    maps names to (start, end) ranges to render. Binary files are skipped,
+    and generated files handled as in combine_text. Returns the PDF as
+    bytes, or writes it to the binary file-like `out` and returns None.
+    """
+    line_ranges = line_ranges or {}
+    builder = PdfBuilder(budget, toc)
+    for item in files:
+        name = _name(item)
+        data = item[1] if isinstance(item, tuple) else read_source(os.path.join(root, item))
+        try:
+            content, encoding = decode_source(data)
+            reason = check(name, data, encoding, generated)
+        finally:
+            if not isinstance(item, tuple):
+                close_source(data)
+        if content is None or (reason is not None and generated == "skip"):
+            continue
+        ranges = line_ranges.get(name)
+        if reason is not None:
+            content, ranges = GeneratedFile(reason).stub_text(), None
+        builder.add(name, content, ranges)
+    return builder.write(out)
+
+
+def export(files, root=".", txt=None, pdf=None, index=None, stats=None, no_toc=False,
+           max_file_size=DEFAULT_MAX_FILE_SIZE, jobs=DEFAULT_JOBS, max_buffered=DEFAULT_MAX_BUFFERED,
+           generated="skip", budget=None):
+    """
+    Read each of the paths or (name, bytes) pairs once and feed it to several outputs.
+
+    `txt` and `pdf` are binary file-likes for the code2txt document and the
+    PDF, `index` an IndexWriter for the document and `stats` a RepoStats
+    (with rendered page counts when a PDF is written); any can be None.
+    Files are selected, and generated files handled, as in combine_text. The
+    language of a file is looked up once for the text fence and the
+    statistics, and its Pygments lexer once for the PDF. Returns the number
+    of files exported.
+    """
+    selected = _select(root, list(files), max_file_size, jobs, generated)
+    writer = CountingWriter(txt) if txt is not None else None
+    builder = PdfBuilder(budget, not no_toc) if pdf is not None else None
+    if builder is not None:
+        from code_to_pdf import lexer_for
+    if writer is not None and not no_toc:
+        write_toc(writer, [(_name(item),) for item, _, _ in selected])
+
+    for (item, encoding, _), loaded in prefetch_ordered(
+            selected, lambda entry: _load(root, entry[0], entry[1]), jobs, max_buffered,
+            size_of=lambda entry: entry[2]):
+        name = _name(item)
+        language = language_for(name)
+        if isinstance(loaded, (OSError, GeneratedFile)):
+            if writer is not None:
+                write_file_section(writer, name, language, [], loaded, index)
+            if builder is not None and isinstance(loaded, GeneratedFile):
+                builder.add(name, loaded.stub_text())
+            continue
+        text, body, encoding = loaded
+        if writer is not None:
+            write_file_section(writer, name, language, [], (body, encoding), index)
+        pages = builder.add(name, text, lexer=lexer_for(name)) if builder is not None else None
+        if stats is not None:
+            stats.add(name, language, len(body), count_lines(body), pages)
+
+    if builder is not None:
+        builder.write(pdf)
+    return len(selected)
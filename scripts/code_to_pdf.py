@@ -6,33 +6,167 @@ Uses Pygments for syntax highlighting and WeasyPrint for PDF generation.
 
 import sys
 import os
+import re
+import argparse
+import json
+import time
 from pathlib import Path
-from pygments import highlight
+from pygments import format as format_tokens
 from pygments.lexers import get_lexer_for_filename, TextLexer
 from pygments.formatters import HtmlFormatter
+from compact_html import CompactHtmlFormatter
 from weasyprint import HTML, CSS
 from weasyprint.text.fonts import FontConfiguration
+from source_reader import read_source, close_source, decode_source
+from git_changes import parse_ranges
+from font_stack import detect_scripts, resolve_font_stack, css_font_family
+from combined_index import count_lines
+from repo_stats import RepoStats
+from generated_files import GeneratedFile, check
+from archive_source import ArchiveSource
+from write_combined import parse_size
+from source_rules import language_for
 
 
-def generate_html(file_path, file_content, relative_path=None):
-    """Generate HTML with syntax highlighting for the given file."""
+# Exit status used when the input is skipped because it is not text
+EXIT_BINARY = 2
 
-    # Try to get appropriate lexer based on filename
+
+# Per-file highlighting budget. Files above the byte limit, or whose lexing
+# takes longer than the time limit, are rendered with TextLexer instead.
+# Override with CODE2PDF_HIGHLIGHT_MAX_BYTES (e.g. 512K) and
+# CODE2PDF_HIGHLIGHT_MAX_SECONDS.
+HIGHLIGHT_MAX_BYTES = 512 * 1024
+HIGHLIGHT_MAX_SECONDS = 5.0
+
+# Lexing is checked against the deadline every this many tokens
+BUDGET_CHECK_INTERVAL = 1024
+
+
+# FontConfiguration objects reused across documents, keyed by the scripts used
+_font_configs = {}
+
+
+class BinaryFileError(ValueError):
+    """Raised when a file is detected as binary rather than text."""
+
+
+class GeneratedFileError(ValueError):
+    """Raised when a file is skipped as generated or minified (see generated_files.py)."""
+
+
+class HighlightBudget:
+    """Byte and time limits for syntax highlighting a single file."""
+
+    def __init__(self, max_bytes=HIGHLIGHT_MAX_BYTES, max_seconds=HIGHLIGHT_MAX_SECONDS):
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            parse_size(os.environ.get('CODE2PDF_HIGHLIGHT_MAX_BYTES', HIGHLIGHT_MAX_BYTES)),
+            float(os.environ.get('CODE2PDF_HIGHLIGHT_MAX_SECONDS', HIGHLIGHT_MAX_SECONDS)),
+        )
+
+
+def highlight_with_budget(code, lexer, formatter, deadline, stats):
+    """
+    Highlight code, falling back to TextLexer once the deadline has passed.
+
+    Tokens are collected incrementally so a slow lexer is abandoned as soon as
+    the budget is exhausted instead of after it finishes. `stats` records the
+    lexing time and, when the fallback was taken, the reason.
+    """
+    tokens = None
+    if stats['fallback'] is None:
+        start = time.perf_counter()
+        tokens = []
+        for token in lexer.get_tokens(code):
+            tokens.append(token)
+            if len(tokens) % BUDGET_CHECK_INTERVAL == 0 and time.perf_counter() > deadline:
+                stats['fallback'] = f"lexing exceeded {stats['max_seconds']:g}s"
+                tokens = None
+                break
+        stats['lex_seconds'] += time.perf_counter() - start
+    if tokens is None:
+        tokens = TextLexer().get_tokens(code)
+    return format_tokens(tokens, formatter)
+
+
+def highlight_hunks(file_content, lexer, line_ranges, deadline, stats, formatter_class=CompactHtmlFormatter):
+    """Highlight only the given (start, end) line ranges, numbered as in the original file."""
+    # Only "\n" ends a line, as git counts them; splitlines() also splits at \f, \v, \x85...
+    lines = [line for line in re.split(r'(?<=\n)', file_content) if line]
+    parts = []
+    for start, end in line_ranges:
+        end = min(end, len(lines))
+        if start > end:
+            continue
+        formatter = formatter_class(
+            style='default',
+            full=False,
+            linenos='inline',
+            linenostart=start,
+            cssclass='highlight'
+        )
+        parts.append(f'<div class="hunk-header">Lines {start}-{end}</div>')
+        parts.append(highlight_with_budget(''.join(lines[start - 1:end]), lexer, formatter, deadline, stats))
+    return '\n'.join(parts)
+
+
+def lexer_for(file_path):
+    """The Pygments lexer for a file name, TextLexer if none matches."""
     try:
-        lexer = get_lexer_for_filename(file_path)
-    except:
+        return get_lexer_for_filename(file_path)
+    except Exception:
         # Fallback to plain text if language can't be detected
-        lexer = TextLexer()
+        return TextLexer()
+
+
+def generate_html(file_path, file_content, relative_path=None, line_ranges=None,
+                  budget=None, stats=None, compact=True, lexer=None):
+    """Generate HTML with syntax highlighting for the given file.
+
+    If line_ranges is given, only those (start, end) line ranges are rendered.
+    Highlighting is limited by `budget` (a HighlightBudget, default limits if
+    None); pass a dict as `stats` to receive the lexer name, lexing time and
+    the fallback reason, if any. compact=False uses Pygments' stock
+    HtmlFormatter instead of CompactHtmlFormatter (for comparisons). A
+    `lexer` already picked for the file is used instead of lexer_for().
+    """
 
-    # Generate syntax-highlighted HTML
-    formatter = HtmlFormatter(
+    # Try to get appropriate lexer based on filename
+    lexer = lexer or lexer_for(file_path)
+
+    # Generate syntax-highlighted HTML, with as few elements as possible for layout
+    formatter_class = CompactHtmlFormatter if compact else HtmlFormatter
+    formatter = formatter_class(
         style='default',
         full=False,
         linenos='inline',
         cssclass='highlight'
     )
 
-    highlighted_code = highlight(file_content, lexer, formatter)
+    budget = budget or HighlightBudget()
+    if stats is None:
+        stats = {}
+    stats.update({
+        'lexer': lexer.name,
+        'lex_seconds': 0.0,
+        'fallback': None,
+        'max_seconds': budget.max_seconds,
+    })
+    size = len(file_content.encode('utf-8'))
+    if size > budget.max_bytes and not isinstance(lexer, TextLexer):
+        stats['fallback'] = f"{size} bytes exceeds {budget.max_bytes}"
+    deadline = time.perf_counter() + budget.max_seconds
+
+    if line_ranges:
+        highlighted_code = highlight_hunks(file_content, lexer, line_ranges, deadline, stats,
+                                            formatter_class)
+    else:
+        highlighted_code = highlight_with_budget(file_content, lexer, formatter, deadline, stats)
 
     # Get CSS for syntax highlighting
     css = formatter.get_style_defs('.highlight')
@@ -40,6 +174,13 @@ def generate_html(file_path, file_content, relative_path=None):
     # Use relative path for display if provided, otherwise use full path
     display_path = relative_path if relative_path else file_path
 
+    # Name only the fonts needed for the scripts that actually appear
+    scripts = detect_scripts(file_content, display_path)
+    mono_families, sans_families = resolve_font_stack(scripts)
+    mono_font = css_font_family(mono_families, 'monospace')
+    sans_font = css_font_family(sans_families, 'sans-serif')
+    stats['scripts'] = scripts
+
     # Generate complete HTML document with UTF-8 support
     html = f"""<!DOCTYPE html>
 <html>
@@ -52,20 +193,20 @@ def generate_html(file_path, file_content, relative_path=None):
             margin: 2cm;
             @top-center {{
                 content: "{display_path}";
-                font-family: "Noto Sans SC", "DejaVu Sans", sans-serif;
+                font-family: {sans_font};
                 font-size: 10pt;
                 color: #666;
             }}
             @bottom-right {{
                 content: "Page " counter(page) " of " counter(pages);
-                font-family: "Noto Sans SC", "DejaVu Sans", sans-serif;
+                font-family: {sans_font};
                 font-size: 10pt;
                 color: #666;
             }}
         }}
 
         body {{
-            font-family: "Noto Sans Mono CJK SC", "Noto Sans Mono", "DejaVu Sans Mono", "Courier New", monospace;
+            font-family: {mono_font};
             font-size: 9pt;
             line-height: 1.4;
             margin: 0;
@@ -81,7 +222,7 @@ def generate_html(file_path, file_content, relative_path=None):
 
         .highlight pre {{
             margin: 0;
-            font-family: "Noto Sans Mono CJK SC", "Noto Sans Mono", "DejaVu Sans Mono", "Courier New", monospace;
+            font-family: {mono_font};
             font-size: 9pt;
             line-height: 1.4;
             white-space: pre-wrap;
@@ -91,6 +232,12 @@ def generate_html(file_path, file_content, relative_path=None):
         /* Pygments syntax highlighting */
         {css}
 
+        .hunk-header {{
+            color: #666;
+            font-size: 8pt;
+            margin: 12px 0 2px 0;
+        }}
+
         /* Line numbers styling */
         .highlight .linenos {{
             color: #999;
@@ -110,55 +257,262 @@ def generate_html(file_path, file_content, relative_path=None):
     return html
 
 
-def convert_to_pdf(file_path, output_pdf, relative_path=None):
-    """Convert a source code file to PDF with syntax highlighting."""
+def render_document(html_content, scripts=()):
+    """Lay out generated HTML as a WeasyPrint document.
+
+    The font configuration is shared by all documents using the same scripts
+    (see generate_html stats), so fonts are only set up once per process.
+    """
+    if scripts not in _font_configs:
+        _font_configs[scripts] = FontConfiguration()
+    return HTML(string=html_content).render(font_config=_font_configs[scripts])
+
+
+def convert_to_pdf(file_path, output_pdf, relative_path=None, profile=None, line_ranges=None,
+                   budget=None, generated="keep", archive=None):
+    """Convert a source code file to PDF with syntax highlighting.
 
-    # Read the file with UTF-8 encoding
+    If line_ranges is given, only those (start, end) line ranges are rendered.
+    If an ArchiveSource is given, file_path names one of its members.
+    Generated and minified files raise GeneratedFileError with
+    generated="skip" and are rendered as a stub with "stub".
+    If a dict is passed as `profile`, it is filled with the detected encoding,
+    the file size, the lexer and highlighting fallback, and the time spent in
+    each stage.
+    """
+
+    # Read the file once as bytes and decode it with the encoding detected
+    # from its BOM and a bounded sample
+    start = time.perf_counter()
+    data = archive.read(file_path) if archive else read_source(file_path)
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except UnicodeDecodeError:
-        # Fallback to latin-1 if UTF-8 fails
-        with open(file_path, 'r', encoding='latin-1') as f:
-            content = f.read()
+        size = len(data)
+        content, encoding = decode_source(data)
+        reason = check(file_path, data, encoding, generated)
+    finally:
+        close_source(data)
+    if content is None:
+        raise BinaryFileError(f"'{file_path}' appears to be a binary file")
+    if reason is not None:
+        if generated == "skip":
+            raise GeneratedFileError(f"'{file_path}' looks generated ({reason})")
+        content, line_ranges = GeneratedFile(reason).stub_text(), None
+    read_done = time.perf_counter()
 
     # Generate HTML
-    html_content = generate_html(file_path, content, relative_path)
-
-    # Configure fonts for CJK support
-    font_config = FontConfiguration()
+    highlight_stats = {}
+    html_content = generate_html(file_path, content, relative_path, line_ranges,
+                                 budget, highlight_stats)
+    html_done = time.perf_counter()
 
     # Convert HTML to PDF
-    HTML(string=html_content).write_pdf(
-        output_pdf,
-        font_config=font_config
-    )
+    scripts = highlight_stats['scripts']
+    document = render_document(html_content, scripts)
+    document.write_pdf(output_pdf)
+
+    if profile is not None:
+        profile.update({
+            "encoding": encoding,
+            "bytes": size,
+            "read": read_done - start,
+            "html": html_done - read_done,
+            "pdf": time.perf_counter() - html_done,
+            "lexer": highlight_stats['lexer'],
+            "lex_seconds": highlight_stats['lex_seconds'],
+            "fallback": highlight_stats['fallback'],
+            "generated": reason,
+            "scripts": scripts,
+            "lines": count_lines(content),
+            "pages": len(document.pages),
+        })
 
     return output_pdf
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: code_to_pdf.py <input_file> <output_pdf> [relative_path]")
-        print("  input_file: Path to the source code file")
-        print("  output_pdf: Path for the output PDF file")
-        print("  relative_path: Optional display path for the header (e.g., 'src/main.py')")
-        sys.exit(1)
+def format_profile(file_path, profile):
+    """Format a profile dict from convert_to_pdf as a single log line."""
+    return (
+        f"PROFILE: {file_path} encoding={profile['encoding']} bytes={profile['bytes']} "
+        f"read={profile['read'] * 1000:.1f}ms html={profile['html'] * 1000:.1f}ms "
+        f"pdf={profile['pdf'] * 1000:.1f}ms lexer={profile['lexer']} "
+        f"fonts={','.join(profile['scripts']) or 'ascii'}"
+        + (f" fallback=\"{profile['fallback']}\"" if profile['fallback'] else "")
+        + (f" generated=\"{profile['generated']}\"" if profile['generated'] else "")
+    )
+
+
+def append_report(report_path, file_path, profile, output_pdf=None):
+    """Append one JSON line describing a converted file to the run report."""
+    record = {
+        "file": file_path,
+        "pdf": output_pdf,
+        "pages": profile['pages'],
+        "lexer": profile['lexer'],
+        "encoding": profile['encoding'],
+        "bytes": profile['bytes'],
+        "lines": profile['lines'],
+        "lex_seconds": round(profile['lex_seconds'], 6),
+        "render_seconds": round(profile['read'] + profile['html'] + profile['pdf'], 6),
+        "fallback": profile['fallback'],
+        "generated": profile['generated'],
+    }
+    with open(report_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
 
-    input_file = sys.argv[1]
-    output_pdf = sys.argv[2]
-    relative_path = sys.argv[3] if len(sys.argv) > 3 else None
 
-    if not os.path.exists(input_file):
+def count_file(file_path, generated="keep", archive=None):
+    """
+    Return (language, size, lines) for a text file, or None for a binary file.
+
+    Generated files count as None with generated="skip", and as their stub
+    with "stub". If an ArchiveSource is given, file_path names one of its members.
+    """
+    data = archive.read(file_path) if archive else read_source(file_path)
+    try:
+        content, encoding = decode_source(data)
+        if content is None:
+            return None
+        reason = check(file_path, data, encoding, generated)
+        if reason is not None:
+            if generated == "skip":
+                return None
+            stub = GeneratedFile(reason).stub_text()
+            return language_for(file_path), len(stub), count_lines(stub)
+        return language_for(file_path), len(data), count_lines(content)
+    finally:
+        close_source(data)
+
+
+def convert_one(input_file, output_pdf, relative_path=None, line_ranges=None,
+                budget=None, report_path=None, stats=None, generated="keep", archive=None):
+    """
+    Convert one file for the command line, printing progress and reports.
+
+    If a RepoStats is given as `stats`, the file is counted with its rendered
+    page count. Returns 0 on success, EXIT_BINARY if the file was skipped as
+    binary or generated and 1 on error. A skipped file's output_pdf is
+    removed, so a PDF from before it became binary or generated (--watch)
+    does not stay in the merge.
+    """
+    if archive is None and not os.path.exists(input_file):
         print(f"Error: Input file '{input_file}' not found.")
-        sys.exit(1)
+        return 1
 
     # Create output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_pdf) or '.', exist_ok=True)
 
     try:
-        convert_to_pdf(input_file, output_pdf, relative_path)
+        profile = {}
+        convert_to_pdf(input_file, output_pdf, relative_path, profile, line_ranges, budget, generated,
+                       archive)
+        if os.environ.get("CODE2PDF_PROFILE"):
+            print(format_profile(relative_path or input_file, profile), file=sys.stderr)
+        if profile['fallback']:
+            print(f"Warning: highlighting fallback for {relative_path or input_file}: "
+                  f"{profile['fallback']}", file=sys.stderr)
+        if report_path:
+            append_report(report_path, relative_path or input_file, profile, output_pdf)
+        if stats is not None:
+            # Named like code2txt's fences, so both tools report the same languages
+            stats.add(relative_path or input_file, language_for(relative_path or input_file),
+                      profile['bytes'], profile['lines'], profile['pages'])
         print(f"PDF created at {output_pdf}")
+        return 0
+    except (BinaryFileError, GeneratedFileError) as e:
+        print(f"Skipping: {e}")
+        if os.path.exists(output_pdf):
+            os.remove(output_pdf)
+        return EXIT_BINARY
     except Exception as e:
         print(f"Error creating PDF: {e}")
+        return 1
+
+
+def convert_batch(stream, budget=None, report_path=None, stats=None, stats_only=False,
+                  generated="keep", archive=None):
+    """
+    Convert every "input<TAB>output[<TAB>relative_path[<TAB>line_ranges]]" line.
+
+    All files are rendered in this one process so fonts, lexers and WeasyPrint
+    state are set up once. Stops at the first error and returns 1; binary
+    files are skipped, generated ones as `generated` says. With stats_only,
+    files are only read and counted into `stats` (pages estimated) and
+    nothing is rendered. With an ArchiveSource, inputs are its members.
+    """
+    jobs = [line.rstrip("\n") for line in stream if line.strip("\n")]
+    if archive:
+        archive.expect(line.split("\t", 1)[0] for line in jobs)
+    for line in jobs:
+        fields = line.split("\t")
+        input_file, output_pdf = fields[0], fields[1]
+        relative_path = fields[2] if len(fields) > 2 and fields[2] else None
+        line_ranges = parse_ranges(fields[3]) if len(fields) > 3 else None
+        if stats_only:
+            try:
+                counted = count_file(input_file, generated, archive)
+            except (OSError, KeyError) as e:
+                print(f"Error reading file: {e}")
+                return 1
+            if counted is not None:
+                stats.add(relative_path or input_file, *counted)
+            continue
+        status = convert_one(input_file, output_pdf, relative_path, line_ranges, budget,
+                             report_path, stats, generated, archive)
+        if status == 1:
+            return 1
+        sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    # Set CODE2PDF_PROFILE=1 to report the detected encoding and stage timings,
+    # CODE2PDF_REPORT to a file to append a JSON line per converted file, and
+    # CODE2PDF_GENERATED to skip, stub or keep (default) generated files
+    report_path = os.environ.get("CODE2PDF_REPORT")
+    budget = HighlightBudget.from_env()
+    generated = os.environ.get("CODE2PDF_GENERATED", "keep")
+
+    if sys.argv[1:2] == ["--batch"]:
+        parser = argparse.ArgumentParser(prog="code_to_pdf.py --batch")
+        parser.add_argument("--stats", choices=("table", "json"),
+                            help="Report files, bytes, lines, tokens and pages per language and directory")
+        parser.add_argument("--stats-file", default="",
+                            help="Write the statistics here instead of stdout")
+        parser.add_argument("--stats-only", action="store_true",
+                            help="Read and count the files without rendering them")
+        parser.add_argument("--archive", help="Read the inputs as members of this tar or zip archive")
+        args = parser.parse_args(sys.argv[2:])
+        stats = RepoStats() if args.stats or args.stats_only else None
+        archive = ArchiveSource(args.archive) if args.archive else None
+        status = convert_batch(sys.stdin, budget, report_path, stats, args.stats_only, generated,
+                               archive)
+        if archive:
+            archive.close()
+        if stats is not None:
+            report = stats.format(args.stats or "table")
+            if args.stats_file:
+                with open(args.stats_file, 'w', encoding='utf-8') as f:
+                    f.write(report)
+            else:
+                print(report, end="")
+        sys.exit(status)
+
+    if len(sys.argv) < 3:
+        print("Usage: code_to_pdf.py <input_file> <output_pdf> [relative_path] [line_ranges]")
+        print("       code_to_pdf.py --batch [--stats table|json] [--stats-file PATH] [--stats-only]")
+        print("                              [--archive ARCHIVE] < jobs")
+        print("  input_file: Path to the source code file")
+        print("  output_pdf: Path for the output PDF file")
+        print("  relative_path: Optional display path for the header (e.g., 'src/main.py')")
+        print("  line_ranges: Optional lines to render, e.g. '12-20,40-52' (default: whole file)")
+        print("  --batch: Convert 'input<TAB>output[<TAB>relative_path[<TAB>line_ranges]]'")
+        print("           lines from stdin in a single process")
         sys.exit(1)
+
+    input_file = sys.argv[1]
+    output_pdf = sys.argv[2]
+    relative_path = sys.argv[3] if len(sys.argv) > 3 else None
+    line_ranges = parse_ranges(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    sys.exit(convert_one(input_file, output_pdf, relative_path, line_ranges, budget, report_path,
+                         generated=generated))
@@ -10,10 +10,26 @@ INCLUDE_TYPES="$6"
 MAX_FILE_SIZE="$7"
 NO_TOC="$8"
 VERBOSE="$9"
+INDEX_FILE="${10}"
+SINCE_REF="${11}"
+HUNK_CONTEXT="${12}"
+JOBS="${13:-8}"
+MAX_BUFFER="${14:-64M}"
+WATCH="${15:-false}"
+STATS_FORMAT="${16}"
+STATS_ONLY="${17:-false}"
+GENERATED="${18:-skip}"
+ARCHIVE="${19:-false}"  # "true" if TARGET_DIR is a tar or zip archive instead of a directory
+STRIP_HEADERS="${20:-false}"  # "true" writes headers shared by several files only once
+SCAN_CACHE="${21:-false}"  # "true" walks the tree with the persistent scan manifest
+
+# Directory containing this script and its Python helpers
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
 # Track visited directories to prevent symbolic link recursion
 declare -a visited_dirs=()
 declare -a processed_files=()
+declare -A file_ranges=()  # --hunks: changed line ranges per file ("" = whole file)
 
 # Convert comma-separated lists to arrays
 IFS=',' read -ra IGNORE_TYPES_ARRAY <<< "$IGNORE_TYPES"
@@ -25,68 +41,6 @@ if [ -n "$INCLUDE_TYPES" ]; then
     IFS=',' read -ra INCLUDE_TYPES_ARRAY <<< "$INCLUDE_TYPES"
 fi
 
-# Function to get file extension to language mapping
-get_language_from_extension() {
-    local file="$1"
-    local basename="$(basename "$file")"
-    local extension="${basename##*.}"
-    
-    # Handle files without extension
-    if [ "$basename" = "$extension" ]; then
-        case "$basename" in
-            Dockerfile) echo "dockerfile" ;;
-            Makefile|makefile) echo "makefile" ;;
-            .gitignore|.dockerignore) echo "text" ;;
-            .env*) echo "bash" ;;
-            *) echo "text" ;;
-        esac
-        return
-    fi
-    
-    # Map extensions to languages
-    case "$extension" in
-        js|mjs|cjs) echo "javascript" ;;
-        ts|tsx) echo "typescript" ;;
-        jsx) echo "javascript" ;;
-        py) echo "python" ;;
-        java) echo "java" ;;
-        c) echo "c" ;;
-        cpp|cc|cxx) echo "cpp" ;;
-        h|hpp) echo "cpp" ;;
-        cs) echo "csharp" ;;
-        go) echo "go" ;;
-        rs) echo "rust" ;;
-        rb) echo "ruby" ;;
-        php) echo "php" ;;
-        swift) echo "swift" ;;
-        kt|kts) echo "kotlin" ;;
-        scala) echo "scala" ;;
-        sh|bash) echo "bash" ;;
-        zsh) echo "zsh" ;;
-        ps1) echo "powershell" ;;
-        bat|cmd) echo "batch" ;;
-        html|htm) echo "html" ;;
-        css) echo "css" ;;
-        scss|sass) echo "scss" ;;
-        less) echo "less" ;;
-        xml) echo "xml" ;;
-        json) echo "json" ;;
-        yaml|yml) echo "yaml" ;;
-        toml) echo "toml" ;;
-        md|markdown) echo "markdown" ;;
-        rst) echo "rst" ;;
-        sql) echo "sql" ;;
-        r|R) echo "r" ;;
-        m) echo "matlab" ;;
-        jl) echo "julia" ;;
-        lua) echo "lua" ;;
-        pl) echo "perl" ;;
-        vim) echo "vim" ;;
-        el) echo "elisp" ;;
-        *) echo "text" ;;
-    esac
-}
-
 # Function to convert size string to bytes
 size_to_bytes() {
     local size="$1"
@@ -122,20 +76,8 @@ should_process_file() {
         done
     fi
     
-    # Check file size
-    if [ -n "$MAX_FILE_SIZE" ]; then
-        local max_bytes=$(size_to_bytes "$MAX_FILE_SIZE")
-        # Cross-platform stat command
-        if [[ "$OSTYPE" == "darwin"* ]]; then
-            local file_size=$(stat -f%z "$file" 2>/dev/null)
-        else
-            local file_size=$(stat -c%s "$file" 2>/dev/null)
-        fi
-        if [ -n "$file_size" ] && [ "$file_size" -gt "$max_bytes" ]; then
-            [ "$VERBOSE" = true ] && echo "Skipping $file (size: $file_size bytes > max: $max_bytes bytes)" >&2
-            return 1
-        fi
-    fi
+    # The file size limit is checked by write_combined.py, which stats the
+    # selected files concurrently instead of one round trip at a time
     
     # If include-types is specified, only process those types
     if [ -n "$INCLUDE_TYPES" ]; then
@@ -198,64 +140,191 @@ process_directory() {
     done
 }
 
-# Function to write file content with markdown formatting
-write_file_content() {
-    local file="$1"
-    local full_path="$TARGET_DIR/$file"
-    local language=$(get_language_from_extension "$full_path")
+# Function to collect the files of the tree through scan_manifest.py, which
+# lists and filters only the directories changed since the last run
+process_directory_cached() {
+    local listing
+    listing=$(python3 "$SCRIPT_DIR/scan_manifest.py" "$TARGET_DIR" --tool code2txt \
+        --ignore-folders "$IGNORE_FOLDERS" --ignore-files "$IGNORE_FILES" \
+        --ignore-types "$IGNORE_TYPES" --include-types "$INCLUDE_TYPES" \
+        $([ "$VERBOSE" = true ] && echo --verbose)) || return 1
+    [ -n "$listing" ] && mapfile -t processed_files <<< "$listing"
+    return 0
+}
+
+# Function to apply the folder filter to every directory on a relative path
+is_in_ignored_folder() {
+    local component ignore_folder
+    IFS='/' read -ra path_components <<< "$(dirname "$1")"
+    for component in "${path_components[@]}"; do
+        for ignore_folder in "${IGNORE_FOLDERS_ARRAY[@]}"; do
+            if [ "$component" = "$ignore_folder" ]; then
+                return 0
+            fi
+        done
+    done
+    return 1
+}
+
+# Function to collect only the files changed since SINCE_REF, through the same filters
+process_changed_files() {
+    local changes
+    changes=$(python3 "$SCRIPT_DIR/git_changes.py" "$TARGET_DIR" "$SINCE_REF" "$HUNK_CONTEXT") || return 1
     
-    echo "" >> "$OUTPUT_FILE"
-    echo "## $file" >> "$OUTPUT_FILE"
-    echo '```'"$language" >> "$OUTPUT_FILE"
-    # Use cat to preserve file content exactly, handling special characters
-    cat "$full_path" >> "$OUTPUT_FILE" 2>/dev/null || {
-        echo "Error reading file: $full_path" >> "$OUTPUT_FILE"
-    }
-    echo "" >> "$OUTPUT_FILE"
-    echo '```' >> "$OUTPUT_FILE"
+    local relative_path ranges
+    while IFS=$'\t' read -r relative_path ranges; do
+        [ -n "$relative_path" ] || continue
+        local entry="$TARGET_DIR/$relative_path"
+        [ -f "$entry" ] || continue
+        
+        if is_in_ignored_folder "$relative_path"; then
+            [ "$VERBOSE" = true ] && echo "Skipping $relative_path (ignored folder)" >&2
+            continue
+        fi
+        
+        if should_process_file "$entry"; then
+            processed_files+=("$relative_path")
+            file_ranges["$relative_path"]="$ranges"
+            [ "$VERBOSE" = true ] && echo "Processing: $relative_path${ranges:+ (lines $ranges)}" >&2
+        fi
+    done <<< "$changes"
+    return 0
+}
+
+# Function to list the sorted files (and changed line ranges in --hunks mode)
+# for write_combined.py, which names their languages (source_rules.py)
+write_file_list() {
+    for file in "${sorted_files[@]}"; do
+        printf '%s\t\t%s\n' "$file" "${file_ranges[$file]}"
+    done
+}
+
+# Function to filter the batches reported by watch_changes.py through the same
+# rules as the scan, passing paths and batch ends to the writer.
+# Paths of deleted files are passed on as well; the writer drops their sections.
+filter_changed_paths() {
+    local relative_path
+    while IFS= read -r relative_path; do
+        if [ -z "$relative_path" ] || [[ "$relative_path" == */ ]]; then
+            # End of a batch, or a removed directory
+            echo "$relative_path"
+        elif [ ! -d "$TARGET_DIR/$relative_path" ] \
+            && ! is_in_ignored_folder "$relative_path" \
+            && should_process_file "$TARGET_DIR/$relative_path"; then
+            printf '%s\n' "$relative_path"
+        fi
+    done
+}
+
+# Function to send the combined stream to its destination, compressing it
+# on the fly when the output name ends in .gz or .zst ("-" means stdout)
+open_output_sink() {
+    case "$OUTPUT_FILE" in
+        -) cat ;;
+        *.gz) gzip -c > "$OUTPUT_FILE" ;;
+        *.zst) zstd -q -c > "$OUTPUT_FILE" ;;
+        *) cat > "$OUTPUT_FILE" ;;
+    esac
 }
 
 # Main processing
 main() {
-    # Clear or create output file
-    > "$OUTPUT_FILE"
-    
     [ "$VERBOSE" = true ] && echo "Starting to process directory: $TARGET_DIR" >&2
     
-    # Process the directory tree
-    process_directory "$TARGET_DIR"
+    # Process the directory tree, or only what git reports as changed. The
+    # members of an archive are listed and filtered by write_combined.py, in
+    # the same pass over the archive that samples them
+    if [ "$ARCHIVE" = true ]; then
+        :
+    elif [ -n "$SINCE_REF" ]; then
+        [ "$VERBOSE" = true ] && echo "Only including files changed since $SINCE_REF" >&2
+        process_changed_files || {
+            echo "Error: Could not list changes since '$SINCE_REF'" >&2
+            return 1
+        }
+    elif [ "$SCAN_CACHE" = true ]; then
+        process_directory_cached || {
+            echo "Error: Could not scan $TARGET_DIR" >&2
+            return 1
+        }
+    else
+        process_directory "$TARGET_DIR"
+    fi
     
     # Sort the processed files for consistent output
     IFS=$'\n' sorted_files=($(sort <<<"${processed_files[*]}"))
     unset IFS
     
-    # Generate table of contents if requested
-    if [ "$NO_TOC" != true ] && [ ${#sorted_files[@]} -gt 0 ]; then
-        echo "# Table of Contents" >> "$OUTPUT_FILE"
-        echo "" >> "$OUTPUT_FILE"
-        for file in "${sorted_files[@]}"; do
-            echo "- $file" >> "$OUTPUT_FILE"
-        done
-        echo "" >> "$OUTPUT_FILE"
-        echo "---" >> "$OUTPUT_FILE"
+    # Check if any files were processed
+    if [ ${#sorted_files[@]} -eq 0 ] && [ "$ARCHIVE" != true ]; then
+        [ "$OUTPUT_FILE" != "-" ] && [ "$STATS_ONLY" != true ] && : > "$OUTPUT_FILE"
+        echo "Warning: No files were processed. Check your filters and target directory." >&2
+        return 1
     fi
     
-    # Write all file contents
-    for file in "${sorted_files[@]}"; do
-        write_file_content "$file"
-    done
+    # Stream everything through a single sink instead of reopening the output per line
+    set -o pipefail
+    local writer_options=(--jobs "$JOBS" --max-buffer "$MAX_BUFFER" --generated "$GENERATED")
+    [ "$NO_TOC" = true ] && writer_options+=(--no-toc)
+    [ "$VERBOSE" = true ] && writer_options+=(--verbose)
+    [ -n "$INDEX_FILE" ] && writer_options+=(--index "$INDEX_FILE")
+    [ -n "$MAX_FILE_SIZE" ] && writer_options+=(--max-file-size "$(size_to_bytes "$MAX_FILE_SIZE")")
+    [ "$ARCHIVE" = true ] && writer_options+=(--archive --ignore-folders "$IGNORE_FOLDERS" \
+        --ignore-files "$IGNORE_FILES" --ignore-types "$IGNORE_TYPES" --include-types "$INCLUDE_TYPES")
+    [ "$STRIP_HEADERS" = true ] && writer_options+=(--strip-headers)
+    
+    # --stats-only: read and count the files in the same way, but write no document
+    if [ "$STATS_ONLY" = true ]; then
+        write_file_list \
+            | python3 "$SCRIPT_DIR/write_combined.py" "$TARGET_DIR" "$OUTPUT_FILE" "${writer_options[@]}" \
+                --stats-only --stats "${STATS_FORMAT:-table}"
+        return $?
+    fi
+    
+    # --stats: counted during the write and printed once the output is complete
+    local stats_file=""
+    if [ -n "$STATS_FORMAT" ]; then
+        stats_file=$(mktemp)
+        writer_options+=(--stats "$STATS_FORMAT" --stats-file "$stats_file")
+    fi
+    
+    # --watch: one long-running writer gets the full list, then the filtered
+    # batches of changes, and rewrites the output file itself after each batch
+    if [ "$WATCH" = true ]; then
+        { write_file_list; echo; \
+          python3 "$SCRIPT_DIR/watch_changes.py" "$TARGET_DIR" --exclude-folders "$IGNORE_FOLDERS" \
+            | filter_changed_paths; } \
+            | python3 "$SCRIPT_DIR/write_combined.py" "$TARGET_DIR" "$OUTPUT_FILE" --watch "${writer_options[@]}"
+        return $?
+    fi
+    
+    write_file_list \
+        | python3 "$SCRIPT_DIR/write_combined.py" "$TARGET_DIR" "$OUTPUT_FILE" "${writer_options[@]}" \
+        | open_output_sink
+    local status=$?
+    if [ $status -ne 0 ]; then
+        # 3: no archive member passed the filters, which the writer has reported
+        [ $status -ne 3 ] && echo "Error: Failed to write output to $OUTPUT_FILE" >&2
+        [ -n "$stats_file" ] && rm -f "$stats_file"
+        return 1
+    fi
+    
+    # Statistics go to stdout, unless the document itself was written there
+    if [ -n "$stats_file" ]; then
+        if [ "$OUTPUT_FILE" = "-" ]; then
+            cat "$stats_file" >&2
+        else
+            cat "$stats_file"
+        fi
+        rm -f "$stats_file"
+    fi
     
     # Report results
     if [ "$VERBOSE" = true ]; then
         echo "" >&2
-        echo "Processed ${#sorted_files[@]} files" >&2
+        [ "$ARCHIVE" != true ] && echo "Processed ${#sorted_files[@]} files" >&2
         echo "Output written to: $OUTPUT_FILE" >&2
-    fi
-    
-    # Check if any files were processed
-    if [ ${#sorted_files[@]} -eq 0 ]; then
-        echo "Warning: No files were processed. Check your filters and target directory." >&2
-        return 1
+        [ -n "$INDEX_FILE" ] && echo "Index written to: $INDEX_FILE" >&2
     fi
     
     return 0
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Sidecar index for code2txt output files.
+
+The index is a JSON-lines file written next to the combined output. The first
+line describes the output, every following line describes one file section:
+
+    {"format": "code2txt-index", "version": 1, "output": "combined.txt", "compression": null}
+    {"path": "src/main.py", "language": "python", "encoding": "utf-8", "offset": 120, "length": 342, "lines": 17, "sha256": "..."}
+
+`offset` and `length` locate the file body (the source file as UTF-8;
+`encoding` is what it was decoded from) in the uncompressed output, so a
+reader never has to scan for `## path` headers or code fences.
+"""
+
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import subprocess
+import sys
+
+INDEX_FORMAT = "code2txt-index"
+INDEX_VERSION = 1
+
+
+def compression_for(output_path):
+    """Return the compression applied to an output file based on its name."""
+    if output_path.endswith(".gz"):
+        return "gzip"
+    if output_path.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def count_lines(data):
+    """Count lines the way editors do: a trailing newline does not start a new line.
+
+    Works on bytes and on text; the count is a single buffer-level scan.
+    """
+    if not data:
+        return 0
+    newline = "\n" if isinstance(data, str) else b"\n"
+    return data.count(newline) + (0 if data.endswith(newline) else 1)
+
+
+class IndexWriter:
+    """Collect section entries while the combined output is being written."""
+
+    def __init__(self, index_path, output_path):
+        self.index_path = index_path
+        self.output_path = output_path
+        self.entries = []
+
+    def add(self, path, language, offset, body, encoding="utf-8"):
+        self.entries.append({
+            "path": path,
+            "language": language,
+            "encoding": encoding,
+            "offset": offset,
+            "length": len(body),
+            "lines": count_lines(body),
+            "sha256": hashlib.sha256(body).hexdigest(),
+        })
+
+    def write(self):
+        header = {
+            "format": INDEX_FORMAT,
+            "version": INDEX_VERSION,
+            "output": os.path.basename(self.output_path),
+            "compression": compression_for(self.output_path),
+        }
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            for entry in self.entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def load_index(index_path):
+    """Load an index file and return (header, entries)."""
+    with open(index_path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != INDEX_FORMAT:
+            raise ValueError(f"{index_path} is not a code2txt index")
+        if header.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported code2txt index version: {header.get('version')}")
+        entries = [json.loads(line) for line in f if line.strip()]
+    return header, entries
+
+
+class CombinedReader:
+    """
+    Random access to the file sections of a code2txt output.
+
+    Uncompressed outputs are memory-mapped, so each section is an O(1) slice.
+    Compressed outputs have to be decompressed once into memory first.
+
+    Usage:
+        with CombinedReader("combined.txt.idx", "combined.txt") as reader:
+            source = reader.read("src/main.py")
+    """
+
+    def __init__(self, index_path, output_path=None):
+        self.header, entries = load_index(index_path)
+        self.entries = {entry["path"]: entry for entry in entries}
+        self.output_path = output_path or os.path.join(
+            os.path.dirname(index_path), self.header["output"]
+        )
+        self._file = None
+        self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _data(self):
+        if self._buffer is None:
+            compression = self.header.get("compression")
+            if compression == "gzip":
+                with gzip.open(self.output_path, "rb") as f:
+                    self._buffer = f.read()
+            elif compression == "zstd":
+                self._buffer = subprocess.run(
+                    ["zstd", "-q", "-d", "-c", self.output_path],
+                    check=True, capture_output=True
+                ).stdout
+            else:
+                self._file = open(self.output_path, "rb")
+                if self._file.seek(0, 2) == 0:
+                    self._buffer = b""
+                else:
+                    self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._buffer
+
+    def paths(self):
+        """Return the indexed file paths in output order."""
+        return list(self.entries)
+
+    def entry(self, path):
+        """Return the index entry for a file path."""
+        return self.entries[path]
+
+    def read(self, path, verify=False):
+        """Return the body of one file section as bytes."""
+        entry = self.entries[path]
+        body = bytes(self._data()[entry["offset"]:entry["offset"] + entry["length"]])
+        if verify and hashlib.sha256(body).hexdigest() != entry["sha256"]:
+            raise ValueError(f"Content hash mismatch for {path}")
+        return body
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        if self._file is not None:
+            self._file.close()
+        self._buffer = None
+        self._file = None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: combined_index.py <index_file> <path> [output_file]")
+        print("  index_file: Sidecar index written by code2txt --index")
+        print("  path: Relative path of the file section to print")
+        print("  output_file: Combined output (default: the one next to the index)")
+        sys.exit(1)
+
+    with CombinedReader(sys.argv[1], sys.argv[3] if len(sys.argv) > 3 else None) as reader:
+        try:
+            sys.stdout.buffer.write(reader.read(sys.argv[2], verify=True))
+        except KeyError:
+            print(f"Error: '{sys.argv[2]}' is not in the index", file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Find license and copyright headers repeated across files (code2txt --strip-headers).
+
+Most files of a repository often start with the same license block, and
+code2txt would repeat it in every section. find_header() takes the leading
+comment block of a file (after a shebang) in the comment syntax of its
+language and keys it by a hash of its normalized text: each line stripped,
+whitespace collapsed. Headers found in at least MIN_FILES files are written
+once at the top of the document, and each section that starts with one gets
+a one-line marker in its place.
+
+Only the bounded sample that write_combined.py already reads to detect the
+encoding is looked at, and every file is hashed once, so detection is
+linear in the number of files. A header that does not end within the
+sample is not considered.
+"""
+
+import hashlib
+import re
+
+# Line and block comment syntax per code fence language (see combine_to_txt.sh)
+HASH = ("#",)
+SLASHES = ("//",)
+C_BLOCK = (("/*", "*/"),)
+XML_BLOCK = (("<!--", "-->"),)
+COMMENT_SYNTAX = {
+    "python": (HASH, ()), "ruby": (HASH, ()), "bash": (HASH, ()), "zsh": (HASH, ()),
+    "perl": (HASH, ()), "r": (HASH, ()), "julia": (HASH, ()), "yaml": (HASH, ()),
+    "toml": (HASH, ()), "makefile": (HASH, ()), "dockerfile": (HASH, ()),
+    "powershell": (HASH, ()),
+    "javascript": (SLASHES, C_BLOCK), "typescript": (SLASHES, C_BLOCK), "java": (SLASHES, C_BLOCK),
+    "c": (SLASHES, C_BLOCK), "cpp": (SLASHES, C_BLOCK), "csharp": (SLASHES, C_BLOCK),
+    "go": (SLASHES, C_BLOCK), "rust": (SLASHES, C_BLOCK), "php": (SLASHES + HASH, C_BLOCK),
+    "swift": (SLASHES, C_BLOCK), "kotlin": (SLASHES, C_BLOCK), "scala": (SLASHES, C_BLOCK),
+    "scss": (SLASHES, C_BLOCK), "less": (SLASHES, C_BLOCK), "css": ((), C_BLOCK),
+    "sql": (("--",), C_BLOCK), "lua": (("--",), ()), "elisp": ((";",), ()),
+    "matlab": (("%",), ()), "vim": (('"',), ()),
+    "html": ((), XML_BLOCK), "xml": ((), XML_BLOCK), "markdown": ((), XML_BLOCK),
+}
+
+# Shorter comment blocks are not worth a marker
+MIN_HEADER_LINES = 3
+
+# A header is common when this many files start with it
+MIN_FILES = 3
+
+
+class Header:
+    """The leading comment block of one file: lines start:end (0-based) and its key."""
+
+    def __init__(self, start, end, key, text):
+        self.start = start
+        self.end = end
+        self.key = key
+        self.text = text
+
+
+def find_header(text, language, complete=True):
+    """
+    Return the Header of text in the comment syntax of language, or None.
+
+    `text` may be the start of a longer file; pass complete=False then, so a
+    block that runs to the end of it is not taken for a whole header.
+    """
+    line_comments, block_comments = COMMENT_SYNTAX.get(language, ((), ()))
+    if not line_comments and not block_comments:
+        return None
+    lines = text.split("\n")
+    start = 1 if lines and lines[0].startswith("#!") else 0
+    end = start
+    while end < len(lines):
+        stripped = lines[end].strip()
+        if line_comments and stripped.startswith(line_comments):
+            end += 1
+            continue
+        block = next((pair for pair in block_comments if stripped.startswith(pair[0])), None)
+        if block is None:
+            break
+        # The block ends on the line holding its closing marker
+        opening, closing = block
+        position = end
+        rest = stripped[len(opening):]
+        while closing not in rest:
+            position += 1
+            if position == len(lines):
+                return None
+            rest = lines[position]
+        end = position + 1
+    if end - start < MIN_HEADER_LINES or (end == len(lines) and not complete):
+        return None
+    block = "\n".join(lines[start:end])
+    normalized = "\n".join(re.sub(r"\s+", " ", line.strip()) for line in lines[start:end])
+    return Header(start, end, hashlib.sha256(normalized.encode()).hexdigest(), block)
+
+
+def common_headers(headers, min_files=MIN_FILES):
+    """
+    Number the headers shared by at least min_files files.
+
+    `headers` maps paths, in document order, to their Header (or None).
+    Returns {key: (number, text, file count)}, numbered from 1 in order of
+    first use; the text is that of the first file.
+    """
+    counts = {}
+    for header in headers.values():
+        if header is not None:
+            counts[header.key] = counts.get(header.key, 0) + 1
+    common = {}
+    for header in headers.values():
+        if header is not None and counts[header.key] >= min_files and header.key not in common:
+            common[header.key] = (len(common) + 1, header.text, counts[header.key])
+    return common
+
+
+def marker(number, lines):
+    return f"[common header {number} omitted ({lines} lines), see Common Headers at the top]"
+
+
+def strip_header(body, header, number):
+    """Replace the header lines of a UTF-8 body with its one-line marker."""
+    lines = body.split(b"\n")
+    replacement = marker(number, header.end - header.start).encode()
+    return b"\n".join(lines[:header.start] + [replacement] + lines[header.end:])
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+A Pygments HTML formatter that emits fewer elements, for the PDF path.
+
+WeasyPrint lays out one inline box per element and one text box per text
+run, so its layout time grows with the number of spans. Pygments'
+HtmlFormatter wraps every token in a span of its own, including whitespace
+and tokens whose class has no style at all (names and punctuation in the
+default style). CompactHtmlFormatter produces the same rendering with:
+
+    - no span for tokens whose style sets nothing visible
+    - no span for whitespace unless its style shows on blank space
+      (background, underline, border or a different font family)
+    - one span for each run of adjacent tokens with the same style,
+      including the whitespace between them
+    - inline line numbers written while formatting the line, instead of
+      by a second pass over all formatted lines
+
+Class names are the ones HtmlFormatter uses, so get_style_defs() applies
+unchanged. Line numbers keep one span per line, as they have to wrap and
+break across pages together with their line.
+"""
+
+from pygments.formatters import HtmlFormatter
+
+
+class CompactHtmlFormatter(HtmlFormatter):
+    """HtmlFormatter that merges and drops spans which do not change the rendering."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        # Options that decorate individual tokens or numbers keep the stock output
+        self.compact = not (self.noclasses or self.tagsfile or self.debug_token_types
+                            or self.anchorlinenos)
+        self._token_classes = {}
+
+    def _token_class(self, ttype):
+        """Return (span opener, whether blank space needs the span) for a token type."""
+        if ttype not in self._token_classes:
+            styled = ttype
+            while not self.style.styles_token(styled) and styled.parent is not None:
+                styled = styled.parent
+            style = self.style.style_for_token(styled)
+            visible = any(style[key] for key in ('color', 'bgcolor', 'bold', 'italic', 'underline',
+                                                  'border', 'roman', 'sans', 'mono'))
+            blank_visible = any(style[key] for key in ('bgcolor', 'underline', 'border',
+                                                        'roman', 'sans', 'mono'))
+            opener = f'<span class="{self._get_css_classes(ttype)}">' if visible else ''
+            self._token_classes[ttype] = (opener, blank_visible)
+        return self._token_classes[ttype]
+
+    def _line_numbers(self, text):
+        """Yield the line number prefix for each output line of text."""
+        if self.linenos != 2:
+            while True:
+                yield ''
+        count = text.count('\n') + (not text.endswith('\n'))
+        width = len(str(count + self.linenostart - 1))
+        number = self.linenostart
+        while True:
+            text = '%*d' % (width, number) if number % self.linenostep == 0 else ' ' * width
+            special = self.linenospecial and number % self.linenospecial == 0
+            yield f'<span class="linenos{" special" if special else ""}">{text}</span>'
+            number += 1
+
+    def _format_lines(self, tokensource):
+        if not self.compact:
+            yield from super()._format_lines(tokensource)
+            return
+
+        tokens = list(tokensource)
+        numbers = self._line_numbers(''.join(value for _, value in tokens) or '\n')
+        token_classes = self._token_classes
+        lsep = self.lineseparator
+        line = []
+        span = ''        # opener of the open span, '' when outside a span
+        blank = ''       # whitespace waiting to join the next run or stand alone
+
+        for ttype, value in tokens:
+            if ttype not in token_classes:
+                self._token_class(ttype)
+            opener, blank_visible = token_classes[ttype]
+            parts = self._translate_parts(value)
+            for index, part in enumerate(parts):
+                if index:
+                    yield 1, ''.join((next(numbers), *line, span and '</span>', blank, lsep))
+                    line, span, blank = [], '', ''
+                if not part:
+                    continue
+                if not blank_visible and part.isspace():
+                    blank += part
+                    continue
+                if opener == span and not (blank and blank_visible):
+                    line.append(blank + part)
+                else:
+                    line.extend((span and '</span>', blank, opener, part))
+                    span = opener
+                blank = ''
+
+        if line or blank:
+            yield 1, ''.join((next(numbers), *line, span and '</span>', blank, lsep))
+
+    def _wrap_inlinelinenos(self, inner):
+        # The numbers are already part of the lines from _format_lines
+        if self.compact:
+            return inner
+        return super()._wrap_inlinelinenos(inner)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Write the code2txt document, the PDF, the index and the statistics in one pass (code2export).
+
+Running code2txt and code2pdf -a on the same tree walks it twice, reads and
+decodes every file twice and, with --stats, counts it twice, and the two
+tools can disagree on which files belong in a document. code2export walks
+the tree once, selects files with code2txt's rules (code2pdf_api.scan and
+filter_files), reads and decodes each selected file once and hands the
+content to every requested output in document order:
+
+    python3 export_all.py DIRECTORY --txt combined.txt --pdf code.pdf --index --stats table
+
+The text output is compressed by name like code2txt's (.gz, .zst). The PDF
+has the same pages as code2pdf -a and is rendered in-process, so the page
+counts in the statistics are the rendered ones when a PDF is written.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from code2pdf_api import (scan, filter_files, export, DEFAULT_IGNORE_TYPES, DEFAULT_IGNORE_FOLDERS,
+                          DEFAULT_MAX_FILE_SIZE)
+from combined_index import IndexWriter
+from generated_files import MODES as GENERATED_MODES
+from prefetch import DEFAULT_JOBS, DEFAULT_MAX_BUFFERED
+from repo_stats import RepoStats
+from write_combined import COMPRESSORS, parse_size
+
+
+def _split(value):
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+def export_tree(target_dir, txt_file=None, pdf_file=None, index_path=None, stats=None,
+                ignore_types=DEFAULT_IGNORE_TYPES, ignore_folders=DEFAULT_IGNORE_FOLDERS,
+                ignore_files=(), include_types=None, no_toc=False,
+                max_file_size=DEFAULT_MAX_FILE_SIZE, jobs=DEFAULT_JOBS,
+                max_buffered=DEFAULT_MAX_BUFFERED, generated="skip"):
+    """
+    Export target_dir to the requested outputs and return the number of files.
+
+    Outputs are written to temporary files and moved into place at the end,
+    so a failed run leaves earlier outputs untouched.
+    """
+    files = filter_files(scan(target_dir, ignore_folders), ignore_types, ignore_files, include_types)
+    budget = None
+    if pdf_file:
+        from code_to_pdf import HighlightBudget
+        budget = HighlightBudget.from_env()
+
+    compressor = next((command for suffix, command in COMPRESSORS.items()
+                       if txt_file and txt_file.endswith(suffix)), None)
+    index = IndexWriter(f"{index_path}.tmp", txt_file) if txt_file and index_path else None
+    txt = open(f"{txt_file}.tmp", "wb") if txt_file else None
+    pdf = open(f"{pdf_file}.tmp", "wb") if pdf_file else None
+    process = subprocess.Popen(compressor, stdin=subprocess.PIPE, stdout=txt) if compressor else None
+    try:
+        exported = export(
+            files, target_dir, process.stdin if process else txt, pdf, index, stats, no_toc,
+            max_file_size, jobs, max_buffered, generated, budget
+        )
+        if process:
+            process.stdin.close()
+            if process.wait() != 0:
+                raise OSError(f"{compressor[0]} failed writing {txt_file}")
+    except BaseException:
+        for f in (txt, pdf):
+            if f is not None:
+                f.close()
+                os.remove(f.name)
+        raise
+    for f in (txt, pdf):
+        if f is not None:
+            f.close()
+
+    for name in (txt_file, pdf_file):
+        if name:
+            os.replace(f"{name}.tmp", name)
+    if index is not None:
+        index.write()
+        os.replace(index.index_path, index_path)
+    return exported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write the code2txt document, the PDF, the index and the statistics of a "
+                    "directory while reading each file once."
+    )
+    parser.add_argument("target_dir", nargs="?", default=".", help="Directory to export")
+    parser.add_argument("--txt", default="", help="Write the code2txt document here (.gz/.zst compress)")
+    parser.add_argument("--pdf", default="", help="Write the PDF here")
+    parser.add_argument("--index", action="store_true", help="Also write TXT.idx for the document")
+    parser.add_argument("--stats", choices=("table", "json"),
+                        help="Report files, bytes, lines, tokens and pages per language and directory")
+    parser.add_argument("--stats-file", default="", help="Write the statistics here (default: stdout)")
+    parser.add_argument("--ignore-types", default=",".join(DEFAULT_IGNORE_TYPES),
+                        help="Comma-separated extensions to ignore")
+    parser.add_argument("--ignore-folders", default=",".join(DEFAULT_IGNORE_FOLDERS),
+                        help="Comma-separated folders to skip")
+    parser.add_argument("--ignore-files", default="", help="Comma-separated file names to ignore")
+    parser.add_argument("--include-types", default="",
+                        help="Only include these extensions (overrides --ignore-types)")
+    parser.add_argument("--max-file-size", default="500K", help="Skip files larger than this (e.g. 1M)")
+    parser.add_argument("--generated", choices=GENERATED_MODES, default="skip",
+                        help="Skip generated and minified files, write a stub for them, or keep them "
+                             "(default: skip)")
+    parser.add_argument("--no-toc", action="store_true", help="Skip the tables of contents")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Concurrent file reads")
+    parser.add_argument("--max-buffer", default=str(DEFAULT_MAX_BUFFERED),
+                        help="Cap on bytes read ahead of the outputs (e.g. 64M)")
+    args = parser.parse_args()
+
+    if not (args.txt or args.pdf or args.stats):
+        parser.error("nothing to export; give --txt, --pdf or --stats")
+    if args.index and not args.txt:
+        parser.error("--index needs --txt")
+    if not os.path.isdir(args.target_dir):
+        parser.error(f"'{args.target_dir}' is not a directory")
+
+    stats = RepoStats() if args.stats else None
+    try:
+        exported = export_tree(
+            args.target_dir, args.txt or None, args.pdf or None,
+            f"{args.txt}.idx" if args.index else None, stats,
+            _split(args.ignore_types), _split(args.ignore_folders), _split(args.ignore_files),
+            _split(args.include_types) or None, args.no_toc, parse_size(args.max_file_size),
+            max(1, args.jobs), parse_size(args.max_buffer), args.generated
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if exported == 0:
+        print("Warning: No text files found to export", file=sys.stderr)
+    for name in (args.txt, args.pdf):
+        if name:
+            print(f"Created {name}", file=sys.stderr)
+    if stats is not None:
+        report = stats.format(args.stats)
+        if args.stats_file:
+            with open(args.stats_file, "w", encoding="utf-8") as f:
+                f.write(report)
+        else:
+            print(report, end="")
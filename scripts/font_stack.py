@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Pick the smallest font stack that covers the characters a document uses.
+
+Naming the heavy "Noto Sans Mono CJK" faces for pure-ASCII source makes
+every document pay for their lookup and may embed them. Instead, the content
+is scanned for the Unicode ranges it uses and only the matching CJK faces are
+named. Stacks are narrowed to the families that are actually installed; that
+resolution is cached in memory and on disk, keyed by the set of scripts used,
+and invalidated when the font directories change.
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+
+# Scripts that need a dedicated face, with the ranges that detect them
+SCRIPT_PATTERNS = (
+    ("jp", re.compile("[\u3040-\u30ff\u31f0-\u31ff]")),  # Hiragana, Katakana
+    ("kr", re.compile("[\u1100-\u11ff\u3130-\u318f\uac00-\ud7af]")),  # Hangul
+    # Han ideographs, CJK radicals, punctuation and full-width forms
+    ("sc", re.compile("[\u2e80-\u2fdf\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")),
+)
+
+MONO_CJK_FAMILIES = {
+    "sc": "Noto Sans Mono CJK SC",
+    "jp": "Noto Sans Mono CJK JP",
+    "kr": "Noto Sans Mono CJK KR",
+}
+SANS_CJK_FAMILIES = {
+    "sc": "Noto Sans SC",
+    "jp": "Noto Sans JP",
+    "kr": "Noto Sans KR",
+}
+MONO_BASE_FAMILIES = ("Noto Sans Mono", "DejaVu Sans Mono", "Courier New")
+SANS_BASE_FAMILIES = ("DejaVu Sans",)
+
+FONT_DIRS = (
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    "~/.local/share/fonts",
+    "~/.fonts",
+    "/Library/Fonts",
+    "~/Library/Fonts",
+    "/System/Library/Fonts",
+)
+
+CACHE_FILE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "code2pdf", "font_stacks.json"
+)
+
+_memory_cache = {}
+_installed_families = None
+_signature = None
+
+
+def detect_scripts(*texts):
+    """Return the sorted tuple of CJK script keys ("jp", "kr", "sc") used in the texts."""
+    scripts = set()
+    for text in texts:
+        if not text or text.isascii():
+            continue
+        for key, pattern in SCRIPT_PATTERNS:
+            if key not in scripts and pattern.search(text):
+                scripts.add(key)
+    # Japanese text also uses Han characters; the JP face covers both
+    if "jp" in scripts:
+        scripts.discard("sc")
+    return tuple(sorted(scripts))
+
+
+def _font_dirs_signature():
+    """Latest modification time of the font directories, to invalidate the disk cache."""
+    global _signature
+    if _signature is None:
+        latest = 0.0
+        for font_dir in FONT_DIRS:
+            for root, _, _ in os.walk(os.path.expanduser(font_dir)):
+                latest = max(latest, os.stat(root).st_mtime)
+        _signature = latest
+    return _signature
+
+
+def installed_families():
+    """Return the set of installed font families, or None if fontconfig is unavailable."""
+    global _installed_families
+    if _installed_families is None:
+        if not shutil.which("fc-list"):
+            return None
+        output = subprocess.run(
+            ["fc-list", ":", "family"], capture_output=True, text=True
+        ).stdout
+        _installed_families = {
+            family.strip() for line in output.splitlines() for family in line.split(",")
+        }
+    return _installed_families
+
+
+def _load_disk_cache(signature):
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("signature") != signature:
+        return {}
+    return cache.get("stacks", {})
+
+
+def _save_disk_cache(signature, stacks):
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        tmp_file = f"{CACHE_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"signature": signature, "stacks": stacks}, f)
+        os.replace(tmp_file, CACHE_FILE)
+    except OSError:
+        pass  # The cache is an optimization only
+
+
+def _resolve(scripts):
+    """Build the (mono, sans) family lists for a script set, keeping installed families only."""
+    mono = [MONO_CJK_FAMILIES[key] for key in scripts] + list(MONO_BASE_FAMILIES)
+    sans = [SANS_CJK_FAMILIES[key] for key in scripts] + list(SANS_BASE_FAMILIES)
+    installed = installed_families()
+    if installed is not None:
+        mono = [family for family in mono if family in installed]
+        sans = [family for family in sans if family in installed]
+    return mono, sans
+
+
+def resolve_font_stack(scripts):
+    """
+    Return (mono_families, sans_families) for a script set.
+
+    Results are cached in memory for the process and on disk across runs.
+    """
+    if scripts in _memory_cache:
+        return _memory_cache[scripts]
+
+    key = ",".join(scripts) or "ascii"
+    signature = _font_dirs_signature()
+    stacks = _load_disk_cache(signature)
+    if key in stacks:
+        result = tuple(stacks[key][0]), tuple(stacks[key][1])
+    else:
+        mono, sans = _resolve(scripts)
+        result = tuple(mono), tuple(sans)
+        stacks[key] = [mono, sans]
+        _save_disk_cache(signature, stacks)
+    _memory_cache[scripts] = result
+    return result
+
+
+def css_font_family(families, generic):
+    """Format a family list as a CSS font-family value ending in a generic family."""
+    return ", ".join([f'"{family}"' for family in families] + [generic])
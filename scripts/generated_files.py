@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Recognize generated and minified files from their name and first bytes.
+
+Lockfiles, minified bundles, source maps and protobuf output pass the
+extension filters of both tools but are expensive to highlight, large in
+tokens and of no use to readers. classify() looks at:
+
+    - the file name: known lockfiles, .min.js/.min.css, source maps and
+      protobuf compiler output
+    - marker comments in the first MARKER_LINES lines, in their
+      conventional forms only: Go's "// Code generated ... DO NOT EDIT.",
+      an "@generated" token, or "generated" and "do not edit" together
+    - line lengths in the sample: a very long line, or a long average
+
+It only needs the bounded sample that source_reader already reads to
+detect the encoding, so checking a file costs no extra read. Callers skip
+flagged files, write a stub in their place, or keep them (--generated).
+"""
+
+import os
+import re
+
+from source_reader import SAMPLE_SIZE
+
+# Exact names of dependency lockfiles
+LOCKFILE_NAMES = frozenset((
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb",
+    "Cargo.lock", "poetry.lock", "Pipfile.lock", "pdm.lock", "uv.lock", "composer.lock",
+    "Gemfile.lock", "Podfile.lock", "go.sum", "mix.lock", "pubspec.lock", "flake.lock",
+    "packages.lock.json", "gradle.lockfile", "Package.resolved",
+))
+
+# Name suffixes of minified and generated files, with the reason reported
+GENERATED_SUFFIXES = (
+    (".min.js", "minified"), (".min.mjs", "minified"), (".min.css", "minified"),
+    (".js.map", "source map"), (".mjs.map", "source map"), (".css.map", "source map"),
+    ("_pb2.py", "protobuf"), ("_pb2.pyi", "protobuf"), ("_pb2_grpc.py", "protobuf"),
+    (".pb.go", "protobuf"), (".pb.cc", "protobuf"), (".pb.h", "protobuf"),
+    ("_pb.js", "protobuf"), ("_pb.d.ts", "protobuf"), (".pb.swift", "protobuf"),
+)
+
+# Marker comments are only looked for at the top of a file. Prose that merely
+# mentions generated code or editing must not match: Markdown bullets and
+# docstrings do not count as comments, and only the conventional markers do.
+MARKER_LINES = 10
+COMMENT_PREFIXES = ("#", "//", "/*", "<!--", "--", ";")
+MARKERS = (
+    re.compile(r"^(//|#) Code generated .* DO NOT EDIT\.$"),
+    re.compile(r"(?<![\w@])@generated(?![\w-])"),
+    re.compile(r"\bgenerated\b.*\bdo not edit\b", re.IGNORECASE),
+)
+
+# A line this long, or this long on average over at least MIN_AVERAGE_SAMPLE
+# bytes, is machine-written
+MAX_LINE_LENGTH = 5000
+MAX_AVERAGE_LINE_LENGTH = 300
+MIN_AVERAGE_SAMPLE = 4096
+
+# How the tools treat flagged files
+MODES = ("skip", "stub", "keep")
+
+
+class GeneratedFile:
+    """Stands in for the contents of a flagged file that is written as a stub."""
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __eq__(self, other):
+        return isinstance(other, GeneratedFile) and other.reason == self.reason
+
+    def stub_text(self):
+        return f"Generated file not included ({self.reason})\n"
+
+
+def classify(name, sample, encoding="utf-8"):
+    """
+    Return why the file is considered generated, or None.
+
+    `sample` holds the first bytes of the file (any length; the caller's
+    encoding sample), decoded with `encoding` for the content checks.
+    """
+    base_name = os.path.basename(name)
+    if base_name in LOCKFILE_NAMES:
+        return "lockfile"
+    for suffix, reason in GENERATED_SUFFIXES:
+        if base_name.endswith(suffix):
+            return reason
+
+    text = bytes(sample).decode(encoding or "utf-8", errors="ignore")
+    lines = text.split("\n")
+    for line in lines[:MARKER_LINES]:
+        line = line.strip()
+        if line.startswith(COMMENT_PREFIXES) and any(marker.search(line) for marker in MARKERS):
+            return f"marker: {line[:60]}"
+
+    longest = max(len(line) for line in lines)
+    if longest > MAX_LINE_LENGTH:
+        return f"minified, line of {longest}+ characters"
+    if len(text) >= MIN_AVERAGE_SAMPLE and len(text) / len(lines) > MAX_AVERAGE_LINE_LENGTH:
+        return f"minified, {len(text) // len(lines)} characters per line"
+    return None
+
+
+def check(name, data, encoding, mode):
+    """classify() the first SAMPLE_SIZE bytes of data; always None if mode is "keep"."""
+    if mode == "keep" or encoding is None:
+        return None
+    return classify(name, data[:SAMPLE_SIZE], encoding)
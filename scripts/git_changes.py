@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+List files changed since a local git ref, optionally with their changed hunks.
+
+Used by the --since mode of code2txt and code2pdf. Only git's diff machinery
+is consulted, so the work scales with the size of the diff rather than the
+size of the repository. Paths are relative to the given directory.
+
+Output (one file per line, sorted):
+    path                    (files only)
+    path<TAB>ranges         (with a context size; ranges like "12-20,40-52",
+                             empty for new files, which are shown whole)
+"""
+
+import re
+import subprocess
+import sys
+
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+def _git(repo_dir, *args):
+    result = subprocess.run(
+        ["git", "-C", repo_dir, "-c", "core.quotePath=false", *args],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"git {args[0]} failed")
+    return result.stdout
+
+
+def untracked_files(repo_dir):
+    """Return new files that git does not track yet (honouring .gitignore)."""
+    return _git(repo_dir, "ls-files", "--others", "--exclude-standard").splitlines()
+
+
+def changed_files(repo_dir, ref):
+    """Return the sorted paths of files added or modified since ref (deletions excluded)."""
+    diffed = _git(
+        repo_dir, "diff", "--name-only", "--relative", "--diff-filter=d", "--no-ext-diff", ref
+    ).splitlines()
+    return sorted(set(diffed) | set(untracked_files(repo_dir)))
+
+
+def merge_ranges(ranges, context):
+    """Widen (start, end) line ranges by context lines and merge overlapping ones."""
+    merged = []
+    for start, end in sorted(ranges):
+        start = max(1, start - context)
+        end = end + context
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def changed_hunks(repo_dir, ref, context=3):
+    """
+    Return {path: [(start, end), ...]} with the changed line ranges of each file.
+
+    Line numbers refer to the current version of the file. Ranges include
+    `context` surrounding lines; an empty list means the whole file is shown,
+    as for new files and for files changed without a content diff (pure
+    renames, mode changes), which changed_files() lists as well.
+    """
+    hunks = {}
+    path = None
+    # Fixed prefixes, whatever diff.noprefix or diff.mnemonicPrefix say
+    diff = _git(
+        repo_dir, "diff", "-U0", "--relative", "--diff-filter=d", "--no-ext-diff", "--no-color",
+        "--src-prefix=a/", "--dst-prefix=b/", ref
+    )
+    for line in diff.splitlines():
+        if line.startswith("+++ "):
+            # git appends a tab to names containing spaces
+            path = line[6:].rstrip("\t") if line.startswith("+++ b/") else None
+            if path is not None:
+                hunks.setdefault(path, [])
+        elif path is not None:
+            match = HUNK_HEADER.match(line)
+            if match:
+                start = int(match.group(1))
+                count = int(match.group(2)) if match.group(2) is not None else 1
+                # A pure deletion has no new lines; show the context around where it was
+                hunks[path].append((max(start, 1), start + max(count, 1) - 1))
+
+    result = {}
+    for path, ranges in hunks.items():
+        result[path] = merge_ranges(ranges, context)
+    for path in changed_files(repo_dir, ref):
+        result.setdefault(path, [])
+    return result
+
+
+def format_ranges(ranges):
+    return ",".join(f"{start}-{end}" for start, end in ranges)
+
+
+def parse_ranges(text):
+    """Parse "12-20,40-52" into [(12, 20), (40, 52)]; an empty string means the whole file."""
+    ranges = []
+    for part in text.split(","):
+        if part.strip():
+            start, _, end = part.partition("-")
+            ranges.append((int(start), int(end or start)))
+    return ranges
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: git_changes.py <directory> <ref> [context_lines]")
+        print("  directory: Directory inside a git work tree; paths are relative to it")
+        print("  ref: Base commit, branch or tag to compare the work tree against")
+        print("  context_lines: If given, also print the changed line ranges of each file")
+        sys.exit(1)
+
+    repo_dir, ref = sys.argv[1], sys.argv[2]
+    try:
+        if len(sys.argv) > 3 and sys.argv[3] != "":
+            for path, ranges in sorted(changed_hunks(repo_dir, ref, int(sys.argv[3])).items()):
+                print(f"{path}\t{format_ranges(ranges)}")
+        else:
+            for path in changed_files(repo_dir, ref):
+                print(path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
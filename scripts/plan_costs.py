@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Estimate the cost of a code2pdf run before rendering it (code2pdf -a --plan).
+
+Reads the same "input<TAB>output<TAB>display<TAB>ranges" job lines as
+code_to_pdf.py --batch, but only reads each file once to count it:
+
+    bytes, lines, pages and tokens (see repo_stats), and predicted seconds
+
+Render time is predicted by a per-line model, seconds_per_file +
+seconds_per_line * lines. It is calibrated by a least-squares fit over the
+run reports of all full code2pdf -a runs so far (--calibrate), and kept
+with the sums of that fit in ~/.cache/code2pdf/render_model.json; until
+then DEFAULT_MODEL is used.
+
+With --archive, the inputs are members of a tar or zip archive, read from
+it without extracting. Binary files are left out, as the batch conversion skips them; generated
+files are left out or counted as their stub as CODE2PDF_GENERATED says.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from source_reader import detect_encoding
+from combined_index import count_lines
+from git_changes import parse_ranges
+from repo_stats import BYTES_PER_TOKEN, estimate_pages
+from generated_files import GeneratedFile, check
+from archive_source import ArchiveSource
+
+MODEL_FILE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "code2pdf", "render_model.json"
+)
+
+# Uncalibrated guess for WeasyPrint on a laptop
+DEFAULT_MODEL = {"seconds_per_file": 0.2, "seconds_per_line": 0.001, "files": 0}
+
+# Fewer files than this do not determine a model
+MIN_CALIBRATION_FILES = 5
+
+# Running totals kept in the model file, from which it is refitted
+SUMS = ("files", "lines", "seconds", "lines_squared", "lines_seconds")
+
+FIELDS = ("bytes", "lines", "pages", "tokens", "seconds")
+
+
+def fit_model(records, previous=None):
+    """
+    Fit seconds = seconds_per_file + seconds_per_line * lines to report records.
+
+    The model keeps the least-squares sums of every record it was fitted to;
+    with a `previous` model, its records count as well, so a small run
+    refines the calibration from larger ones instead of replacing it.
+    Returns None if the records do not determine a model (too few files, or
+    all of the same length).
+    """
+    points = [(record["lines"], record["render_seconds"]) for record in records
+              if record.get("lines") is not None and record.get("render_seconds") is not None]
+    sums = dict.fromkeys(SUMS, 0.0)
+    if previous:
+        sums.update(previous.get("sums") or {})
+    sums["files"] += len(points)
+    sums["lines"] += sum(lines for lines, _ in points)
+    sums["seconds"] += sum(seconds for _, seconds in points)
+    sums["lines_squared"] += sum(lines * lines for lines, _ in points)
+    sums["lines_seconds"] += sum(lines * seconds for lines, seconds in points)
+
+    count = sums["files"]
+    if count < MIN_CALIBRATION_FILES:
+        return None
+    variance = sums["lines_squared"] - sums["lines"] ** 2 / count
+    if variance <= 0:
+        return None
+    per_line = (sums["lines_seconds"] - sums["lines"] * sums["seconds"] / count) / variance
+    per_line = max(per_line, 0.0)
+    per_file = max((sums["seconds"] - per_line * sums["lines"]) / count, 0.0)
+    return {"seconds_per_file": round(per_file, 6), "seconds_per_line": round(per_line, 9),
+            "files": int(count), "sums": sums}
+
+
+def load_model():
+    try:
+        with open(MODEL_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict(DEFAULT_MODEL)
+
+
+def calibrate(report_path):
+    """Add a run report to the stored model and store the refitted one; returns it or None."""
+    try:
+        with open(report_path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return None
+    model = fit_model(records, load_model())
+    if model is None:
+        return None
+    try:
+        os.makedirs(os.path.dirname(MODEL_FILE), exist_ok=True)
+        tmp_file = f"{MODEL_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(model, f)
+        os.replace(tmp_file, MODEL_FILE)
+    except OSError:
+        pass  # Planning falls back to the previous model
+    return model
+
+
+def estimate_file(input_file, display_path, line_ranges, model, generated="keep", archive=None):
+    """Return the cost entry of one job, or None for a binary or skipped generated file."""
+    if archive:
+        data = archive.read(input_file)
+    else:
+        with open(input_file, "rb") as f:
+            data = f.read()
+    encoding = detect_encoding(data)
+    if encoding is None:
+        return None
+    reason = check(input_file, data, encoding, generated)
+    if reason is not None:
+        if generated == "skip":
+            return None
+        data, line_ranges = GeneratedFile(reason).stub_text().encode(), None
+    size = len(data)
+    lines = count_lines(data)
+    if line_ranges:
+        lines = sum(max(0, min(end, lines) - start + 1) for start, end in line_ranges)
+    return {
+        "file": display_path,
+        "bytes": size,
+        "lines": lines,
+        "pages": estimate_pages(lines),
+        "tokens": -(-size // BYTES_PER_TOKEN),
+        "seconds": round(model["seconds_per_file"] + model["seconds_per_line"] * lines, 3),
+    }
+
+
+def plan(stream, model, generated="keep", archive=None):
+    """Return the cost entries for the job lines in stream, in order."""
+    entries = []
+    jobs = [line.rstrip("\n") for line in stream if line.strip("\n")]
+    if archive:
+        archive.expect(line.split("\t", 1)[0] for line in jobs)
+    for line in jobs:
+        fields = line.split("\t")
+        display_path = fields[2] if len(fields) > 2 and fields[2] else fields[0]
+        line_ranges = parse_ranges(fields[3]) if len(fields) > 3 else None
+        entry = estimate_file(fields[0], display_path, line_ranges, model, generated, archive)
+        if entry is not None:
+            entries.append(entry)
+    return entries
+
+
+def summarize(entries, model, top=10):
+    total = {field: sum(entry[field] for entry in entries) for field in FIELDS}
+    total["seconds"] = round(total["seconds"], 3)
+    return {
+        "model": model,
+        "files": entries,
+        "top": sorted(entries, key=lambda entry: -entry["seconds"])[:top],
+        "total": dict(files=len(entries), **total),
+    }
+
+
+def format_duration(seconds):
+    return f"{seconds:.0f}s" if seconds < 60 else f"{seconds / 60:.1f} min"
+
+
+def format_table(summary):
+    entries, total, model = summary["files"], summary["total"], summary["model"]
+    width = max([len("Total")] + [len(entry["file"]) for entry in entries])
+
+    def row(name, values):
+        return (f"{name:<{width}}" + "".join(f"{values[field]:>12}" for field in FIELDS[:-1])
+                + f"{values['seconds']:>11.1f}s")
+
+    header = f"{'File':<{width}}" + "".join(f"{field.capitalize():>12}" for field in FIELDS)
+    lines = [header] + [row(entry["file"], entry) for entry in entries]
+    lines += ["", "Top offenders:", header] + [row(entry["file"], entry) for entry in summary["top"]]
+    lines += ["", row("Total", total)]
+    source = (f"calibrated on {model['files']} files" if model.get("files")
+              else "default, not calibrated yet")
+    lines.append(f"{total['files']} files; predicted render time {format_duration(total['seconds'])} "
+                 f"({model['seconds_per_file']:g}s per file + "
+                 f"{model['seconds_per_line'] * 1000:g}ms per line, {source})")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate the cost of code2pdf jobs read from stdin.")
+    parser.add_argument("--format", choices=("table", "json"), default="table",
+                        help="Output format (default: table)")
+    parser.add_argument("--top", type=int, default=10, help="Number of top offenders to list (default: 10)")
+    parser.add_argument("--archive", help="Read the inputs as members of this tar or zip archive")
+    parser.add_argument("--calibrate", metavar="REPORT",
+                        help="Fit the render time model to a run report instead of planning")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        model = calibrate(args.calibrate)
+        if model:
+            print(f"Info: Render time model: {model['seconds_per_file']:g}s per file + "
+                  f"{model['seconds_per_line'] * 1000:g}ms per line ({model['files']} files)",
+                  file=sys.stderr)
+        sys.exit(0)
+
+    model = load_model()
+    try:
+        archive = ArchiveSource(args.archive) if args.archive else None
+        entries = plan(sys.stdin, model, os.environ.get("CODE2PDF_GENERATED", "keep"), archive)
+        if archive:
+            archive.close()
+    except (OSError, KeyError) as e:
+        print(f"Error reading file: {e}", file=sys.stderr)
+        sys.exit(1)
+    summary = summarize(entries, model, args.top)
+    if args.format == "json":
+        print(json.dumps(summary, indent=2))
+    else:
+        print(format_table(summary), end="")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Group the per-file PDFs of a code2pdf run into volumes (--volume-pages, --volume-size).
+
+Files are taken from the run report (see code_to_pdf.append_report) in the
+order of the merge. Volumes are only broken between directories: the files
+of one directory stay together, and directories are packed into a volume
+until the next one would exceed the limit. A directory that is larger than
+the limit on its own is split between files.
+
+Prints one "volume<TAB>pdf" line per file and, with --contents, writes the
+text of the master table of contents listing which volume holds which file.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from write_combined import parse_size
+
+
+def load_report(report_path):
+    """Return the report records with a PDF, sorted like the merge (by PDF name)."""
+    with open(report_path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted((record for record in records if record.get("pdf")),
+                  key=lambda record: os.path.basename(record["pdf"]))
+
+
+def directory_runs(records):
+    """Split records into runs of consecutive files with the same parent directory."""
+    runs = []
+    for record in records:
+        directory = os.path.dirname(record["file"])
+        if runs and os.path.dirname(runs[-1][-1]["file"]) == directory:
+            runs[-1].append(record)
+        else:
+            runs.append([record])
+    return runs
+
+
+def plan_volumes(records, limit, weight):
+    """
+    Pack records into volumes of at most `limit`, measured by weight(record).
+
+    Returns a list of volumes, each a list of records. A single file above
+    the limit gets a volume of its own.
+    """
+    volumes = [[]]
+    used = 0
+    for run in directory_runs(records):
+        run_weight = sum(weight(record) for record in run)
+        if volumes[-1] and used + run_weight > limit:
+            volumes.append([])
+            used = 0
+        if run_weight <= limit:
+            volumes[-1].extend(run)
+            used += run_weight
+            continue
+        # Too large for any volume: fill volumes file by file
+        for record in run:
+            if volumes[-1] and used + weight(record) > limit:
+                volumes.append([])
+                used = 0
+            volumes[-1].append(record)
+            used += weight(record)
+    return [volume for volume in volumes if volume]
+
+
+def volume_name(prefix, number):
+    return f"{prefix}-{number:02d}.pdf"
+
+
+def format_contents(volumes, prefix):
+    """Text of the master table of contents."""
+    lines = []
+    for number, volume in enumerate(volumes, 1):
+        pages = sum(record.get("pages") or 0 for record in volume)
+        lines.append(f"Volume {number}: {volume_name(prefix, number)} "
+                     f"({len(volume)} files, {pages} pages)")
+        lines.extend(f"    {record['file']}" for record in volume)
+        lines.append("")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Group the PDFs of a code2pdf run into volumes.")
+    parser.add_argument("report", help="Run report written by code_to_pdf.py (CODE2PDF_REPORT)")
+    limits = parser.add_mutually_exclusive_group(required=True)
+    limits.add_argument("--pages", type=int, help="Maximum pages per volume")
+    limits.add_argument("--size", help="Maximum size of the per-file PDFs in a volume (e.g. 50M)")
+    parser.add_argument("--prefix", default="merged", help="Volume file name prefix (default: merged)")
+    parser.add_argument("--contents", help="Write the master table of contents text here")
+    args = parser.parse_args()
+
+    if args.pages is not None:
+        limit, weight = args.pages, lambda record: record.get("pages") or 1
+    else:
+        limit, weight = parse_size(args.size), lambda record: os.path.getsize(record["pdf"])
+
+    volumes = plan_volumes(load_report(args.report), limit, weight)
+    if not volumes:
+        print("Error: No converted files in the run report", file=sys.stderr)
+        sys.exit(1)
+    for number, volume in enumerate(volumes, 1):
+        for record in volume:
+            print(f"{number:02d}\t{record['pdf']}")
+    if args.contents:
+        with open(args.contents, "w", encoding="utf-8") as f:
+            f.write(format_contents(volumes, args.prefix))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Concurrent, ordered prefetching of file reads.
+
+On high-latency storage (NFS checkouts in CI) every stat and read is a round
+trip, so reading files one after another is bound by latency rather than
+bandwidth. These helpers keep a bounded number of reads in flight on a thread
+pool while handing results back in the original order, as soon as the next
+item in order is ready.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Default number of concurrent reads
+DEFAULT_JOBS = 8
+
+# Default cap on bytes read ahead of the writer
+DEFAULT_MAX_BUFFERED = 64 * 1024 * 1024
+
+_END = object()
+
+
+def _capture(function, item):
+    """Call function(item), returning an exception instead of raising it."""
+    try:
+        return function(item)
+    except Exception as e:  # Handed to the consumer in order with its item
+        return e
+
+
+def map_ordered(function, items, jobs=DEFAULT_JOBS):
+    """
+    Apply function to every item concurrently and return the results in order.
+
+    Exceptions are returned in place of results. Used for cheap per-file work
+    such as stat calls and bounded sample reads.
+    """
+    if jobs <= 1:
+        return [_capture(function, item) for item in items]
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(lambda item: _capture(function, item), items))
+
+
+def prefetch_ordered(items, load, jobs=DEFAULT_JOBS, max_buffered=DEFAULT_MAX_BUFFERED,
+                     size_of=lambda item: 0):
+    """
+    Yield (item, load(item)) in the order of items while loading ahead concurrently.
+
+    At most `jobs` loads run at once, and new loads are only started while the
+    expected size (size_of) of everything loaded but not yet consumed stays
+    within max_buffered; the next item in order is always allowed, so a single
+    file larger than the cap still goes through. Exceptions raised by load are
+    yielded in place of the result.
+    """
+    if jobs <= 1:
+        for item in items:
+            yield item, _capture(load, item)
+        return
+
+    window = jobs * 4
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        buffered = 0
+        remaining = iter(items)
+        next_item = next(remaining, _END)
+        while pending or next_item is not _END:
+            while next_item is not _END and len(pending) < window:
+                size = size_of(next_item)
+                if pending and buffered + size > max_buffered:
+                    break
+                pending.append((next_item, pool.submit(_capture, load, next_item), size))
+                buffered += size
+                next_item = next(remaining, _END)
+            item, future, size = pending.popleft()
+            result = future.result()
+            buffered -= size
+            yield item, result
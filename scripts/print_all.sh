@@ -5,8 +5,15 @@ declare -a visited_dirs=() # to avoid symbolic link recursion
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
 # If no argument is provided, use current directory as default
-# Convert ROOT_DIR to absolute path immediately when setting it
-ROOT_DIR=$(cd "${1:-.}" && pwd)
+# Convert ROOT_DIR to absolute path immediately when setting it. A tar or zip
+# archive is read in place of a directory, and merged.pdf goes to the current one.
+ARCHIVE=''
+if [ -f "${1:-.}" ]; then
+    ARCHIVE="$(cd "$(dirname "$1")" && pwd)/$(basename "$1")"
+    ROOT_DIR=$(pwd)
+else
+    ROOT_DIR=$(cd "${1:-.}" && pwd)
+fi
 
 # Get vimrc path
 VIMRC_PATH=$2
@@ -21,15 +28,31 @@ IGNORE_FILES=${8:-''}  # Comma-separated list of specific files to ignore
 IGNORE_TYPES=${9:-''}  # Comma-separated list of file extensions to ignore
 IGNORE_FOLDERS=${10:-''}  # Additional folders to skip
 INCLUDE_TYPES=${11:-''}  # If specified, only include these types
+OPTIMIZE_PDF=${12:-false}  # "true" writes merged.pdf with object streams, subset fonts and shared resources
+SINCE_REF=${13:-''}  # If specified, only convert files changed since this git ref
+HUNK_CONTEXT=${14:-''}  # If specified (with SINCE_REF), only render changed hunks with this much context
+WATCH=${15:-false}  # "true" keeps running and rebuilds merged.pdf when files change
+STATS_FORMAT=${16:-''}  # "table" or "json": print size statistics per language and directory
+STATS_ONLY=${17:-false}  # "true" prints the statistics without rendering any PDF
+VOLUME_PAGES=${18:-''}  # If specified, split the output into volumes of at most this many pages
+VOLUME_SIZE=${19:-''}  # If specified, split the output into volumes of about this size (e.g. 50M)
+SHARD=${20:-''}  # "i/N": only convert shard i of N (by size) into SHARD_DIR, without merging
+SHARD_DIR=${21:-''}  # Shared directory holding the PDFs and markers of all shards
+ASSEMBLE=${22:-false}  # "true" merges the finished shards in SHARD_DIR instead of converting
+PLAN_FORMAT=${23:-''}  # "table" or "json": print the files and their estimated cost without rendering
+SCAN_CACHE=${24:-false}  # "true" walks the tree with the persistent scan manifest
 
 vim --version >&2
 echo "DEBUG: Starting script execution..." >&2
 echo "DEBUG: Working directory: $(pwd)" >&2
 echo "DEBUG: ROOT_DIR: $ROOT_DIR" >&2
+echo "DEBUG: ARCHIVE: $ARCHIVE" >&2
 echo "DEBUG: IGNORE_TYPES: $IGNORE_TYPES" >&2
 echo "DEBUG: IGNORE_FILES: $IGNORE_FILES" >&2
 echo "DEBUG: IGNORE_FOLDERS: $IGNORE_FOLDERS" >&2
 echo "DEBUG: INCLUDE_TYPES: $INCLUDE_TYPES" >&2
+echo "DEBUG: OPTIMIZE_PDF: $OPTIMIZE_PDF" >&2
+echo "DEBUG: SINCE_REF: $SINCE_REF" >&2
 
 # Convert comma-separated lists to arrays (like code2txt does)
 IFS=',' read -ra IGNORE_TYPES_ARRAY <<< "$IGNORE_TYPES"
@@ -87,7 +110,7 @@ should_process_file() {
 
 # Count lines in all .ts files excluding those in node_modules and display file names
 # find "$ROOT_DIR" -name "node_modules" -prune -o -name "*$EXTENSION" -type f -print | xargs wc -l
-echo "printing all src files in $ROOT_DIR"
+[ "$STATS_ONLY" == "true" ] || [ -n "$PLAN_FORMAT" ] || echo "printing all src files in ${ARCHIVE:-$ROOT_DIR}"
 
 ##########################################3
 # Step 1. Print all src files into /tmp/ 
@@ -100,10 +123,24 @@ generate_pdf_file_name () {
     echo "$output"
 }
 
+# Conversion jobs, one "input<TAB>output<TAB>display path<TAB>ranges" line per
+# file. They are all rendered by a single code_to_pdf.py --batch process, so
+# fonts and WeasyPrint are loaded once per run instead of once per file.
+PDF_JOBS_FILE="/tmp/code2pdf_jobs.tsv"
+
+# --stats: counted by code_to_pdf.py while rendering and printed after the merge
+STATS_FILE="/tmp/code2pdf_stats.txt"
+declare -a batch_options=()
+
+# The Python helpers read archive members from the archive itself
+declare -a archive_options=()
+[ -n "$ARCHIVE" ] && archive_options=(--archive "$ARCHIVE")
+
 print_to_pdf () {
     file_name="$1"
+    line_ranges="${2:-}"  # Optional "12-20,40-52" to render only those lines
     echo "DEBUG: ===================" >&2
-    echo "DEBUG: Converting file: $file_name" >&2
+    echo "DEBUG: Queueing file: $file_name" >&2
     pdf_name="$( generate_pdf_file_name "$file_name")"
     # Check if the input is empty or has unexpected characters
     if [[ -z $pdf_name ]]; then
@@ -112,36 +149,51 @@ print_to_pdf () {
     fi
     echo "DEBUG: generated pdf_name in /tmp folder: $pdf_name" >&2
 
-    # Get relative path from ROOT_DIR for display in PDF header
-    relative_path=$(realpath --relative-to="$ROOT_DIR" "$file_name")
+    # Get relative path from ROOT_DIR for display in PDF header (archive members already are)
+    if [ -n "$ARCHIVE" ]; then
+        relative_path="$file_name"
+    else
+        relative_path=$(realpath --relative-to="$ROOT_DIR" "$file_name")
+    fi
 
-    # Convert using Python script with UTF-8 support
-    python3 "$SCRIPT_DIR/code_to_pdf.py" "$file_name" "/tmp/$pdf_name.pdf" "$relative_path"
+    local output_pdf="/tmp/$pdf_name.pdf"
+    if [ -n "$SHARD" ]; then
+        # Shards may check out the tree in different places: name by relative path
+        output_pdf="$SHARD_DIR/$( generate_pdf_file_name "$relative_path" ).pdf"
+    fi
 
-    if [ $? -ne 0 ]; then
-        echo "Error: Failed to convert $file_name to PDF" >&2
-        exit 1
+    printf '%s\t%s\t%s\t%s\n' "$file_name" "$output_pdf" "$relative_path" "$line_ranges" >> "$PDF_JOBS_FILE"
+}
+
+# Convert every queued file with one Python process; binary files are skipped.
+# Returns 1 on failure, which ends a one-shot run but not --watch
+convert_queued_files () {
+    [ -s "$PDF_JOBS_FILE" ] || return 0
+    echo "DEBUG: Converting $(wc -l < "$PDF_JOBS_FILE") files" >&2
+    if ! python3 "$SCRIPT_DIR/code_to_pdf.py" --batch "${batch_options[@]}" "${archive_options[@]}" < "$PDF_JOBS_FILE"; then
+        echo "Error: Failed to convert files to PDF" >&2
+        return 1
     fi
     echo "DEBUG: PDF conversion complete" >&2
 }
 
-print_files_in_a_folder() {
-    # Quoted assignment, in case $1 has spaces
-    folder="$1"
+# Parse the JSON strings into bash arrays once for the whole run
+declare -a blacklisted_folders=($(echo "$BLACKLISTED_FOLDERS_JSON" | jq -r '.[]'))
+blacklisted_folder_pattern="$BLACKLISTED_FOLDER_PATTERN"
+declare -a whitelisted_file_extensions=($(echo "$WHITELISTED_FILE_EXTENSIONS_JSON" | jq -r '.[]'))
+declare -a whitelisted_file_names=($(echo "$WHITELISTED_FILE_NAMES_JSON" | jq -r '.[]'))
+include_no_extension="$INCLUDE_NO_EXTENSION"
 
-    # Parse the JSON strings into bash arrays for existing parameters
-    declare -a blacklisted_folders=($(echo "$BLACKLISTED_FOLDERS_JSON" | jq -r '.[]'))
-    blacklisted_folder_pattern="$BLACKLISTED_FOLDER_PATTERN"
-    declare -a whitelisted_file_extensions=($(echo "$WHITELISTED_FILE_EXTENSIONS_JSON" | jq -r '.[]'))
-    declare -a whitelisted_file_names=($(echo "$WHITELISTED_FILE_NAMES_JSON" | jq -r '.[]'))
-    include_no_extension="$INCLUDE_NO_EXTENSION"
+# Returns 0 if a folder (given by its path) must be skipped
+is_skipped_folder() {
+    local folder="$1"
+    local folder_basename=$(basename "$folder")
 
     # Check if the folder's basename is in the blacklist array
-    folder_basename=$(basename "$folder")
     for blacklist in "${blacklisted_folders[@]}"; do
     if [[ "$folder_basename" == "$blacklist" ]]; then
         echo "DEBUG: Skipping blacklisted folder: $folder" >&2
-        return
+        return 0
     fi
     done
     
@@ -149,13 +201,70 @@ print_files_in_a_folder() {
     for ignore_folder in "${IGNORE_FOLDERS_ARRAY[@]}"; do
     if [[ "$folder_basename" == "$ignore_folder" ]]; then
         echo "DEBUG: Skipping ignored folder: $folder" >&2
-        return
+        return 0
     fi
     done
 
     # Check if the folder's basename matches the blacklisted pattern (e.g. env*)
     if [[ "$folder_basename" == $blacklisted_folder_pattern ]]; then
         echo "DEBUG: Skipping folder matching blacklisted pattern: $folder" >&2
+        return 0
+    fi
+
+    return 1
+}
+
+# Returns 0 if a file passes both the filtering logic and the original whitelist logic
+is_selected_file() {
+    local entry="$1"
+
+    # First check using the new filtering logic
+    should_process_file "$entry" || return 1
+
+    # Now check against the original whitelist logic
+    local base_name=$(basename "$entry")
+    local filename="${base_name%.*}"      # text before the last dot
+    local extension="${base_name##*.}"    # text after the last dot
+
+    echo "DEBUG: Processing file: $entry" >&2
+    echo "DEBUG: filename: $filename" >&2
+    echo "DEBUG: extension: $extension" >&2
+    echo "DEBUG: include_no_extension: $include_no_extension" >&2
+
+    # If include-types was specified and file passed should_process_file, process it
+    if [ -n "$INCLUDE_TYPES" ]; then
+        return 0
+    fi
+
+    # Check against original whitelist logic
+    # Handle files without extension
+    if [ "$filename" == "$extension" ] && [ "$include_no_extension" == "true" ]; then
+        echo "DEBUG: Found file without extension, setting process_file=true" >&2
+        return 0
+    fi
+
+    # Check if the extension is in the whitelist
+    for allowed_extension in "${whitelisted_file_extensions[@]}"; do
+        if [ "$extension" == "$allowed_extension" ]; then
+            return 0
+        fi
+    done
+
+    # Check if the whole filename is in the whitelist
+    for allowed_name in "${whitelisted_file_names[@]}"; do
+        if [ "$base_name" == "$allowed_name" ]; then
+            return 0
+        fi
+    done
+
+    return 1
+}
+
+print_files_in_a_folder() {
+    # Quoted assignment, in case $1 has spaces
+    folder="$1"
+
+    if is_skipped_folder "$folder"; then
         return
     fi
 
@@ -167,52 +276,10 @@ print_files_in_a_folder() {
         [ -e "$entry" ] || continue
 
         if [ -f "$entry" ]; then
-            # First check using the new filtering logic
-            if should_process_file "$entry"; then
-                # Now check against the original whitelist logic
-                base_name=$(basename "$entry")
-                filename="${base_name%.*}"      # text before the last dot
-                extension="${base_name##*.}"    # text after the last dot
-                process_file=false
-
-                echo "DEBUG: Processing file: $entry" >&2
-                echo "DEBUG: filename: $filename" >&2
-                echo "DEBUG: extension: $extension" >&2
-                echo "DEBUG: include_no_extension: $include_no_extension" >&2
-
-                # If include-types was specified and file passed should_process_file, process it
-                if [ -n "$INCLUDE_TYPES" ]; then
-                    process_file=true
-                else
-                    # Check against original whitelist logic
-                    # Handle files without extension
-                    if [ "$filename" == "$extension" ] && [ "$include_no_extension" == "true" ]; then
-                        echo "DEBUG: Found file without extension, setting process_file=true" >&2
-                        process_file=true
-                    else
-                        # Check if the extension is in the whitelist
-                        for allowed_extension in "${whitelisted_file_extensions[@]}"; do
-                            if [ "$extension" == "$allowed_extension" ]; then
-                                process_file=true
-                                break
-                            fi
-                        done
-                    fi
-
-                    # Check if the whole filename is in the whitelist
-                    for allowed_name in "${whitelisted_file_names[@]}"; do
-                        if [ "$base_name" == "$allowed_name" ]; then
-                            process_file=true
-                            break
-                        fi
-                    done
-                fi
-
-                # If flagged for processing, convert to PDF
-                if [ "$process_file" == "true" ]; then
-                    print_to_pdf "$entry"
-                    echo "PROGRESS: Processed $entry" >&2
-                fi
+            # If flagged for processing, convert to PDF
+            if is_selected_file "$entry"; then
+                print_to_pdf "$entry"
+                echo "PROGRESS: Queued $entry" >&2
             fi
 
         else
@@ -230,9 +297,237 @@ print_files_in_a_folder() {
     done
 }
 
-rm /tmp/*.ps
-rm /tmp/*.pdf
-print_files_in_a_folder "$ROOT_DIR"
+# --scan-cache: let scan_manifest.py walk the tree with the same folder and
+# file filters; it only lists the directories changed since the last run
+print_cached_files() {
+    local listing
+    listing=$(python3 "$SCRIPT_DIR/scan_manifest.py" "$ROOT_DIR" --tool code2pdf \
+        --ignore-folders "$(echo "$BLACKLISTED_FOLDERS_JSON" | jq -r 'join(",")'),$IGNORE_FOLDERS" \
+        --folder-pattern "$blacklisted_folder_pattern" \
+        --ignore-files "$IGNORE_FILES" --ignore-types "$IGNORE_TYPES" --include-types "$INCLUDE_TYPES" \
+        --allow-types "$(echo "$WHITELISTED_FILE_EXTENSIONS_JSON" | jq -r 'join(",")')" \
+        --allow-names "$(echo "$WHITELISTED_FILE_NAMES_JSON" | jq -r 'join(",")')" \
+        $([ "$include_no_extension" == "true" ] && echo --allow-no-extension) --verbose) || {
+        echo "Error: Could not scan $ROOT_DIR" >&2
+        exit 1
+    }
+
+    local relative_path
+    while IFS= read -r relative_path; do
+        [ -n "$relative_path" ] || continue
+        print_to_pdf "$ROOT_DIR/$relative_path"
+        echo "PROGRESS: Queued $ROOT_DIR/$relative_path" >&2
+    done <<< "$listing"
+}
+
+# Returns 0 if any directory on a path relative to ROOT_DIR must be skipped
+is_in_skipped_folder() {
+    local dir=$(dirname "$1")
+    while [ "$dir" != "." ] && [ "$dir" != "/" ]; do
+        if is_skipped_folder "$dir"; then
+            return 0
+        fi
+        dir=$(dirname "$dir")
+    done
+    return 1
+}
+
+# Archive mode: queue the members of the archive through the same folder and
+# file filters; they are read from the archive when converted, not extracted
+print_archive_members() {
+    local members
+    members=$(python3 "$SCRIPT_DIR/archive_source.py" list "$ARCHIVE") || {
+        echo "Error: Could not list the files in $ARCHIVE" >&2
+        exit 1
+    }
+
+    local relative_path
+    while IFS= read -r relative_path; do
+        [ -n "$relative_path" ] || continue
+        is_in_skipped_folder "$relative_path" && continue
+
+        if is_selected_file "$relative_path"; then
+            print_to_pdf "$relative_path"
+            echo "PROGRESS: Queued $relative_path" >&2
+        fi
+    done <<< "$members"
+}
+
+# --since mode: convert only the files git reports as changed, through the same
+# folder and file filters, instead of walking the whole tree
+print_changed_files() {
+    local changes
+    changes=$(python3 "$SCRIPT_DIR/git_changes.py" "$ROOT_DIR" "$SINCE_REF" "$HUNK_CONTEXT") || {
+        echo "Error: Could not list changes since '$SINCE_REF'" >&2
+        exit 1
+    }
+
+    local relative_path ranges
+    while IFS=$'\t' read -r relative_path ranges; do
+        [ -n "$relative_path" ] || continue
+        local entry="$ROOT_DIR/$relative_path"
+        [ -f "$entry" ] || continue
+
+        is_in_skipped_folder "$relative_path" && continue
+
+        if is_selected_file "$entry"; then
+            print_to_pdf "$entry" "$ranges"
+            echo "PROGRESS: Queued $entry${ranges:+ (lines $ranges)}" >&2
+        fi
+    done <<< "$changes"
+}
+
+# Sharding (--shard i/N): every machine walks the same tree, keeps its share of
+# the jobs (shard_jobs.py balances them by size) and converts them into the
+# shared SHARD_DIR. A marker listing its PDFs tells --assemble it is finished;
+# its first line ("jobs HASH") identifies the full job list all shards split,
+# with the file sizes the assignment was computed from.
+select_shard_jobs () {
+    touch "$PDF_JOBS_FILE"
+    mv "$PDF_JOBS_FILE" "$PDF_JOBS_FILE.all"
+    if ! python3 "$SCRIPT_DIR/shard_jobs.py" "$SHARD" "${archive_options[@]}" \
+            --hash-file "$PDF_JOBS_FILE.hash" < "$PDF_JOBS_FILE.all" > "$PDF_JOBS_FILE"; then
+        echo "Error: Could not select the jobs of shard $SHARD" >&2
+        exit 1
+    fi
+    JOB_LIST_HASH=$(cat "$PDF_JOBS_FILE.hash")
+    rm -f "$PDF_JOBS_FILE.all" "$PDF_JOBS_FILE.hash"
+}
+
+# Drop the results of an earlier build, so skipped files are not listed as converted
+clear_shard_outputs () {
+    rm -f "$SHARD_DIR/$SHARD_NAME.done" "$CODE2PDF_REPORT" "$STATS_FILE"
+    local input output rest
+    while IFS=$'\t' read -r input output rest; do
+        rm -f "$output"
+    done < "$PDF_JOBS_FILE"
+}
+
+finish_shard () {
+    local input output rest converted=0
+    {
+        echo "jobs $JOB_LIST_HASH"
+        while IFS=$'\t' read -r input output rest; do
+            [ -f "$output" ] && basename "$output" && converted=$((converted + 1))
+        done < "$PDF_JOBS_FILE"
+    } > "$SHARD_DIR/$SHARD_NAME.done.tmp"
+    mv "$SHARD_DIR/$SHARD_NAME.done.tmp" "$SHARD_DIR/$SHARD_NAME.done"
+    echo "Success: Shard $SHARD converted $converted files into $SHARD_DIR" >&2
+}
+
+# --assemble: link the PDFs of all finished shards into /tmp, where the table
+# of contents and the merge pick them up in the usual order, and combine the
+# shards' run reports
+assemble_shards () {
+    local markers=("$SHARD_DIR"/shard-*-of-*.done)
+    if [ ! -e "${markers[0]}" ]; then
+        echo "Error: No finished shards in $SHARD_DIR" >&2
+        exit 1
+    fi
+    local count="${markers[0]##*-of-}"
+    count="${count%.done}"
+    local marker i name
+    for marker in "${markers[@]}"; do
+        if [[ "$marker" != *"-of-$count.done" ]]; then
+            echo "Error: $SHARD_DIR holds shards of different runs; use one directory per build" >&2
+            exit 1
+        fi
+    done
+    for i in $(seq 1 "$count"); do
+        if [ ! -f "$SHARD_DIR/shard-$i-of-$count.done" ]; then
+            echo "Error: Shard $i/$count has not finished" >&2
+            exit 1
+        fi
+    done
+    # Shards that walked different trees or filters would leave files out, or merge them twice
+    local jobs="" marker_jobs
+    for marker in "${markers[@]}"; do
+        read -r marker_jobs < "$marker"
+        [ -n "$jobs" ] || jobs="$marker_jobs"
+        if [[ "$marker_jobs" != "jobs "* ]] || [ "$marker_jobs" != "$jobs" ]; then
+            echo "Error: The shards in $SHARD_DIR were built from different file lists or file sizes; rebuild them in a new --shard-dir" >&2
+            exit 1
+        fi
+    done
+    echo "DEBUG: Assembling $count shards from $SHARD_DIR" >&2
+    for marker in "${markers[@]}"; do
+        while IFS= read -r name; do
+            ln -sf "$SHARD_DIR/$name" "/tmp/$name"
+        done < <(tail -n +2 "$marker")
+        # Point the report at the linked PDFs, wherever the shard mounted SHARD_DIR
+        [ -f "${marker%.done}.jsonl" ] && jq -c '.pdf |= if . then "/tmp/" + (split("/") | last) else . end' \
+            "${marker%.done}.jsonl" >> "$CODE2PDF_REPORT"
+    done
+}
+
+# Clear the previous run's files, unless nothing will be rendered here (--plan,
+# --stats-only) or the PDFs go to SHARD_DIR
+if [ -z "$SHARD" ] && [ -z "$PLAN_FORMAT" ] && [ "$STATS_ONLY" != "true" ]; then
+    rm /tmp/*.ps
+    rm /tmp/*.pdf
+fi
+
+# Lockfiles, minified and generated files are skipped unless --generated says otherwise
+export CODE2PDF_GENERATED="${CODE2PDF_GENERATED:-skip}"
+
+# Run report: code_to_pdf.py appends one JSON line per converted file
+# (lexer, bytes, lexing time, highlighting fallback)
+export CODE2PDF_REPORT="/tmp/code2pdf_report.jsonl"
+if [ -n "$SHARD" ]; then
+    # Keep each shard's files apart, also when shards run on the same machine
+    SHARD_NAME="shard-${SHARD%/*}-of-${SHARD#*/}"
+    mkdir -p "$SHARD_DIR" || exit 1
+    PDF_JOBS_FILE="$SHARD_DIR/$SHARD_NAME.tsv"
+    CODE2PDF_REPORT="$SHARD_DIR/$SHARD_NAME.jsonl"
+    STATS_FILE="$SHARD_DIR/$SHARD_NAME.stats"
+    rm -f "$PDF_JOBS_FILE"
+else
+    rm -f "$CODE2PDF_REPORT" "$PDF_JOBS_FILE" "$STATS_FILE"
+fi
+
+if [ "$ASSEMBLE" == "true" ]; then
+    assemble_shards
+elif [ -n "$ARCHIVE" ]; then
+    print_archive_members
+elif [ -n "$SINCE_REF" ]; then
+    echo "DEBUG: Only converting files changed since $SINCE_REF" >&2
+    print_changed_files
+elif [ "$SCAN_CACHE" == "true" ]; then
+    print_cached_files
+else
+    print_files_in_a_folder "$ROOT_DIR"
+fi
+[ -n "$SHARD" ] && select_shard_jobs
+
+# --plan: estimate the cost of the queued files instead of rendering them, and stop
+if [ -n "$PLAN_FORMAT" ]; then
+    [ -s "$PDF_JOBS_FILE" ] || { echo "Warning: No files were selected." >&2; exit 1; }
+    python3 "$SCRIPT_DIR/plan_costs.py" --format "$PLAN_FORMAT" "${archive_options[@]}" < "$PDF_JOBS_FILE"
+    exit $?
+fi
+
+# --stats-only: count the queued files instead of rendering them, and stop
+if [ "$STATS_ONLY" == "true" ]; then
+    [ -s "$PDF_JOBS_FILE" ] || { echo "Warning: No files were selected." >&2; exit 1; }
+    python3 "$SCRIPT_DIR/code_to_pdf.py" --batch --stats-only --stats "${STATS_FORMAT:-table}" \
+        "${archive_options[@]}" < "$PDF_JOBS_FILE"
+    exit $?
+fi
+[ -n "$SHARD" ] && clear_shard_outputs
+[ -n "$STATS_FORMAT" ] && batch_options=(--stats "$STATS_FORMAT" --stats-file "$STATS_FILE")
+convert_queued_files || exit 1
+batch_options=()
+
+# Calibrate the render time model of --plan on every run that renders whole files
+if [ "$ASSEMBLE" != "true" ] && [ -z "$HUNK_CONTEXT" ]; then
+    python3 "$SCRIPT_DIR/plan_costs.py" --calibrate "$CODE2PDF_REPORT"
+fi
+
+if [ -n "$SHARD" ]; then
+    finish_shard
+    [ -s "$STATS_FILE" ] && cat "$STATS_FILE"
+    exit 0
+fi
 
 
 ##########################################3
@@ -246,57 +541,218 @@ generate_orig_file_name () {
     echo "$output"
 }
 
-cd /tmp
-rm table_of_contents
-touch table_of_contents
+generate_table_of_contents () {
+    cd /tmp
+    rm -f table_of_contents 00_table_of_contents.pdf
+    touch table_of_contents
 
-echo "generating the table of contents"
-for entry in *.pdf; do
-    orig_file_name="$( generate_orig_file_name "$entry" )"
-    echo "$orig_file_name" >> table_of_contents
-done
-echo "Info: Contents of table_of_contents:" >&2
-cat table_of_contents >&2
+    echo "generating the table of contents"
+    for entry in *.pdf; do
+        orig_file_name="$( generate_orig_file_name "$entry" )"
+        echo "$orig_file_name" >> table_of_contents
+    done
+    echo "Info: Contents of table_of_contents:" >&2
+    cat table_of_contents >&2
 
-# Convert table of contents using Python script with UTF-8 support
-python3 "$SCRIPT_DIR/code_to_pdf.py" table_of_contents 00_table_of_contents.pdf "Table of Contents"
+    # Convert table of contents using Python script with UTF-8 support
+    CODE2PDF_REPORT="" python3 "$SCRIPT_DIR/code_to_pdf.py" table_of_contents 00_table_of_contents.pdf "Table of Contents"
+}
+
+# Summarize the run report: files that fell back to plain text, and lexing
+# throughput per language for tuning the highlighting budget
+summarize_report () {
+    if [ -s "$CODE2PDF_REPORT" ]; then
+        echo "Info: Highlighting fallbacks:" >&2
+        jq -r 'select(.fallback != null) | "  \(.file): \(.fallback)"' "$CODE2PDF_REPORT" >&2
+        echo "Info: Lexing throughput per language (files, bytes, KiB/s):" >&2
+        jq -s -r 'map(select(.fallback == null)) | group_by(.lexer)[]
+            | "  \(.[0].lexer): \(length) files, \(map(.bytes) | add) bytes, \((map(.bytes) | add) / ([(map(.lex_seconds) | add), 0.000001] | max) / 1024 | floor) KiB/s"' \
+            "$CODE2PDF_REPORT" >&2
+        echo "Info: Full run report: $CODE2PDF_REPORT" >&2
+    fi
+}
 
 ##########################################3
 # Step 3. Merge all /tmp/*.pdf into a single pdf
 ##########################################3
-echo "Debug: Starting final merge step..." >&2
-echo "Debug: Current working directory: $(pwd)" >&2
-echo "Debug: ROOT_DIR value: $ROOT_DIR" >&2
-
-# Clean up any existing merged PDF
-echo "Debug: Removing any existing merged.pdf" >&2
-rm -f "$ROOT_DIR/merged.pdf"
-
-# Merge PDFs with explicit error checking
-echo "merging all pdf files into a single file named merged.pdf" >&2
-if ! gs -q -dNOPAUSE -dBATCH -sDEVICE=pdfwrite -sOutputFile=/tmp/merged.pdf /tmp/*.pdf >&2; then
-    echo "Error: PDF merge failed" >&2
-    exit 1
-fi
 
-# Check if merge was successful
-if [ ! -f "/tmp/merged.pdf" ]; then
-    echo "Error: Merged PDF was not created" >&2
-    exit 1
+# Size optimization: PDF 1.5 enables compressed object streams and xref streams,
+# fonts are re-subset and compressed across the whole document, and identical
+# images/resources coming from different per-file PDFs are written only once.
+declare -a gs_options=()
+if [ "$OPTIMIZE_PDF" == "true" ]; then
+    gs_options=(
+        -dCompatibilityLevel=1.5
+        -dWriteObjStreams=true
+        -dWriteXRefStm=true
+        -dSubsetFonts=true
+        -dCompressFonts=true
+        -dCompressPages=true
+        -dDetectDuplicateImages=true
+    )
+    echo "Debug: Writing size-optimized PDF: ${gs_options[*]}" >&2
 fi
 
-# Move with explicit error checking
-echo "Debug: Moving merged PDF to final location" >&2
-if ! mv "/tmp/merged.pdf" "$ROOT_DIR/merged.pdf"; then
-    echo "Error: Failed to move merged PDF" >&2
-    exit 1
-fi
+# Returns 1 on failure, which ends a one-shot run but not --watch
+merge_pdfs () {
+    echo "Debug: Starting final merge step..." >&2
+    echo "Debug: Current working directory: $(pwd)" >&2
+    echo "Debug: ROOT_DIR value: $ROOT_DIR" >&2
+
+    # Clean up any existing merged PDF
+    echo "Debug: Removing any existing merged.pdf" >&2
+    rm -f "$ROOT_DIR/merged.pdf"
+
+    # Merge PDFs with explicit error checking
+    echo "merging all pdf files into a single file named merged.pdf" >&2
+    if ! gs -q -dNOPAUSE -dBATCH -sDEVICE=pdfwrite "${gs_options[@]}" -sOutputFile=/tmp/merged.pdf /tmp/*.pdf >&2; then
+        echo "Error: PDF merge failed" >&2
+        return 1
+    fi
 
-# Verify final file exists
-if [ -f "$ROOT_DIR/merged.pdf" ]; then
-    echo "Success: PDF created at $ROOT_DIR/merged.pdf" >&2
-    ls -l "$ROOT_DIR/merged.pdf" >&2
+    # Check if merge was successful
+    if [ ! -f "/tmp/merged.pdf" ]; then
+        echo "Error: Merged PDF was not created" >&2
+        return 1
+    fi
+
+    # Move with explicit error checking
+    echo "Debug: Moving merged PDF to final location" >&2
+    if ! mv "/tmp/merged.pdf" "$ROOT_DIR/merged.pdf"; then
+        echo "Error: Failed to move merged PDF" >&2
+        return 1
+    fi
+
+    # Verify final file exists
+    if [ -f "$ROOT_DIR/merged.pdf" ]; then
+        echo "Success: PDF created at $ROOT_DIR/merged.pdf" >&2
+        ls -l "$ROOT_DIR/merged.pdf" >&2
+    else
+        echo "Error: Final PDF not found at expected location" >&2
+        return 1
+    fi
+}
+
+# Volumes (--volume-pages/--volume-size): plan_volumes.py groups the per-file
+# PDFs along directory boundaries, every volume is merged by its own gs process
+# (up to one per core), and a master table of contents lists which volume
+# holds which file. Each merge only holds its own volume in memory.
+merge_volumes () {
+    cd /tmp
+    rm -f "$ROOT_DIR/merged.pdf" "$ROOT_DIR"/merged-*.pdf /tmp/merged-*.pdf /tmp/volume_*.list
+
+    local plan_options=(--contents /tmp/volume_contents)
+    if [ -n "$VOLUME_PAGES" ]; then
+        plan_options+=(--pages "$VOLUME_PAGES")
+    else
+        plan_options+=(--size "$VOLUME_SIZE")
+    fi
+    local volume pdf
+    python3 "$SCRIPT_DIR/plan_volumes.py" "$CODE2PDF_REPORT" "${plan_options[@]}" > /tmp/volume_plan.tsv || {
+        echo "Error: Could not plan volumes" >&2
+        exit 1
+    }
+    while IFS=$'\t' read -r volume pdf; do
+        echo "$pdf" >> "/tmp/volume_$volume.list"
+    done < /tmp/volume_plan.tsv
+
+    echo "generating the master table of contents"
+    CODE2PDF_REPORT="" python3 "$SCRIPT_DIR/code_to_pdf.py" volume_contents /tmp/merged-00-contents.pdf "Table of Contents"
+
+    local max_jobs=$(nproc 2>/dev/null || sysctl -n hw.ncpu 2>/dev/null || echo 2)
+    local -a pids=()
+    local list
+    for list in /tmp/volume_*.list; do
+        volume="${list#/tmp/volume_}"
+        volume="${volume%.list}"
+        while [ "$(jobs -rp | wc -l)" -ge "$max_jobs" ]; do
+            wait -n
+        done
+        (
+            mapfile -t volume_files < "$list"
+            echo "Debug: Merging volume $volume (${#volume_files[@]} files)" >&2
+            gs -q -dNOPAUSE -dBATCH -sDEVICE=pdfwrite "${gs_options[@]}" \
+                -sOutputFile="/tmp/merged-$volume.pdf" "${volume_files[@]}" >&2
+        ) &
+        pids+=($!)
+    done
+    local failed=false
+    for pid in "${pids[@]}"; do
+        wait "$pid" || failed=true
+    done
+    if [ "$failed" == "true" ]; then
+        echo "Error: PDF merge failed" >&2
+        exit 1
+    fi
+
+    if ! mv /tmp/merged-*.pdf "$ROOT_DIR/"; then
+        echo "Error: Failed to move volumes" >&2
+        exit 1
+    fi
+    echo "Success: $(ls "$ROOT_DIR"/merged-*.pdf | wc -l | tr -d ' ') PDFs created in $ROOT_DIR:" >&2
+    ls -l "$ROOT_DIR"/merged-*.pdf >&2
+}
+
+if [ -n "$VOLUME_PAGES" ] || [ -n "$VOLUME_SIZE" ]; then
+    summarize_report
+    merge_volumes
 else
-    echo "Error: Final PDF not found at expected location" >&2
-    exit 1
+    generate_table_of_contents
+    summarize_report
+    merge_pdfs || exit 1
+fi
+[ -s "$STATS_FILE" ] && cat "$STATS_FILE"
+
+##########################################3
+# Step 4. (--watch) Rebuild on every batch of file changes
+##########################################3
+
+# Re-convert only the files in each batch reported by watch_changes.py, through
+# the same folder and file filters, then rebuild the contents and the merge
+rebuild_changed_files () {
+    local relative_path entry pdf_name
+    local changed=false
+    rm -f "$CODE2PDF_REPORT" "$PDF_JOBS_FILE"
+    for relative_path in "$@"; do
+        entry="$ROOT_DIR/${relative_path%/}"
+        pdf_name="$( generate_pdf_file_name "$entry" )"
+        if [[ "$relative_path" == */ ]]; then
+            # A removed directory: drop the PDFs of everything that was under it
+            rm -f /tmp/"$pdf_name"____*.pdf && changed=true
+        elif [ ! -e "$entry" ]; then
+            [ -f "/tmp/$pdf_name.pdf" ] && rm -f "/tmp/$pdf_name.pdf" && changed=true
+        elif [ -f "$entry" ] && ! is_in_skipped_folder "$relative_path" && is_selected_file "$entry"; then
+            # Drop the old PDF first: a file that became binary or generated is not rendered again
+            rm -f "/tmp/$pdf_name.pdf"
+            print_to_pdf "$entry"
+            changed=true
+        fi
+    done
+    [ "$changed" == "true" ] || return 0
+    # A file changing again mid-rebuild can fail a step; the next batch retries
+    if ! convert_queued_files; then
+        echo "Warning: Could not convert the changed files; still watching" >&2
+        return 0
+    fi
+    generate_table_of_contents
+    summarize_report
+    if ! merge_pdfs; then
+        echo "Warning: Could not update $ROOT_DIR/merged.pdf; still watching" >&2
+        return 0
+    fi
+    echo "Info: Updated $ROOT_DIR/merged.pdf ($# changed paths)" >&2
+}
+
+if [ "$WATCH" == "true" ]; then
+    echo "Info: Watching $ROOT_DIR for changes (Ctrl-C to stop)" >&2
+    exclude_folders=$(IFS=','; echo "${blacklisted_folders[*]},$IGNORE_FOLDERS")
+    declare -a batch=()
+    while IFS= read -r relative_path; do
+        if [ -n "$relative_path" ]; then
+            batch+=("$relative_path")
+            continue
+        fi
+        rebuild_changed_files "${batch[@]}"
+        batch=()
+    done < <(python3 "$SCRIPT_DIR/watch_changes.py" "$ROOT_DIR" --exclude-folders "$exclude_folders")
 fi
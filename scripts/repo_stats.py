@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Size statistics for a code2txt or code2pdf run (--stats).
+
+Counts are collected while the files are read for the main output, so
+sizing a job does not need a second walk over the repository. Each file adds
+to the totals of its language and of its top-level directory:
+
+    files, bytes, lines, tokens (estimated), pages (estimated or rendered)
+
+Callers count lines with combined_index.count_lines, a single buffer-level
+scan of the content already in memory. Tokens are estimated at
+BYTES_PER_TOKEN bytes per token, which is close to what common LLM
+tokenizers produce for source code. Pages are estimated from LINES_PER_PAGE
+unless the caller knows the rendered page count.
+"""
+
+import json
+
+# Rough average for source code with BPE tokenizers
+BYTES_PER_TOKEN = 4
+
+# A4 with 2cm margins leaves 728pt of height; code is 9pt with line-height 1.4
+LINES_PER_PAGE = 57
+
+FIELDS = ("files", "bytes", "lines", "tokens", "pages")
+
+
+def estimate_pages(lines):
+    """Pages a file of this many lines takes in code2pdf (every file starts a new page)."""
+    return max(1, -(-lines // LINES_PER_PAGE))
+
+
+class RepoStats:
+    """Per-language and per-top-level-directory totals."""
+
+    def __init__(self):
+        self.total = dict.fromkeys(FIELDS, 0)
+        self.languages = {}
+        self.directories = {}
+
+    def add(self, path, language, size, lines, pages=None):
+        """Count one file; `pages` is estimated from `lines` if not given."""
+        directory = path.split("/", 1)[0] if "/" in path else "."
+        counts = {
+            "files": 1,
+            "bytes": size,
+            "lines": lines,
+            "tokens": -(-size // BYTES_PER_TOKEN),
+            "pages": estimate_pages(lines) if pages is None else pages,
+        }
+        for totals in (self.total,
+                       self.languages.setdefault(language, dict.fromkeys(FIELDS, 0)),
+                       self.directories.setdefault(directory, dict.fromkeys(FIELDS, 0))):
+            for field in FIELDS:
+                totals[field] += counts[field]
+
+    def to_json(self):
+        return json.dumps({
+            "total": self.total,
+            "languages": dict(sorted(self.languages.items())),
+            "directories": dict(sorted(self.directories.items())),
+        }, indent=2)
+
+    def to_table(self):
+        lines = []
+        for title, groups in (("Language", self.languages), ("Directory", self.directories)):
+            width = max([len(title), len("Total")] + [len(name) for name in groups])
+            lines.append(f"{title:<{width}}" + "".join(f"{field.capitalize():>12}" for field in FIELDS))
+            for name, totals in sorted(groups.items(), key=lambda item: -item[1]["bytes"]):
+                lines.append(f"{name:<{width}}" + "".join(f"{totals[field]:>12}" for field in FIELDS))
+            lines.append(f"{'Total':<{width}}" + "".join(f"{self.total[field]:>12}" for field in FIELDS))
+            lines.append("")
+        return "\n".join(lines)
+
+    def format(self, stats_format):
+        """Return the statistics as "json" or "table" text."""
+        return self.to_json() + "\n" if stats_format == "json" else self.to_table()
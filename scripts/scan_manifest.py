@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Walk a directory tree with a persistent scan manifest (--scan-cache).
+
+On a large tree most of the discovery time goes into listing every
+directory and passing every name through the folder and file filters,
+although few directories change between runs. The manifest records, per
+directory, its modification time, the selected files in it and the
+subdirectories to descend into:
+
+    python3 scan_manifest.py ROOT [filter options]    # selected paths, one per line
+
+A directory whose modification time is unchanged keeps the same entries
+(adding, removing or renaming an entry updates it), so it is not listed or
+filtered again; it still costs one stat() to find out, and its
+subdirectories are checked the same way. Only changed subtrees are listed.
+Directories modified within RACY_SECONDS of the scan are not trusted on the
+next run, since a change in the same clock tick would keep their time.
+
+The filter options are part of the manifest's fingerprint. A run with
+different filters, or a manifest written by another version, starts
+from an empty manifest, so results are always those of a full walk.
+Manifests are kept under ~/.cache/code2pdf/scans, one per tool and root.
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+import time
+
+from source_rules import extension, selects_file
+
+SCAN_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "code2pdf", "scans"
+)
+
+# Bumped when the walk or the manifest layout changes
+MANIFEST_VERSION = 1
+
+# Directories modified this recently are listed again on the next run
+RACY_SECONDS = 2
+
+
+class ScanFilters:
+    """
+    The folder and file rules of code2txt (source_rules.py), and optionally code2pdf's whitelist.
+
+    Lists hold folder names, file names or extensions (without the dot). If
+    any of allow_types, allow_names and allow_no_extension is given, a file
+    must also match one of them, unless include_types is given.
+    """
+
+    def __init__(self, ignore_folders=(), folder_pattern="", ignore_files=(), ignore_types=(),
+                 include_types=(), allow_types=(), allow_names=(), allow_no_extension=False):
+        self.ignore_folders = frozenset(ignore_folders)
+        self.folder_pattern = folder_pattern
+        self.ignore_files = frozenset(ignore_files)
+        self.ignore_types = frozenset(ignore_types)
+        self.include_types = frozenset(include_types)
+        self.allow_types = frozenset(allow_types)
+        self.allow_names = frozenset(allow_names)
+        self.allow_no_extension = allow_no_extension
+
+    def fingerprint(self, tool):
+        options = {name: sorted(value) if isinstance(value, frozenset) else value
+                   for name, value in vars(self).items()}
+        options.update(tool=tool, version=MANIFEST_VERSION)
+        return hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()
+
+    def skips_folder(self, name):
+        return name in self.ignore_folders or bool(
+            self.folder_pattern and fnmatch.fnmatchcase(name, self.folder_pattern))
+
+    def selects_file(self, name):
+        if not selects_file(name, self.ignore_types, self.ignore_files, self.include_types):
+            return False
+        if self.include_types or not (self.allow_types or self.allow_names or self.allow_no_extension):
+            return True
+        file_extension = extension(name)
+        return (file_extension in self.allow_types or name in self.allow_names
+                or (file_extension == "" and self.allow_no_extension))
+
+
+def manifest_path(root, tool):
+    key = hashlib.sha256(f"{tool}\0{os.path.realpath(root)}".encode()).hexdigest()[:16]
+    return os.path.join(SCAN_DIR, f"{tool}-{key}.json")
+
+
+def load_manifest(path, fingerprint):
+    """Return the directory entries of the manifest at path, or {} if it does not apply."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("fingerprint") != fingerprint:
+        return {}
+    return manifest.get("directories", {})
+
+
+def save_manifest(path, fingerprint, directories):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "directories": directories}, f,
+                      separators=(",", ":"))
+        os.replace(tmp_file, path)
+    except OSError:
+        pass  # The manifest is an optimization only
+
+
+def _list_directory(path, filters):
+    """Return (selected files, subdirectories to walk) of one directory, sorted."""
+    files, subdirectories = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            # Like the shell walks, links are followed
+            if entry.is_dir():
+                if not filters.skips_folder(entry.name):
+                    subdirectories.append(entry.name)
+            elif entry.is_file() and filters.selects_file(entry.name):
+                files.append(entry.name)
+    return sorted(files), sorted(subdirectories)
+
+
+def scan(root, filters, directories=None):
+    """
+    Return (selected relative paths, new directory entries, directories listed).
+
+    `directories` holds the entries of an applicable manifest; directories
+    whose modification time matches theirs are not listed. Symbolic link
+    cycles are followed only once.
+    """
+    directories = directories or {}
+    racy_after = time.time_ns() - RACY_SECONDS * 10 ** 9
+    updated = {}
+    visited = set()
+    paths = []
+    listed = 0
+
+    if filters.skips_folder(os.path.basename(os.path.abspath(root))):
+        return paths, updated, listed
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        directory = os.path.join(root, relative) if relative else root
+        try:
+            status = os.stat(directory)
+        except OSError:
+            continue
+        if (status.st_dev, status.st_ino) in visited:
+            continue
+        visited.add((status.st_dev, status.st_ino))
+
+        cached = directories.get(relative)
+        if cached is not None and cached[0] == status.st_mtime_ns:
+            files, subdirectories = cached[1], cached[2]
+        else:
+            try:
+                files, subdirectories = _list_directory(directory, filters)
+            except OSError:
+                continue
+            listed += 1
+        mtime = status.st_mtime_ns if status.st_mtime_ns < racy_after else None
+        updated[relative] = [mtime, files, subdirectories]
+
+        prefix = f"{relative}/" if relative else ""
+        paths.extend(prefix + name for name in files)
+        stack.extend(prefix + name for name in reversed(subdirectories))
+    return sorted(paths), updated, listed
+
+
+def _split(value):
+    return [item for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Print the files of a directory tree that pass the filters, one per line, "
+                    "listing only the directories changed since the last run."
+    )
+    parser.add_argument("root", help="Directory to walk")
+    parser.add_argument("--tool", default="code2txt", help="Keeps the manifests of each tool apart")
+    parser.add_argument("--manifest", default="",
+                        help="Manifest file (default: one per tool and root under ~/.cache/code2pdf/scans)")
+    parser.add_argument("--ignore-folders", default="", help="Comma-separated folder names to skip")
+    parser.add_argument("--folder-pattern", default="", help="Skip folders matching this glob")
+    parser.add_argument("--ignore-files", default="", help="Comma-separated file names to skip")
+    parser.add_argument("--ignore-types", default="", help="Comma-separated extensions to skip")
+    parser.add_argument("--include-types", default="", help="Only select these extensions")
+    parser.add_argument("--allow-types", default="", help="Whitelisted extensions")
+    parser.add_argument("--allow-names", default="", help="Whitelisted file names")
+    parser.add_argument("--allow-no-extension", action="store_true",
+                        help="Whitelist files without an extension")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Report how many directories had to be listed on stderr")
+    args = parser.parse_args()
+
+    filters = ScanFilters(
+        _split(args.ignore_folders), args.folder_pattern, _split(args.ignore_files),
+        _split(args.ignore_types), _split(args.include_types), _split(args.allow_types),
+        _split(args.allow_names), args.allow_no_extension
+    )
+    fingerprint = filters.fingerprint(args.tool)
+    path = args.manifest or manifest_path(args.root, args.tool)
+    directories = load_manifest(path, fingerprint)
+
+    paths, updated, listed = scan(args.root, filters, directories)
+    if updated != directories:
+        save_manifest(path, fingerprint, updated)
+    if args.verbose:
+        print(f"Scan manifest: listed {listed} of {len(updated)} directories", file=sys.stderr)
+    try:
+        sys.stdout.write("".join(f"{path}\n" for path in paths))
+    except BrokenPipeError:
+        sys.exit(1)
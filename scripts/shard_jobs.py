@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Select one shard's share of the conversion jobs (code2pdf -a --shard i/N).
+
+Every machine walks the same tree and queues the same jobs, so each one
+computes the whole assignment by itself and no coordinator is needed. Jobs
+are ordered by output PDF name (the order of the merge), then placed
+largest first on the shard with the fewest bytes so far, ties going to the
+lower shard number. The result depends only on the file list and sizes.
+
+Reads "input<TAB>output<TAB>display<TAB>ranges" job lines on stdin and
+prints the lines of shard i (numbered from 1) in their original order.
+With --archive, inputs are archive members, sized from the archive listing.
+With --hash-file, a hash of the output names and input sizes of all jobs
+is written there; each shard records it in its marker, so --assemble can
+refuse shards that were built from different file lists or sizes.
+"""
+
+import argparse
+import hashlib
+import heapq
+import os
+import sys
+
+from archive_source import ArchiveSource
+
+
+def parse_shard(text):
+    """Parse "i/N" into (i, N) with 1 <= i <= N."""
+    index, _, count = text.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Invalid shard '{text}', expected i/N such as 2/4") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{text}', i must be between 1 and N")
+    return index, count
+
+
+def job_size(line):
+    """Size in bytes of the input file of a job line (0 if it is missing)."""
+    try:
+        return os.path.getsize(line.split("\t", 1)[0])
+    except OSError:
+        return 0
+
+
+def assign_shards(jobs, count, size=job_size):
+    """
+    Return the shard number (1..count) of each job, balancing total size.
+
+    `jobs` are job lines; ties in size are broken by output name so every
+    machine computes the same assignment.
+    """
+    order = sorted(range(len(jobs)),
+                   key=lambda i: (-size(jobs[i]), os.path.basename(jobs[i].split("\t")[1])))
+    shards = [(0, number) for number in range(1, count + 1)]
+    assignment = [None] * len(jobs)
+    for i in order:
+        total, number = heapq.heappop(shards)
+        assignment[i] = number
+        heapq.heappush(shards, (total + size(jobs[i]), number))
+    return assignment
+
+
+def job_list_hash(jobs, size=job_size):
+    """
+    Hash of the output PDF name and input size of all jobs, the same on every shard of one build.
+
+    The assignment depends on both, so shards that saw other sizes (a file
+    edited between runs, other line endings) split the jobs differently.
+    """
+    entries = sorted((os.path.basename(line.split("\t")[1]), size(line)) for line in jobs)
+    text = "".join(f"{name}\t{file_size}\n" for name, file_size in entries)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the conversion jobs of one shard.")
+    parser.add_argument("shard", help="Shard to select, as i/N (e.g. 2/4)")
+    parser.add_argument("--archive", help="Inputs are members of this tar or zip archive")
+    parser.add_argument("--hash-file", help="Write the hash of the whole job list to this file")
+    args = parser.parse_args()
+
+    try:
+        index, count = parse_shard(args.shard)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    jobs = [line.rstrip("\n") for line in sys.stdin if line.strip()]
+    if args.archive:
+        archive = ArchiveSource(args.archive)
+        sizes = {line: archive.size(line.split("\t", 1)[0]) for line in jobs}
+        archive.close()
+    else:
+        sizes = {line: job_size(line) for line in jobs}
+    assignment = assign_shards(jobs, count, sizes.__getitem__)
+    if args.hash_file:
+        with open(args.hash_file, "w", encoding="utf-8") as f:
+            f.write(f"{job_list_hash(jobs, sizes.__getitem__)}\n")
+    selected = [line for line, number in zip(jobs, assignment) if number == index]
+    for line in selected:
+        print(line)
+    print(f"Info: Shard {index}/{count}: {len(selected)} of {len(jobs)} files, "
+          f"{sum(sizes[line] for line in selected)} of {sum(sizes.values())} bytes", file=sys.stderr)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Read source files once and decide how to decode them.
+
+Both code2pdf (code_to_pdf.py) and code2txt (write_combined.py) use this
+module, so the two tools agree on which files are text and how they decode.
+A file is read once as bytes (memory-mapped above MMAP_THRESHOLD); the
+encoding is decided from its BOM and a bounded sample, then the data is
+decoded a single time.
+"""
+
+import codecs
+import mmap
+import os
+
+# Files larger than this are memory-mapped instead of read into a bytes object
+MMAP_THRESHOLD = 1024 * 1024
+
+# Number of leading bytes inspected to decide the encoding
+SAMPLE_SIZE = 64 * 1024
+
+# Byte order marks, longest first so UTF-32 LE is not mistaken for UTF-16 LE
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def read_source(path, mmap_threshold=MMAP_THRESHOLD):
+    """
+    Read a file once and return its contents as a bytes-like object.
+
+    Small files are returned as bytes, larger ones as a read-only mmap that
+    the caller should close when done (see close_source).
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= mmap_threshold:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return f.read()
+
+
+def close_source(data):
+    """Release the mapping returned by read_source, if any."""
+    if isinstance(data, mmap.mmap):
+        data.close()
+
+
+def _utf16_without_bom(sample):
+    """Guess UTF-16 without a BOM from the position of NUL bytes in ASCII-heavy text."""
+    if len(sample) < 4:
+        return None
+    even = sample[0::2]
+    odd = sample[1::2]
+    even_nuls = even.count(0) / len(even)
+    odd_nuls = odd.count(0) / len(odd)
+    if odd_nuls > 0.7 and even_nuls < 0.1:
+        return "utf-16-le"
+    if even_nuls > 0.7 and odd_nuls < 0.1:
+        return "utf-16-be"
+    return None
+
+
+def detect_encoding(data, sample_size=SAMPLE_SIZE):
+    """
+    Decide the encoding of a bytes-like object from its BOM and a bounded sample.
+
+    Returns the codec name to decode with, or None if the data looks binary.
+    """
+    sample = bytes(data[:sample_size])
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    if b"\x00" in sample:
+        return _utf16_without_bom(sample)
+
+    # Decode incrementally so a multi-byte character cut off by the sample end is not an error
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=len(data) <= sample_size)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def decode_source(data, encoding=None):
+    """
+    Decode data with the detected (or given) encoding.
+
+    Returns (text, encoding). If a file that sampled as UTF-8 turns out to be
+    invalid further in, the same buffer is decoded as latin-1 instead of
+    reading the file again. Binary data returns (None, None).
+    """
+    if encoding is None:
+        encoding = detect_encoding(data)
+    if encoding is None:
+        return None, None
+    try:
+        return str(data, encoding), encoding
+    except UnicodeDecodeError:
+        return str(data, "latin-1"), "latin-1"
+
+
+def read_sample(path, sample_size=SAMPLE_SIZE):
+    """Read the first bytes of a file, one more than detect_encoding inspects."""
+    with open(path, "rb") as f:
+        return f.read(sample_size + 1)
+
+
+def sniff_encoding(path, sample_size=SAMPLE_SIZE):
+    """Detect the encoding of a file from a bounded read of its first bytes."""
+    return detect_encoding(read_sample(path, sample_size), sample_size)
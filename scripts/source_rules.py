@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+The file selection rules and language names shared by all tools.
+
+code2txt, code2export, the Python API and the scan manifest all select files
+and name their code fence languages from this module, so the tools cannot
+drift apart. The shell scripts read the defaults from it as well:
+
+    python3 source_rules.py defaults    # "IGNORE_TYPES IGNORE_FOLDERS", comma-separated
+
+and write_combined.py derives the language of every section with
+language_for(). code2pdf -a keeps its own whitelist (see bin/code2pdf).
+"""
+
+import os
+import sys
+
+DEFAULT_IGNORE_TYPES = (
+    "bin", "pdf", "jpg", "png", "gif", "zip", "tar", "gz", "zst", "idx", "exe", "dll", "so",
+    "dylib", "class", "jar", "war", "ear", "pyc", "pyo", "txt",
+)
+DEFAULT_IGNORE_FOLDERS = (
+    "node_modules", ".git", "dist", "out", "build", "__pycache__", ".venv", "venv", "env",
+    ".env", "vendor", "target",
+)
+
+LANGUAGES = {
+    "js": "javascript", "mjs": "javascript", "cjs": "javascript", "jsx": "javascript",
+    "ts": "typescript", "tsx": "typescript", "py": "python", "java": "java", "c": "c",
+    "cpp": "cpp", "cc": "cpp", "cxx": "cpp", "h": "cpp", "hpp": "cpp", "cs": "csharp",
+    "go": "go", "rs": "rust", "rb": "ruby", "php": "php", "swift": "swift",
+    "kt": "kotlin", "kts": "kotlin", "scala": "scala", "sh": "bash", "bash": "bash",
+    "zsh": "zsh", "ps1": "powershell", "bat": "batch", "cmd": "batch", "html": "html",
+    "htm": "html", "css": "css", "scss": "scss", "sass": "scss", "less": "less",
+    "xml": "xml", "json": "json", "yaml": "yaml", "yml": "yaml", "toml": "toml",
+    "md": "markdown", "markdown": "markdown", "rst": "rst", "sql": "sql", "r": "r",
+    "R": "r", "m": "matlab", "jl": "julia", "lua": "lua", "pl": "perl", "vim": "vim",
+    "el": "elisp",
+}
+NAMED_LANGUAGES = {"Dockerfile": "dockerfile", "Makefile": "makefile", "makefile": "makefile"}
+
+
+def extension(name):
+    """The text after the last dot of the base name, or "" if there is none."""
+    base_name = os.path.basename(name)
+    return base_name.rpartition(".")[2] if "." in base_name else ""
+
+
+def language_for(name):
+    """Return the code fence language for a file name."""
+    file_extension = extension(name)
+    if not file_extension:
+        return NAMED_LANGUAGES.get(os.path.basename(name), "text")
+    return LANGUAGES.get(file_extension, "text")
+
+
+def selects_file(name, ignore_types=DEFAULT_IGNORE_TYPES, ignore_files=(), include_types=None):
+    """
+    Whether a file passes the name and type filters.
+
+    include_types, if given, overrides ignore_types. Size and binary checks
+    happen when the files are read.
+    """
+    file_extension = extension(name)
+    if os.path.basename(name) in ignore_files:
+        return False
+    if include_types:
+        return file_extension in include_types
+    return file_extension not in ignore_types
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["defaults"]:
+        print("Usage: source_rules.py defaults", file=sys.stderr)
+        sys.exit(1)
+    print(",".join(DEFAULT_IGNORE_TYPES), ",".join(DEFAULT_IGNORE_FOLDERS))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Report file changes under a directory in coalesced batches, for --watch modes.
+
+Change notifications come from inotifywait (inotify-tools), which runs for
+the lifetime of the watch. Events are collected until the tree has been
+quiet for a short settle time (or a burst has lasted long enough), so an
+editor's save or a `git checkout` becomes one batch instead of dozens.
+
+Output (paths relative to the directory, sorted, no filtering by type):
+    path                    (a file that was written, created, moved or deleted)
+    dir/                    (a directory that was deleted or moved away)
+    <empty line>            (end of a batch)
+
+Callers apply their own filter rules and check which paths still exist.
+"""
+
+import argparse
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+# Quiet time that ends a batch
+DEFAULT_SETTLE_SECONDS = 0.2
+
+# Longest a batch is held back while events keep arriving
+MAX_BATCH_SECONDS = 1.0
+
+EVENTS = ("close_write", "create", "delete", "moved_to", "moved_from")
+
+_END = None
+
+
+def exclude_pattern(folders):
+    """Build an inotifywait --exclude regex (POSIX ERE) matching the named folders."""
+    names = []
+    for folder in folders:
+        names.append("".join("\\" + c if c in ".^$*+?()[]{}|\\" else c for c in folder))
+    return f"(^|/)({'|'.join(names)})(/|$)"
+
+
+def start_inotifywait(directory, exclude_folders=()):
+    command = ["inotifywait", "-m", "-r", "-q", "--format", "%e\t%w%f"]
+    for event in EVENTS:
+        command += ["-e", event]
+    if exclude_folders:
+        command += ["--exclude", exclude_pattern(exclude_folders)]
+    command.append(directory)
+    return subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+
+def _pump(stream, events):
+    """Move lines from the inotifywait pipe to the queue, ending with _END."""
+    for line in stream:
+        events.put(line.rstrip("\n"))
+    events.put(_END)
+
+
+def changed_paths(directory, event_line):
+    """Turn one "EVENTS<TAB>path" line into the relative paths to report."""
+    flags, _, full_path = event_line.partition("\t")
+    flags = flags.split(",")
+    relative_path = os.path.relpath(full_path, directory)
+    if "ISDIR" not in flags:
+        return [relative_path]
+    if "DELETE" in flags or "MOVED_FROM" in flags:
+        return [relative_path + "/"]
+    if "CREATE" in flags or "MOVED_TO" in flags:
+        # Files moved in (or written before the new directory was watched)
+        # produce no events of their own
+        return [
+            os.path.relpath(os.path.join(root, name), directory)
+            for root, _, names in os.walk(full_path)
+            for name in names
+        ]
+    return []
+
+
+def watch(directory, out, settle=DEFAULT_SETTLE_SECONDS, exclude_folders=()):
+    """Write batches of changed paths to out until inotifywait exits; return its status."""
+    directory = os.path.abspath(directory)
+    process = start_inotifywait(directory, exclude_folders)
+    events = queue.Queue()
+    threading.Thread(target=_pump, args=(process.stdout, events), daemon=True).start()
+
+    while True:
+        event = events.get()
+        if event is _END:
+            break
+        batch = set(changed_paths(directory, event))
+        started = time.monotonic()
+        while True:
+            remaining = MAX_BATCH_SECONDS - (time.monotonic() - started)
+            try:
+                event = events.get(timeout=max(0, min(settle, remaining)))
+            except queue.Empty:
+                break
+            if event is _END:
+                events.put(_END)
+                break
+            batch.update(changed_paths(directory, event))
+        if batch:
+            out.write("".join(f"{path}\n" for path in sorted(batch)) + "\n")
+            out.flush()
+    return process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Print batches of changed paths under a directory, each ending with an empty line."
+    )
+    parser.add_argument("directory", help="Directory to watch recursively")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="Seconds without events that end a batch (default: 0.2)")
+    parser.add_argument("--exclude-folders", default="",
+                        help="Comma-separated folder names not to watch (e.g. node_modules,.git)")
+    args = parser.parse_args()
+
+    folders = [folder for folder in args.exclude_folders.split(",") if folder]
+    try:
+        status = watch(args.directory, sys.stdout, args.settle, folders)
+    except FileNotFoundError:
+        print("Error: inotifywait is required for --watch (install inotify-tools)", file=sys.stderr)
+        sys.exit(1)
+    except (BrokenPipeError, KeyboardInterrupt):
+        sys.exit(0)
+    sys.exit(status)
@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Write the combined markdown document for code2txt.
+
+combine_to_txt.sh discovers and filters files, then pipes the sorted list to
+this script as "relative_path[<TAB>language[<TAB>line_ranges]]" lines; an
+empty language is derived from the path with source_rules.language_for. Line
+ranges ("12-20,40-52", from --since --hunks) limit a section to those lines. The document is written to
+stdout; the caller decides where it goes (file, compressor or pipeline).
+Writing here keeps an exact byte count of the stream, which the optional
+sidecar index (see combined_index.py) records for every file body.
+
+Files are classified and decoded with source_reader, the same logic
+code_to_pdf.py uses: binary files are skipped, and text that is not UTF-8
+(UTF-16, latin-1, BOM-marked files) is transcoded so the output is UTF-8.
+Generated and minified files (see generated_files.py) are recognized from
+the same sample and skipped, written as a stub, or kept (--generated).
+
+With --strip-headers, a leading comment block (license, copyright) that
+starts at least three files is written once after the table of contents,
+and replaced by a one-line marker in their sections (see common_headers.py).
+
+With --archive, target_dir is a tar or zip archive whose members are read
+without extracting it (see archive_source.py). The members are listed and
+filtered here rather than on stdin (--ignore-folders, --ignore-files,
+--ignore-types, --include-types), in the same pass over the archive that
+samples them, so a compressed tar is decompressed once for the listing
+and checks and once for the bodies.
+
+File metadata (size limit, binary sniffing) and contents are fetched
+concurrently (see prefetch.py) while sections are still written in the
+sorted order, so runs on high-latency storage are not bound to one file per
+round trip.
+
+With --watch, the file list on stdin is followed by batches of changed paths
+(see watch_changes.py), each ending with an empty line. The process keeps
+every section in memory, re-reads only the changed files and replaces the
+output file (and index) atomically whenever a section actually changed.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tarfile
+import time
+import zipfile
+
+from combined_index import IndexWriter, count_lines
+from repo_stats import RepoStats
+from git_changes import parse_ranges
+from source_reader import read_source, close_source, decode_source, detect_encoding, read_sample, \
+    SAMPLE_SIZE
+from generated_files import GeneratedFile, check, MODES as GENERATED_MODES
+from prefetch import map_ordered, prefetch_ordered, DEFAULT_JOBS, DEFAULT_MAX_BUFFERED
+from archive_source import ArchiveSource
+from common_headers import find_header, common_headers, strip_header
+from source_rules import language_for
+from scan_manifest import ScanFilters
+
+# Exit status when an archive has no members left after filtering
+NO_FILES = 3
+
+
+class CountingWriter:
+    """Binary stream wrapper that tracks how many bytes have been written."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.offset = 0
+
+    def write(self, data):
+        self.stream.write(data)
+        self.offset += len(data)
+
+
+def parse_file_line(line):
+    """
+    Parse a "path[<TAB>language[<TAB>ranges]]" line into a (path, language, ranges) tuple.
+
+    An empty language is derived from the path (source_rules.language_for),
+    which is how the shell scripts leave it.
+    """
+    path, _, rest = line.rstrip("\n").partition("\t")
+    language, _, ranges = rest.partition("\t")
+    return path, language or language_for(path), parse_ranges(ranges)
+
+
+def read_file_list(stream):
+    """Parse "path<TAB>language[<TAB>ranges]" lines into (path, language, ranges) tuples."""
+    return [parse_file_line(line) for line in stream if line.strip("\n")]
+
+
+def archive_filter(ignore_folders=(), ignore_files=(), ignore_types=(), include_types=()):
+    """The code2txt folder and file rules as a predicate on archive member paths."""
+    filters = ScanFilters(ignore_folders, ignore_files=ignore_files, ignore_types=ignore_types,
+                          include_types=include_types)
+
+    def select(path):
+        *folders, name = path.split("/")
+        return not any(filters.skips_folder(folder) for folder in folders) and filters.selects_file(name)
+    return select
+
+
+def read_batches(stream):
+    """Yield lists of (path, language, ranges) tuples, one per block ending in an empty line."""
+    batch = []
+    for line in stream:
+        if line.strip("\n"):
+            batch.append(parse_file_line(line))
+        else:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def inspect_file(full_path, max_file_size=None, generated="skip", archive=None,
+                 header_language=None):
+    """
+    Return (size, encoding, reason, header) for a file, or for a member of an ArchiveSource.
+
+    encoding is None for binary content; reason says why the file looks
+    generated, and is only checked when generated is not "keep". header is
+    the leading comment block (see common_headers.py), only looked for when
+    the file's header_language is given.
+    """
+    size = archive.size(full_path) if archive else os.stat(full_path).st_size
+    if max_file_size is not None and size > max_file_size:
+        return size, None, None, None
+    sample = archive.read(full_path, SAMPLE_SIZE + 1) if archive else read_sample(full_path)
+    encoding = detect_encoding(sample)
+    header = None
+    if header_language is not None and encoding is not None:
+        text = sample[:SAMPLE_SIZE].decode(encoding, errors="ignore")
+        header = find_header(text, header_language, complete=len(sample) <= SAMPLE_SIZE)
+    return size, encoding, check(full_path, sample, encoding, generated), header
+
+
+def select_text_files(target_dir, files, max_file_size=None, jobs=DEFAULT_JOBS, verbose=False,
+                      generated="skip", archive=None, headers=None):
+    """
+    Drop oversized, binary and generated files, deciding from a stat and a bounded sample of each file.
+
+    The checks run concurrently; the result keeps the input order as
+    (path, language, ranges, encoding, size) tuples. With generated="stub",
+    generated files stay in the list with a GeneratedFile as their encoding.
+    If an ArchiveSource is given, the paths are members of the archive. If
+    a dict is given as `headers`, it is filled with the leading comment
+    block of every selected file, from the same sample.
+    """
+    if archive:
+        archive.expect(path for path, _, _ in files)
+    results = map_ordered(
+        lambda item: inspect_file(_locate(target_dir, item[0], archive), max_file_size, generated,
+                                  archive, item[1] if headers is not None else None),
+        files, jobs
+    )
+    selected = []
+    for (path, language, ranges), result in zip(files, results):
+        if isinstance(result, (OSError, KeyError)):
+            # Unreadable files keep their section and its error message
+            selected.append((path, language, ranges, "utf-8", 0))
+            continue
+        size, encoding, reason, header = result
+        if max_file_size is not None and size > max_file_size:
+            if verbose:
+                print(f"Skipping {path} (size: {size} bytes > max: {max_file_size} bytes)", file=sys.stderr)
+            continue
+        if encoding is None:
+            if verbose:
+                print(f"Skipping {path} (binary content)", file=sys.stderr)
+            continue
+        if reason is not None:
+            # Always reported, so a misjudged file does not vanish unnoticed
+            action = "Skipping" if generated == "skip" else "Writing a stub for"
+            print(f"{action} {path} (generated: {reason})", file=sys.stderr)
+            if generated == "skip":
+                continue
+            selected.append((path, language, ranges, GeneratedFile(reason), 0))
+            continue
+        selected.append((path, language, ranges, encoding, size))
+        if headers is not None:
+            headers[path] = header
+    return selected
+
+
+def _locate(target_dir, path, archive):
+    """The path to read a listed file from: archive members are named by the path itself."""
+    return path if archive else os.path.join(target_dir, path)
+
+
+def read_body(full_path, encoding, archive=None):
+    """Read a file (or archive member) once and return (UTF-8 bytes, encoding actually used).
+
+    A GeneratedFile in place of the encoding is returned as is, without
+    reading the file.
+    """
+    if isinstance(encoding, GeneratedFile):
+        return encoding
+    data = archive.read(full_path) if archive else read_source(full_path)
+    try:
+        text, encoding = decode_source(data, encoding)
+        if encoding == "utf-8":
+            # Already valid UTF-8: write the original bytes untouched
+            return (data if isinstance(data, bytes) else data[:]), encoding
+        return text.encode("utf-8"), encoding
+    finally:
+        close_source(data)
+
+
+def write_toc(out, files):
+    out.write(b"# Table of Contents\n\n")
+    for path, *_ in files:
+        out.write(f"- {path}\n".encode())
+    out.write(b"\n---\n")
+
+
+def write_hunks(out, body, language, ranges):
+    """Write only the given line ranges, each in its own block labelled with its line numbers."""
+    # Only "\n" ends a line, as git counts them; splitlines() also splits at a lone \r
+    lines = [line for line in re.split(rb"(?<=\n)", body) if line]
+    for start, end in ranges:
+        end = min(end, len(lines))
+        if start > end:
+            continue
+        chunk = b"".join(lines[start - 1:end])
+        if not chunk.endswith(b"\n"):
+            chunk += b"\n"
+        out.write(f"\nLines {start}-{end}:\n```{language}\n".encode())
+        out.write(chunk)
+        out.write(b"```\n")
+
+
+def write_file_section(out, path, language, ranges, loaded, index=None, verbose=False):
+    """
+    Write one "## path" section.
+
+    `loaded` is the (body, encoding) pair from read_body, the GeneratedFile
+    of a stub, or the OSError that reading the file raised.
+    """
+    if isinstance(loaded, (OSError, KeyError)):
+        out.write(f"\n## {path}\n```{language}\n".encode())
+        out.write(f"Error reading file: {getattr(loaded, 'filename', path)}\n".encode())
+        out.write(b"\n```\n")
+        return
+    if isinstance(loaded, GeneratedFile):
+        out.write(f"\n## {path}\n```{language}\n".encode())
+        out.write(loaded.stub_text().encode())
+        out.write(b"\n```\n")
+        return
+
+    body, encoding = loaded
+    if verbose and encoding != "utf-8":
+        print(f"Decoded {path} as {encoding}", file=sys.stderr)
+    if ranges:
+        out.write(f"\n## {path}\n".encode())
+        write_hunks(out, body, language, ranges)
+        return
+
+    out.write(f"\n## {path}\n```{language}\n".encode())
+    if index is not None:
+        index.add(path, language, out.offset, body, encoding)
+    out.write(body)
+    out.write(b"\n```\n")
+
+
+def write_common_headers(out, common):
+    """Write the headers shared by several files once, numbered as their markers refer to them."""
+    out.write(b"\n# Common Headers\n\n"
+              b"These headers start several files and are omitted from their sections.\n")
+    for number, text, count in common.values():
+        out.write(f"\nHeader {number} ({count} files):\n```text\n{text}\n```\n".encode())
+    out.write(b"\n---\n")
+
+
+def write_combined(target_dir, files, out, no_toc=False, index=None, verbose=False,
+                   max_file_size=None, jobs=DEFAULT_JOBS, max_buffered=DEFAULT_MAX_BUFFERED,
+                   stats=None, generated="skip", archive=None, strip_headers=False):
+    """
+    Write the table of contents and all text file sections to a binary stream.
+
+    Up to `jobs` files are read concurrently and at most `max_buffered` bytes
+    are held ahead of the writer. If a RepoStats is given as `stats`, every
+    file body is counted as it passes. Generated files are skipped, written
+    as stubs or kept, following `generated`. With an ArchiveSource, the
+    files are its members. With strip_headers, headers common to several
+    files are written once and replaced by a marker in the whole-file
+    sections. Returns the number of file sections written.
+    """
+    headers = {} if strip_headers else None
+    files = select_text_files(target_dir, files, max_file_size, jobs, verbose, generated, archive,
+                              headers)
+    common = common_headers(headers) if headers else {}
+    if verbose and common:
+        print(f"Common headers: {len(common)}, omitted from "
+              f"{sum(count for _, _, count in common.values())} files", file=sys.stderr)
+    out = CountingWriter(out)
+    if not no_toc:
+        write_toc(out, files)
+    if common:
+        write_common_headers(out, common)
+    if archive:
+        archive.expect(path for path, *_ in files)
+
+    def load(item):
+        path, _, _, encoding, _ = item
+        return read_body(_locate(target_dir, path, archive), encoding, archive)
+
+    for (path, language, ranges, _, _), loaded in prefetch_ordered(
+            files, load, jobs, max_buffered, size_of=lambda item: item[4]):
+        # Statistics describe the repository, so they count the file before its header is stripped
+        if stats is not None and not isinstance(loaded, (OSError, KeyError, GeneratedFile)):
+            stats.add(path, language, len(loaded[0]), count_lines(loaded[0]))
+        header = headers.get(path) if common else None
+        if header is not None and header.key in common and not ranges and isinstance(loaded, tuple):
+            loaded = strip_header(loaded[0], header, common[header.key][0]), loaded[1]
+        write_file_section(out, path, language, ranges, loaded, index, verbose)
+    return len(files)
+
+
+# Compressors for watch mode, which writes the output file itself
+COMPRESSORS = {".gz": ["gzip", "-c"], ".zst": ["zstd", "-q", "-c"]}
+
+
+def replace_output(output_file, sections, no_toc=False, index_path=None, verbose=False):
+    """
+    Write the document for the cached sections to output_file atomically.
+
+    `sections` maps path -> (language, ranges, loaded) and is written in path
+    order. The output (compressed by name, like the sink in
+    combine_to_txt.sh) and the index are written to temporary files first,
+    so readers never see a partial document.
+    """
+    tmp_file = f"{output_file}.tmp"
+    compressor = next((command for suffix, command in COMPRESSORS.items()
+                       if output_file.endswith(suffix)), None)
+    index = IndexWriter(f"{index_path}.tmp", output_file) if index_path else None
+    with open(tmp_file, "wb") as f:
+        process = subprocess.Popen(compressor, stdin=subprocess.PIPE, stdout=f) if compressor else None
+        out = CountingWriter(process.stdin if process else f)
+        if not no_toc:
+            write_toc(out, [(path,) for path in sorted(sections)])
+        for path in sorted(sections):
+            language, ranges, loaded = sections[path]
+            write_file_section(out, path, language, ranges, loaded, index, verbose)
+        if process:
+            process.stdin.close()
+            if process.wait() != 0:
+                raise OSError(f"{compressor[0]} failed writing {output_file}")
+    os.replace(tmp_file, output_file)
+    if index is not None:
+        index.write()
+        os.replace(index.index_path, index_path)
+
+
+def watch_combined(target_dir, stream, output_file, no_toc=False, index_path=None, verbose=False,
+                   max_file_size=None, jobs=DEFAULT_JOBS, max_buffered=DEFAULT_MAX_BUFFERED,
+                   generated="skip"):
+    """
+    Keep output_file current: the first batch on stream is the full file list,
+    every later batch lists changed paths ("dir/" for a removed directory).
+
+    Only the files in a batch are re-read; the document is rewritten when a
+    section was added, removed or changed. Returns when the stream ends.
+    """
+    sections = {}
+    # Never pick up the files this process writes
+    own_files = {os.path.relpath(os.path.abspath(name), target_dir)
+                 for name in (output_file, f"{output_file}.tmp", index_path, f"{index_path}.tmp")
+                 if name}
+
+    for number, batch in enumerate(read_batches(stream)):
+        started = time.perf_counter()
+        removed = set()
+        present = []
+        for path, language, ranges in batch:
+            if path.endswith("/"):
+                removed.update(name for name in sections if name.startswith(path))
+            elif path in own_files:
+                continue
+            elif os.path.isfile(os.path.join(target_dir, path)):
+                present.append((path, language, ranges))
+            elif path in sections:
+                removed.add(path)
+
+        selected = select_text_files(target_dir, present, max_file_size, jobs, verbose, generated)
+        # Files that became binary, generated or too large drop out
+        selected_paths = {path for path, *_ in selected}
+        removed.update(path for path, _, _ in present
+                       if path in sections and path not in selected_paths)
+
+        def load(item):
+            path, _, _, encoding, _ = item
+            return read_body(os.path.join(target_dir, path), encoding)
+
+        changed = 0
+        for (path, language, ranges, _, _), loaded in prefetch_ordered(
+                selected, load, jobs, max_buffered, size_of=lambda item: item[4]):
+            section = (language, ranges, loaded)
+            if sections.get(path) != section:
+                sections[path] = section
+                changed += 1
+        for path in removed:
+            del sections[path]
+
+        if number == 0 or changed or removed:
+            replace_output(output_file, sections, no_toc, index_path, verbose)
+            if number > 0:
+                print(f"Updated {output_file}: {changed} changed, {len(removed)} removed "
+                      f"({(time.perf_counter() - started) * 1000:.0f}ms)", file=sys.stderr)
+            else:
+                print(f"Wrote {output_file} ({len(sections)} files); watching for changes",
+                      file=sys.stderr)
+            sys.stderr.flush()
+
+
+def parse_size(size):
+    """Convert a size string such as 500K, 1M or 2048 (or an int) to bytes."""
+    size = str(size).strip()
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    if size and size[-1].upper() in units:
+        return int(size[:-1]) * units[size[-1].upper()]
+    return int(size)
+
+
+def _split(value):
+    return [item for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write the code2txt document for the \"path[<TAB>language[<TAB>ranges]]\" "
+                    "lines on stdin to stdout."
+    )
+    parser.add_argument("target_dir", help="Directory the relative paths are resolved against")
+    parser.add_argument("--archive", action="store_true",
+                        help="target_dir is a tar or zip archive; its members are listed and "
+                             "filtered here instead of read from stdin")
+    parser.add_argument("output_file", help="Name of the final output, recorded in the index")
+    parser.add_argument("--no-toc", action="store_true", help="Skip the table of contents")
+    parser.add_argument("--index", default="", help="Path for the sidecar index")
+    parser.add_argument("--max-file-size", default="", help="Skip files larger than this (e.g. 500K)")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Concurrent file reads")
+    parser.add_argument("--max-buffer", default=str(DEFAULT_MAX_BUFFERED),
+                        help="Cap on bytes read ahead of the writer (e.g. 64M)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Report skipped and transcoded files on stderr")
+    parser.add_argument("--generated", choices=GENERATED_MODES, default="skip",
+                        help="Skip generated and minified files, write a stub for them, or keep them "
+                             "(default: skip)")
+    parser.add_argument("--strip-headers", action="store_true",
+                        help="Write leading comment blocks shared by several files once and omit "
+                             "them from their sections")
+    parser.add_argument("--stats", choices=("table", "json"),
+                        help="Report files, bytes, lines, tokens and pages per language and directory")
+    parser.add_argument("--stats-file", default="",
+                        help="Write the statistics here (default: stdout with --stats-only, else stderr)")
+    parser.add_argument("--stats-only", action="store_true",
+                        help="Read and count the files without writing the document")
+    for option, what in (("--ignore-folders", "folder names"), ("--ignore-files", "file names"),
+                         ("--ignore-types", "extensions"), ("--include-types", "extensions to keep")):
+        parser.add_argument(option, default="", help=f"With --archive: comma-separated {what}")
+    parser.add_argument("--watch", action="store_true",
+                        help="Write output_file itself and keep it current from batches of "
+                             "changed paths on stdin")
+    args = parser.parse_args()
+
+    if args.watch:
+        try:
+            watch_combined(
+                args.target_dir, sys.stdin, args.output_file, args.no_toc, args.index or None,
+                args.verbose, parse_size(args.max_file_size) if args.max_file_size else None,
+                max(1, args.jobs), parse_size(args.max_buffer), args.generated
+            )
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    archive = None
+    if args.archive:
+        select = archive_filter(*(_split(option) for option in (
+            args.ignore_folders, args.ignore_files, args.ignore_types, args.include_types)))
+        try:
+            archive = ArchiveSource(args.target_dir, select, SAMPLE_SIZE + 1)
+        except (OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+            print(f"Error: Could not read archive '{args.target_dir}': {e}", file=sys.stderr)
+            sys.exit(1)
+        files = [(path, language_for(path), []) for path in archive.names()]
+        if not files:
+            archive.close()
+            print("Warning: No files were processed. Check your filters and target directory.",
+                  file=sys.stderr)
+            sys.exit(NO_FILES)
+        if args.verbose:
+            for path, _, _ in files:
+                print(f"Processing: {path}", file=sys.stderr)
+    else:
+        files = read_file_list(sys.stdin)
+    index = IndexWriter(args.index, args.output_file) if args.index and not args.stats_only else None
+    stats = RepoStats() if args.stats or args.stats_only else None
+
+    out = open(os.devnull, "wb") if args.stats_only else sys.stdout.buffer
+    try:
+        written = write_combined(
+            args.target_dir, files, out, args.no_toc, index, args.verbose,
+            parse_size(args.max_file_size) if args.max_file_size else None,
+            max(1, args.jobs), parse_size(args.max_buffer), stats, args.generated, archive,
+            args.strip_headers
+        )
+        out.flush()
+    except BrokenPipeError:
+        sys.exit(1)
+
+    if archive is not None:
+        archive.close()
+    if index is not None:
+        index.write()
+
+    if stats is not None:
+        report = stats.format(args.stats or "table")
+        if args.stats_file:
+            with open(args.stats_file, "w", encoding="utf-8") as f:
+                f.write(report)
+        else:
+            print(report, end="", file=sys.stdout if args.stats_only else sys.stderr)
+
+    if written == 0:
+        print("Warning: No text files were found among the selected files.", file=sys.stderr)
+        sys.exit(1)
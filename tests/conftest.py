@@ -3,11 +3,15 @@
 import os
 import shutil
 import subprocess
+import sys
 import tempfile
 from pathlib import Path
 from typing import Generator, Tuple
 import pytest
 
+# Make the Python helpers in scripts/ importable from the tests
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
 
 @pytest.fixture
 def temp_dir() -> Generator[Path, None, None]:
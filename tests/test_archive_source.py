@@ -0,0 +1,81 @@
+"""Test suite for reading sources from tar and zip archives."""
+
+import io
+import shutil
+import tarfile
+from tests.conftest import run_command, create_test_files, read_output_file
+from archive_source import ArchiveSource
+from source_reader import SAMPLE_SIZE
+from source_rules import language_for
+from write_combined import archive_filter, write_combined
+
+FILES = {
+    "README.md": "# Snapshot\n",
+    "src/main.py": "print('hello')\n",
+    "src/util.js": "export const x = 1;\n",
+    "node_modules/dep/index.js": "module.exports = {};\n",
+    ".github/ci.yml": "on: push\n",
+}
+
+
+class TestArchiveSource:
+    """Test cases for listing and reading archive members without extracting them."""
+
+    def test_members_read_in_any_order(self, temp_dir):
+        """Test that the shared top directory and hidden entries are dropped, and members read out of order."""
+        create_test_files(temp_dir / "proj-1.0", FILES)
+        archive = temp_dir / "snapshot.tar.gz"
+        with tarfile.open(archive, "w:gz") as tar:
+            # Stored in reverse order, so sorted reads have to pass members over
+            for name in sorted(FILES, reverse=True):
+                tar.add(temp_dir / "proj-1.0" / name, f"proj-1.0/{name}")
+
+        source = ArchiveSource(str(archive))
+        names = source.names()
+        source.expect(names)
+        contents = {name: source.read(name) for name in names}
+        source.close()
+
+        assert names == ["README.md", "node_modules/dep/index.js", "src/main.py", "src/util.js"]
+        assert contents == {name: FILES[name].encode() for name in names}
+
+    def test_code2txt_archive_matches_directory(self, code2txt_path, temp_dir):
+        """Test that code2txt writes the same document for an archive as for the extracted tree."""
+        source = temp_dir / "proj"
+        create_test_files(source, FILES)
+        from_directory, from_tar, from_zip = (temp_dir / name for name in ("dir.txt", "tar.txt", "zip.txt"))
+        with tarfile.open(temp_dir / "proj.tar.xz", "w:xz") as tar:
+            tar.add(source, "proj")
+        shutil.make_archive(str(temp_dir / "proj"), "zip", source)
+
+        for target, output in ((source, from_directory), (temp_dir / "proj.tar.xz", from_tar),
+                               (temp_dir / "proj.zip", from_zip)):
+            returncode, _, stderr = run_command([str(code2txt_path), "-o", str(output), str(target)])
+            assert returncode == 0, stderr
+
+        expected = read_output_file(from_directory)
+        assert "src/main.py" in expected and "node_modules" not in expected
+        assert read_output_file(from_tar) == expected
+        assert read_output_file(from_zip) == expected
+
+    def test_tar_read_in_two_passes(self, temp_dir, monkeypatch):
+        """Test that a compressed tar is decompressed once for the listing and checks, and once for the bodies."""
+        files = dict(FILES, **{"src/big.py": "x = 1\n" * SAMPLE_SIZE})
+        create_test_files(temp_dir / "proj", files)
+        archive = temp_dir / "proj.tar.gz"
+        with tarfile.open(archive, "w:gz") as tar:
+            tar.add(temp_dir / "proj", "proj")
+        opens = []
+        tar_open = tarfile.open
+        monkeypatch.setattr(tarfile, "open", lambda *args, **kwargs: opens.append(args) or tar_open(*args, **kwargs))
+
+        source = ArchiveSource(str(archive), archive_filter(["node_modules"]), SAMPLE_SIZE + 1)
+        out = io.BytesIO()
+        paths = source.names()
+        assert write_combined(str(archive), [(path, language_for(path), []) for path in paths], out,
+                              archive=source) == 4
+        source.close()
+
+        assert paths == ["README.md", "src/big.py", "src/main.py", "src/util.js"]
+        assert len(opens) == 2
+        assert files["src/big.py"].encode() in out.getvalue()
@@ -0,0 +1,74 @@
+"""Test suite for the importable code2pdf_api module."""
+
+import io
+import shutil
+import pytest
+from tests.conftest import run_command, create_test_files
+from code2pdf_api import scan, filter_files, combine_text, render_pdf, language_for, PdfBuilder
+
+
+class TestCode2pdfApi:
+    """Test cases for the in-process scan, filter, combine and render stages."""
+
+    def test_scan_and_filter(self, temp_dir):
+        """Test that scan and filter_files select the same files as the CLI walk."""
+        create_test_files(temp_dir, {
+            "src/app.py": "print('app')\n",
+            "src/notes.txt": "notes\n",
+            "node_modules/lib/index.js": "module.exports = {};\n",
+            ".hidden/secret.py": "x = 1\n",
+            "Makefile": "all:\n",
+            "package-lock.json": "{}\n",
+        })
+
+        files = filter_files(scan(temp_dir), ignore_files=("package-lock.json",))
+
+        assert files == ["Makefile", "src/app.py"]
+        assert filter_files(files, include_types=("py",)) == ["src/app.py"]
+        assert language_for("Makefile") == "makefile"
+        assert language_for("web/app.tsx") == "typescript"
+
+    def test_combine_matches_cli(self, code2txt_path, sample_project_dir, temp_dir):
+        """Test that combining scanned paths produces the code2txt output byte for byte."""
+        output_file = temp_dir / "combined.txt"
+        run_command([str(code2txt_path), "-o", str(output_file), str(sample_project_dir)])
+
+        combined = combine_text(filter_files(scan(sample_project_dir)), root=sample_project_dir)
+
+        assert combined == output_file.read_bytes()
+
+    def test_combine_in_memory(self):
+        """Test that (name, bytes) pairs are combined into a file-like object."""
+        out = io.BytesIO()
+        result = combine_text([
+            ("main.py", b"print('hello')\n"),
+            ("data.bin", b"\x00\x01\x02\x03"),
+            ("utf16.js", "const s = '你好';\n".encode("utf-16")),
+        ], out=out)
+
+        content = out.getvalue().decode("utf-8")
+        assert result is None
+        assert "## main.py\n```python\nprint('hello')\n" in content
+        assert "data.bin" not in content
+        assert "const s = '你好';" in content
+
+    def test_render_pdf_in_memory(self):
+        """Test that pairs are rendered to PDF bytes without touching the filesystem."""
+        pytest.importorskip("weasyprint")
+        pdf = render_pdf([("main.py", b"print('hello')\n"), ("data.bin", b"\x00\x01\x02")])
+
+        assert pdf.startswith(b"%PDF")
+
+    def test_pdf_builder_releases_laid_out_pages(self):
+        """Test that pages beyond max_pages go to part PDFs, merged into one PDF at the end."""
+        pytest.importorskip("weasyprint")
+        if not shutil.which("gs"):
+            pytest.skip("Ghostscript is not installed")
+        builder = PdfBuilder(max_pages=1)
+        for number in range(4):
+            builder.add(f"file_{number}.py", f"print({number})\n")
+
+        assert builder.parts and len(builder.documents) <= 1
+        pdf = builder.write()
+        assert pdf.startswith(b"%PDF")
+        assert not builder.parts
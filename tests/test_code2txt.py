@@ -1,9 +1,17 @@
 """Test suite for code2txt tool."""
 
+import gzip
+import io
+import json
 import os
+import shutil
+import subprocess
+import time
 from pathlib import Path
 import pytest
 from tests.conftest import run_command, create_test_files, read_output_file
+from combined_index import CombinedReader
+from write_combined import write_hunks
 
 
 class TestCode2txt:
@@ -185,6 +193,18 @@ class TestCode2txt:
         assert returncode != 0
         assert "does not exist" in stderr or "Error" in stderr or "does not exist" in stdout or "Error" in stdout
     
+    def test_invalid_sizes(self, code2txt_path, sample_project_dir, temp_dir):
+        """Test that malformed --max-buffer and --max-file-size values are rejected with a one-line error."""
+        for option in ("--max-buffer", "--max-file-size"):
+            returncode, stdout, stderr = run_command(
+                [str(code2txt_path), option, "abc", "-o", str(temp_dir / "output.txt"), str(sample_project_dir)]
+            )
+
+            assert returncode == 1
+            assert f"Error: {option} expects a size" in stdout + stderr
+            assert "Traceback" not in stderr
+            assert not (temp_dir / "output.txt").exists()
+
     def test_language_detection(self, code2txt_path, temp_dir, assertions):
         """Test language detection for various file types."""
         test_files = {
@@ -298,4 +318,236 @@ class TestCode2txt:
         cat_dog_pos = content.find("cat/dog.py")
         zebra_pos = content.find("zebra.py")
         
-        assert apple_pos < banana_pos < cat_dog_pos < zebra_pos
\ No newline at end of file
+        assert apple_pos < banana_pos < cat_dog_pos < zebra_pos
+    
+    def test_gzip_output(self, code2txt_path, sample_project_dir, temp_dir):
+        """Test that a .gz output name produces gzip-compressed output."""
+        plain_output = temp_dir / "plain.txt"
+        gzip_output = temp_dir / "combined.txt.gz"
+        run_command([str(code2txt_path), "-o", str(plain_output), str(sample_project_dir)])
+        returncode, stdout, stderr = run_command(
+            [str(code2txt_path), "-o", str(gzip_output), str(sample_project_dir)]
+        )
+        
+        assert returncode == 0
+        assert gzip.decompress(gzip_output.read_bytes()).decode() == read_output_file(plain_output)
+    
+    def test_stdout_output(self, code2txt_path, sample_project_dir, temp_dir):
+        """Test that -o - writes the combined output to stdout only."""
+        plain_output = temp_dir / "plain.txt"
+        run_command([str(code2txt_path), "-o", str(plain_output), str(sample_project_dir)])
+        returncode, stdout, stderr = run_command(
+            [str(code2txt_path), "--verbose", "-o", "-", str(sample_project_dir)]
+        )
+        
+        assert returncode == 0
+        assert stdout == read_output_file(plain_output)
+        assert "Configuration:" in stderr
+    
+    def test_index_option(self, code2txt_path, temp_dir):
+        """Test that --index records byte ranges that slice out each file body."""
+        test_files = {
+            "src/app.py": "print('app')\n",
+            "docs/guide.md": "# Guide\n```python\nprint('fenced')\n```\n",
+            "unicode.js": "const s = '你好';"
+        }
+        create_test_files(temp_dir / "project", test_files)
+        
+        output_file = temp_dir / "combined.txt"
+        returncode, stdout, stderr = run_command(
+            [str(code2txt_path), "--index", "-o", str(output_file), str(temp_dir / "project")]
+        )
+        
+        assert returncode == 0
+        with CombinedReader(str(output_file) + ".idx") as reader:
+            assert reader.paths() == ["docs/guide.md", "src/app.py", "unicode.js"]
+            for path, content in test_files.items():
+                assert reader.read(path, verify=True) == content.encode()
+            assert reader.entry("docs/guide.md")["lines"] == 4
+            assert reader.entry("src/app.py")["language"] == "python"
+    
+    def test_encoding_detection(self, code2txt_path, temp_dir):
+        """Test that non-UTF-8 text is transcoded and binary files are skipped."""
+        project = temp_dir / "project"
+        project.mkdir()
+        (project / "utf16.py").write_bytes("print('你好')\n".encode("utf-16"))
+        (project / "bom.py").write_bytes(b"\xef\xbb\xbfprint('bom')\n")
+        (project / "latin1.py").write_bytes("print('café')\n".encode("latin-1"))
+        (project / "data.dat").write_bytes(b"\x00\x01\x02\x03" * 64)
+        
+        output_file = temp_dir / "combined.txt"
+        returncode, stdout, stderr = run_command(
+            [str(code2txt_path), "--verbose", "-o", str(output_file), str(project)]
+        )
+        
+        assert returncode == 0
+        content = output_file.read_bytes().decode("utf-8")
+        assert "print('你好')" in content
+        assert "\ufeff" not in content
+        assert "print('café')" in content
+        assert "data.dat" not in content
+        assert "Skipping data.dat (binary content)" in stderr
+    
+    def test_since_hunks(self, code2txt_path, temp_dir):
+        """Test --since with --hunks renders only changed lines with their line numbers."""
+        project = temp_dir / "project"
+        create_test_files(project, {
+            "changed.py": "".join(f"x = {i}\n" for i in range(1, 51)),
+            "unchanged.py": "print('same')\n"
+        })
+        git = ["git", "-C", str(project), "-c", "user.name=test", "-c", "user.email=test@example.com"]
+        run_command(git + ["init", "-q"])
+        run_command(git + ["add", "-A"])
+        run_command(git + ["commit", "-q", "-m", "base"])
+        (project / "changed.py").write_text(
+            "".join(f"x = {i * 100 if i == 25 else i}\n" for i in range(1, 51))
+        )
+        create_test_files(project, {"new.py": "print('new')\n"})
+        
+        output_file = temp_dir / "changes.txt"
+        returncode, stdout, stderr = run_command(
+            [str(code2txt_path), "--since", "HEAD", "--hunks", "--context", "2",
+             "-o", str(output_file), str(project)]
+        )
+        
+        assert returncode == 0
+        content = read_output_file(output_file)
+        assert "## changed.py" in content
+        assert "## new.py" in content
+        assert "unchanged.py" not in content
+        assert "Lines 23-27:" in content
+        assert "x = 2500" in content
+        assert "x = 22\n" not in content
+        assert "x = 28\n" not in content
+    
+    def test_since_hunks_ignores_diff_prefix_config(self, code2txt_path, temp_dir):
+        """Test --hunks with diff.mnemonicPrefix or diff.noprefix set, and with a pure rename."""
+        project = temp_dir / "project"
+        create_test_files(project, {
+            "plain.py": "".join(f"x = {i}\n" for i in range(1, 21)),
+            "old_name.py": "print('moved')\n"
+        })
+        git = ["git", "-C", str(project), "-c", "user.name=test", "-c", "user.email=test@example.com"]
+        run_command(git + ["init", "-q"])
+        run_command(git + ["add", "-A"])
+        run_command(git + ["commit", "-q", "-m", "base"])
+        (project / "plain.py").write_text("".join(f"x = {i * 100 if i == 10 else i}\n" for i in range(1, 21)))
+        run_command(git + ["mv", "old_name.py", "new_name.py"])
+        
+        for setting in ("diff.mnemonicPrefix", "diff.noprefix"):
+            run_command(["git", "-C", str(project), "config", setting, "true"])
+            output_file = temp_dir / f"{setting}.txt"
+            returncode, stdout, stderr = run_command(
+                [str(code2txt_path), "--since", "HEAD", "--hunks", "--context", "1",
+                 "-o", str(output_file), str(project)]
+            )
+            run_command(["git", "-C", str(project), "config", "--unset", setting])
+            
+            assert returncode == 0, stderr
+            content = read_output_file(output_file)
+            assert "Lines 9-11:" in content and "x = 1000" in content
+            assert "## new_name.py" in content and "print('moved')" in content
+    
+    def test_hunks_count_only_newlines(self):
+        """Test that form feeds and lone carriage returns do not shift hunk lines."""
+        body = b"".join(b"\f\n" if i == 3 else b"a\rb\n" if i == 5 else b"line %d\n" % i
+                        for i in range(1, 11))
+        out = io.BytesIO()
+
+        write_hunks(out, body, "text", [(7, 8)])
+
+        assert out.getvalue() == b"\nLines 7-8:\n```text\nline 7\nline 8\n```\n"
+
+    def test_concurrent_reads_keep_order(self, code2txt_path, temp_dir):
+        """Test that concurrent reads with a tiny read-ahead cap produce the sequential output."""
+        files = {f"dir{i % 7}/file_{i:03d}.py": f"# File {i}\n" + "x = 1\n" * i for i in range(60)}
+        create_test_files(temp_dir / "project", files)
+        
+        outputs = []
+        for jobs, max_buffer in (("1", "64M"), ("16", "1K")):
+            output_file = temp_dir / f"jobs_{jobs}.txt"
+            returncode, stdout, stderr = run_command(
+                [str(code2txt_path), "--jobs", jobs, "--max-buffer", max_buffer,
+                 "-o", str(output_file), str(temp_dir / "project")]
+            )
+            assert returncode == 0
+            outputs.append(read_output_file(output_file))
+        
+        assert outputs[0] == outputs[1]
+        assert outputs[0].count("\n## ") == 60
+    
+    def test_stats_only(self, code2txt_path, temp_dir):
+        """Test that --stats-only reports per-language and per-directory counts without output."""
+        create_test_files(temp_dir / "project", {
+            "src/app.py": "a = 1\nb = 2\n",
+            "src/util.py": "c = 3",
+            "web/index.js": "x();\n" * 100,
+            "data.bin": "\x00\x01\x02\x03"
+        })
+        output_file = temp_dir / "combined.txt"
+        returncode, stdout, stderr = run_command(
+            [str(code2txt_path), "--stats-only", "--stats", "json",
+             "-o", str(output_file), str(temp_dir / "project")]
+        )
+        
+        assert returncode == 0
+        assert not output_file.exists()
+        stats = json.loads(stdout)
+        assert stats["total"]["files"] == 3
+        assert stats["languages"]["python"] == {
+            "files": 2, "bytes": 17, "lines": 3, "tokens": 5, "pages": 2
+        }
+        assert stats["directories"]["web"]["lines"] == 100
+        assert stats["directories"]["web"]["pages"] == 2
+    
+    def test_stats_with_output(self, code2txt_path, sample_project_dir, temp_dir):
+        """Test that --stats prints a table after writing the normal output."""
+        output_file = temp_dir / "combined.txt"
+        returncode, stdout, stderr = run_command(
+            [str(code2txt_path), "--stats", "table", "-o", str(output_file), str(sample_project_dir)]
+        )
+        
+        assert returncode == 0
+        assert output_file.exists()
+        assert "Language" in stdout and "Directory" in stdout and "Tokens" in stdout
+        assert "Successfully created" in stdout
+    
+    def test_watch_requires_file_output(self, code2txt_path, sample_project_dir):
+        """Test that --watch refuses to write to stdout."""
+        returncode, stdout, stderr = run_command(
+            [str(code2txt_path), "--watch", "-o", "-", str(sample_project_dir)]
+        )
+        
+        assert returncode == 1
+        assert "--watch requires a file output" in stderr
+    
+    @pytest.mark.skipif(shutil.which("inotifywait") is None, reason="inotifywait not installed")
+    def test_watch_updates_output(self, code2txt_path, temp_dir):
+        """Test that --watch rewrites the output with changed, new and deleted files."""
+        project = temp_dir / "project"
+        create_test_files(project, {"a.py": "a = 1\n", "b.py": "b = 1\n"})
+        output_file = temp_dir / "combined.txt"
+        
+        def wait_for(predicate):
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                if output_file.exists() and predicate(read_output_file(output_file)):
+                    return True
+                time.sleep(0.1)
+            return False
+        
+        process = subprocess.Popen(
+            [str(code2txt_path), "--watch", "-o", str(output_file), str(project)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+        )
+        try:
+            assert wait_for(lambda content: "b = 1" in content)
+            time.sleep(0.5)  # Let inotifywait set up its watches
+            (project / "a.py").write_text("a = 2\n")
+            (project / "c.py").write_text("c = 1\n")
+            (project / "b.py").unlink()
+            assert wait_for(lambda content: "a = 2" in content and "## b.py" not in content)
+            assert "## c.py" in read_output_file(output_file)
+        finally:
+            os.killpg(process.pid, 15)
+            process.wait()
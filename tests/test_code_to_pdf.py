@@ -0,0 +1,92 @@
+"""Test suite for the code_to_pdf.py renderer."""
+
+import io
+import json
+import pytest
+
+pytest.importorskip("weasyprint")
+import code_to_pdf
+from repo_stats import RepoStats
+
+
+class TestCodeToPdf:
+    """Test cases for HTML generation in code_to_pdf.py."""
+
+    def test_byte_budget_fallback(self):
+        """Test that files over the byte budget are rendered as plain text."""
+        stats = {}
+        code_to_pdf.generate_html(
+            "bundle.js", "var a = 1;" * 1000,
+            budget=code_to_pdf.HighlightBudget(max_bytes=1024), stats=stats
+        )
+
+        assert stats["lexer"] == "JavaScript"
+        assert "exceeds 1024" in stats["fallback"]
+
+    def test_time_budget_fallback(self):
+        """Test that lexing is abandoned once the time budget is exhausted."""
+        stats = {}
+        html = code_to_pdf.generate_html(
+            "app.js", "var a = 1;\n" * 20000,
+            budget=code_to_pdf.HighlightBudget(max_seconds=0), stats=stats
+        )
+
+        assert "lexing exceeded" in stats["fallback"]
+        assert "var a = 1;" in html
+
+    def test_within_budget(self):
+        """Test that small files are highlighted with their own lexer."""
+        stats = {}
+        code_to_pdf.generate_html("main.py", "print('hello')\n", stats=stats)
+
+        assert stats["lexer"] == "Python"
+        assert stats["fallback"] is None
+
+    def test_hunks_keep_original_line_numbers(self):
+        """Test that rendering line ranges numbers lines as in the original file."""
+        content = "".join(f"x = {i}\n" for i in range(1, 51))
+        html = code_to_pdf.generate_html("main.py", content, line_ranges=[(40, 42)])
+
+        assert "Lines 40-42" in html
+        assert '<span class="mi">41</span>' in html
+        assert '<span class="mi">39</span>' not in html
+        assert '<span class="mi">43</span>' not in html
+
+    def test_hunks_count_only_newlines(self):
+        """Test that a form feed line does not shift the hunk, as splitlines() would."""
+        content = "".join(f"x = {i}\n" if i != 20 else "\f\n" for i in range(1, 51))
+        html = code_to_pdf.generate_html("main.py", content, line_ranges=[(40, 42)])
+
+        assert "Lines 40-42" in html
+        assert '<span class="mi">40</span>' in html and '<span class="mi">42</span>' in html
+        assert '<span class="mi">39</span>' not in html
+
+    def test_fonts_follow_content(self):
+        """Test that CJK font faces are only named for files that contain CJK text."""
+        ascii_stats, cjk_stats = {}, {}
+        ascii_html = code_to_pdf.generate_html("main.py", "x = 1\n", stats=ascii_stats)
+        code_to_pdf.generate_html("main.py", "# 你好\nx = 1\n", stats=cjk_stats)
+
+        assert ascii_stats["scripts"] == ()
+        assert "CJK" not in ascii_html
+        assert cjk_stats["scripts"] == ("sc",)
+
+    def test_skipped_file_drops_old_output(self, tmp_path):
+        """Test that a file skipped as binary removes the PDF rendered from its earlier text."""
+        source, output = tmp_path / "data.py", tmp_path / "data.pdf"
+        source.write_bytes(b"\x00\x01\x02\x03" * 64)
+        output.write_bytes(b"%PDF stale")
+
+        assert code_to_pdf.convert_one(str(source), str(output), "data.py") == code_to_pdf.EXIT_BINARY
+        assert not output.exists()
+
+    def test_stats_languages_match_code2txt(self, tmp_path):
+        """Test that --stats names languages by the fence language, not by the Pygments lexer."""
+        for name in ("main.py", "app.tsx", "util.h"):
+            (tmp_path / name).write_text("x\n")
+        jobs = "".join(f"{tmp_path / name}\t{tmp_path / name}.pdf\t{name}\n"
+                       for name in ("main.py", "app.tsx", "util.h"))
+
+        stats = RepoStats()
+        assert code_to_pdf.convert_batch(io.StringIO(jobs), stats=stats, stats_only=True) == 0
+        assert sorted(json.loads(stats.to_json())["languages"]) == ["cpp", "python", "typescript"]
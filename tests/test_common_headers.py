@@ -0,0 +1,50 @@
+"""Test suite for writing headers shared by several files only once."""
+
+import io
+from tests.conftest import create_test_files
+from common_headers import find_header
+from write_combined import write_combined
+from repo_stats import RepoStats
+
+LICENSE = "# Copyright 2024 Example Corp\n# Licensed under the MIT License\n# See LICENSE for details\n"
+
+
+class TestCommonHeaders:
+    """Test cases for code2txt --strip-headers."""
+
+    def test_find_header(self):
+        """Test that leading comment blocks are found in the syntax of each language."""
+        script = find_header("#!/bin/sh\n" + LICENSE + "echo hi\n", "bash")
+        c_header = find_header("/*\n * Copyright\n * Apache 2.0\n */\n#include <stdio.h>\n", "c")
+        reindented = find_header(LICENSE.replace("# ", "#   "), "python")
+
+        assert (script.start, script.end) == (1, 4)
+        assert (c_header.start, c_header.end) == (0, 4)
+        assert reindented.key == script.key
+        assert find_header("# Short\nx = 1\n", "python") is None
+        assert find_header(LICENSE, "json") is None
+        assert find_header("/*\n * Copyright\n * Apache 2.0\n", "c", complete=False) is None
+
+    def test_header_written_once(self, temp_dir):
+        """Test that a header starting three files is written once and replaced by a marker."""
+        create_test_files(temp_dir, {
+            "a.py": LICENSE + "a = 1\n",
+            "b.py": LICENSE + "b = 2\n",
+            "c.py": LICENSE + "c = 3\n",
+            "d.py": "# Different header\n# with its own text\n# only here\nd = 4\n",
+        })
+        files = [(name, "python", []) for name in ("a.py", "b.py", "c.py", "d.py")]
+        out, stats, unstripped = io.BytesIO(), RepoStats(), RepoStats()
+
+        write_combined(str(temp_dir), files, out, stats=stats, strip_headers=True)
+        write_combined(str(temp_dir), files, io.BytesIO(), stats=unstripped)
+
+        content = out.getvalue().decode()
+        assert content.count("Copyright 2024 Example Corp") == 1
+        assert "Header 1 (3 files):" in content
+        assert "## c.py\n```python\n[common header 1 omitted (3 lines), see Common Headers at the top]\nc = 3\n" \
+            in content
+        assert "# Different header" in content
+        # Statistics describe the files, not the stripped sections
+        assert stats.total == unstripped.total
+        assert stats.total["lines"] == 16
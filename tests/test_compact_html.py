@@ -0,0 +1,61 @@
+"""Test suite for the compact_html formatter."""
+
+import re
+from pygments import format as format_tokens
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import PythonLexer
+from pygments.token import Error, Name, Text
+from compact_html import CompactHtmlFormatter
+
+SOURCE = '''def add(a, b=1):
+    """Add
+    numbers."""
+    return a + b  # sum
+'''
+
+
+def render(formatter_class, tokens, **options):
+    return format_tokens(tokens, formatter_class(style='default', linenos='inline',
+                                                 cssclass='highlight', **options))
+
+
+def strip_tags(html):
+    return re.sub(r'<[^>]+>', '', html)
+
+
+class TestCompactHtml:
+    """Test cases for CompactHtmlFormatter."""
+
+    def test_same_text_and_line_numbers(self):
+        """Test that the text and the line number spans match the stock formatter."""
+        tokens = list(PythonLexer().get_tokens(SOURCE))
+        for start in (1, 98):
+            stock = render(HtmlFormatter, tokens, linenostart=start)
+            compact = render(CompactHtmlFormatter, tokens, linenostart=start)
+
+            assert strip_tags(compact) == strip_tags(stock)
+            assert (re.findall(r'<span class="linenos">[^<]*</span>', compact)
+                    == re.findall(r'<span class="linenos">[^<]*</span>', stock))
+            assert compact.count('<span') < stock.count('<span')
+
+    def test_unstyled_and_merged_tokens(self):
+        """Test that unstyled tokens and whitespace get no span and same styles share one."""
+        html = render(CompactHtmlFormatter, list(PythonLexer().get_tokens(SOURCE)))
+
+        assert '<span class="k">def</span> <span class="nf">add</span>(a, b' in html
+        assert '    <span class="k">return</span> a <span class="o">+</span> b  <span class="c1">' in html
+        # The docstring is split by line numbers only
+        assert '<span class="sd">&quot;&quot;&quot;Add</span>' in html
+        assert '<span class="sd">    numbers.&quot;&quot;&quot;</span>' in html
+
+        merged = render(CompactHtmlFormatter, [(Name.Builtin, 'len'), (Text, ' '),
+                                               (Name.Builtin, 'str'), (Text, '\n')])
+        assert '<span class="nb">len str</span>' in merged
+
+    def test_visible_whitespace_keeps_its_span(self):
+        """Test that whitespace is only unstyled when its style does not show on blanks."""
+        html = render(CompactHtmlFormatter, [(Error, '  '), (Error, 'x'), (Text, ' '),
+                                             (Error, 'y'), (Text, '\n')])
+
+        # Error has a border: its blanks stay inside, the plain blank stays outside
+        assert '<span class="err">  x</span> <span class="err">y</span>' in html
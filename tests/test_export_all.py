@@ -0,0 +1,60 @@
+"""Test suite for writing several outputs from one pass (code2export)."""
+
+import io
+import json
+import pytest
+import code2pdf_api
+from tests.conftest import run_command, create_test_files, read_output_file
+from code2pdf_api import scan, filter_files, export
+from repo_stats import RepoStats
+
+FILES = {
+    "src/main.py": "print('hello')\n",
+    "src/util.js": "export const x = 1;\n",
+    "README.md": "# Project\n",
+    "package-lock.json": '{\n  "lockfileVersion": 3\n}\n',
+}
+
+
+class TestExportAll:
+    """Test cases for the one-walk export of text, index, statistics and PDF."""
+
+    def test_outputs_match_code2txt(self, project_root, code2txt_path, temp_dir):
+        """Test that the document and index are the ones code2txt writes, next to the statistics."""
+        source = temp_dir / "src"
+        create_test_files(source, FILES)
+        expected, exported = temp_dir / "expected.txt", temp_dir / "exported.txt"
+
+        returncode, _, stderr = run_command([str(code2txt_path), "--index", "-o", str(expected), str(source)])
+        assert returncode == 0, stderr
+        returncode, stdout, stderr = run_command([
+            str(project_root / "bin" / "code2export"), "--txt", str(exported), "--index",
+            "--stats", "json", str(source)
+        ])
+        assert returncode == 0, stderr
+
+        assert read_output_file(exported) == read_output_file(expected)
+        index_lines = read_output_file(temp_dir / "exported.txt.idx").splitlines()
+        expected_lines = read_output_file(temp_dir / "expected.txt.idx").splitlines()
+        assert index_lines[1:] == expected_lines[1:]
+        assert json.loads(stdout)["total"]["files"] == 3
+
+    def test_each_file_read_once(self, temp_dir, monkeypatch):
+        """Test that every output is fed from a single read of each file."""
+        create_test_files(temp_dir, FILES)
+        reads = []
+        read_source = code2pdf_api.read_source
+        monkeypatch.setattr(code2pdf_api, "read_source", lambda path: reads.append(path) or read_source(path))
+
+        txt, stats = io.BytesIO(), RepoStats()
+        files = filter_files(scan(temp_dir))
+        assert export(files, temp_dir, txt=txt, stats=stats) == 3
+        assert sorted(reads) == sorted(str(temp_dir / name) for name in files if name != "package-lock.json")
+        assert b"## src/main.py\n```python\nprint('hello')\n" in txt.getvalue()
+        assert json.loads(stats.to_json())["total"]["lines"] == 3
+
+        pytest.importorskip("weasyprint")
+        pdf, stats = io.BytesIO(), RepoStats()
+        export(files, temp_dir, pdf=pdf, stats=stats)
+        assert pdf.getvalue().startswith(b"%PDF")
+        assert json.loads(stats.to_json())["total"]["pages"] == 3
@@ -0,0 +1,58 @@
+"""Test suite for recognizing generated and minified files."""
+
+from tests.conftest import run_command, create_test_files, read_output_file
+from generated_files import classify
+
+GENERATED = {
+    "package-lock.json": '{\n  "lockfileVersion": 3\n}\n',
+    "static/app.min.js": "var a=1;\n",
+    "api/types.go": "// Code generated by protoc-gen-go. DO NOT EDIT.\npackage api\n",
+    "static/bundle.js": "var x=" + "1+" * 4000 + "1;\n",
+}
+
+
+class TestGeneratedFiles:
+    """Test cases for skipping lockfiles, minified bundles and generated code."""
+
+    def test_classify(self):
+        """Test that names, marker comments and line lengths flag a file, and ordinary code does not."""
+        assert classify("web/package-lock.json", b"{}") == "lockfile"
+        assert classify("app.min.js", b"var a=1;") == "minified"
+        assert classify("user_pb2.py", b"") == "protobuf"
+        assert classify("types.go", GENERATED["api/types.go"].encode()).startswith("marker:")
+        assert classify("bundle.js", GENERATED["static/bundle.js"].encode()).startswith("minified")
+        assert classify("main.py", b"# Not generated code, edit freely\nprint('hi')\n" * 200) is None
+
+    def test_prose_is_not_a_marker(self):
+        """Test that comments and prose merely mentioning generated code or editing are kept."""
+        assert classify("conf.py", b"# Do not edit the list below without updating docs/setup.md\n") is None
+        assert classify("README.md", b"# Layout\n\n* Stubs generated by protoc live in gen/\n") is None
+        assert classify("ids.py", b"# Helpers for auto-generated request IDs\n") is None
+        assert classify("gen.py", b'"""Write files that start with an @generated header."""\n') is None
+        assert classify("gen.py", b'"""\nEmits `@generated` markers.\n"""\n') is None
+        assert classify("a.py", b"# This file is generated by tools/gen.py; do not edit.\n").startswith("marker:")
+        assert classify("b.js", b"// @generated\n").startswith("marker:")
+
+    def test_code2txt_skips_and_stubs(self, code2txt_path, temp_dir):
+        """Test that code2txt skips and reports generated files by default and writes stubs with --generated stub."""
+        source = temp_dir / "src"
+        create_test_files(source, dict(GENERATED, **{"main.py": "print('hello')\n"}))
+        skipped, stubbed = temp_dir / "skipped.txt", temp_dir / "stubbed.txt"
+
+        returncode, _, reported = run_command([str(code2txt_path), "-o", str(skipped), str(source)])
+        assert returncode == 0, reported
+        returncode, _, stderr = run_command(
+            [str(code2txt_path), "--generated", "stub", "-o", str(stubbed), str(source)]
+        )
+        assert returncode == 0, stderr
+
+        content = read_output_file(skipped)
+        assert "main.py" in content
+        for path in GENERATED:
+            assert path not in content
+        # Reported without --verbose
+        assert "Skipping package-lock.json (generated: lockfile)" in reported
+        content = read_output_file(stubbed)
+        assert "Generated file not included (lockfile)" in content
+        assert "Generated file not included (minified" in content
+        assert "lockfileVersion" not in content
@@ -0,0 +1,66 @@
+"""Test suite for the plan_costs.py cost estimates."""
+
+import io
+import json
+import plan_costs
+from tests.conftest import create_test_files
+from plan_costs import calibrate, fit_model, plan, summarize, format_table
+
+MODEL = {"seconds_per_file": 0.5, "seconds_per_line": 0.01, "files": 0}
+
+
+class TestPlanCosts:
+    """Test cases for planning a code2pdf run without rendering it."""
+
+    def test_fit_model(self):
+        """Test that the per-line model is recovered from run report records."""
+        records = [{"lines": lines, "render_seconds": 0.3 + 0.002 * lines}
+                   for lines in (10, 50, 100, 400, 1000)]
+
+        model = fit_model(records)
+
+        assert abs(model["seconds_per_file"] - 0.3) < 1e-6
+        assert abs(model["seconds_per_line"] - 0.002) < 1e-9
+        assert model["files"] == 5
+        assert fit_model(records[:2]) is None
+
+    def test_small_run_refines_calibration(self, temp_dir, monkeypatch):
+        """Test that calibrating on a small run adds to the stored model instead of replacing it."""
+        monkeypatch.setattr(plan_costs, "MODEL_FILE", str(temp_dir / "render_model.json"))
+        large, small = temp_dir / "large.jsonl", temp_dir / "small.jsonl"
+        large.write_text("".join(json.dumps({"lines": lines, "render_seconds": 0.3 + 0.002 * lines}) + "\n"
+                                 for lines in range(10, 1010, 10)))
+        small.write_text("".join(json.dumps({"lines": lines, "render_seconds": 3.0}) + "\n"
+                                 for lines in (10, 20, 30, 40, 50)))
+
+        calibrate(str(large))
+        model = calibrate(str(small))
+
+        assert model["files"] == 105
+        assert plan_costs.load_model() == json.loads(json.dumps(model))
+        # On its own, the small run would fit 3 seconds per file and nothing per line
+        assert model["seconds_per_file"] < 1.0
+        assert model["seconds_per_line"] > 0.001
+
+    def test_plan_estimates_each_file(self, temp_dir):
+        """Test that text files are counted, binary files left out and hunks only count their lines."""
+        create_test_files(temp_dir, {
+            "small.py": "x = 1\n",
+            "big.py": "y = 2\n" * 200,
+        })
+        (temp_dir / "image.bin").write_bytes(b"\x89PNG\x00\x00\x01")
+        jobs = "".join(f"{temp_dir / name}\t/tmp/out.pdf\t{name}\t{ranges}\n" for name, ranges in (
+            ("small.py", ""), ("big.py", ""), ("image.bin", ""), ("big.py", "1-10,20-29"),
+        ))
+
+        entries = plan(io.StringIO(jobs), MODEL)
+        summary = summarize(entries, MODEL, top=1)
+
+        assert [entry["file"] for entry in entries] == ["small.py", "big.py", "big.py"]
+        assert entries[1] == {"file": "big.py", "bytes": 1200, "lines": 200, "pages": 4,
+                              "tokens": 300, "seconds": 2.5}
+        assert entries[2]["lines"] == 20
+        assert summary["top"] == [entries[1]]
+        assert summary["total"]["files"] == 3
+        assert summary["total"]["lines"] == 221
+        assert "Top offenders:" in format_table(summary)
@@ -0,0 +1,42 @@
+"""Test suite for the plan_volumes.py volume planner."""
+
+from plan_volumes import plan_volumes, format_contents
+
+
+def records(*specs):
+    return [{"file": path, "pdf": f"/tmp/{i}.pdf", "pages": pages}
+            for i, (path, pages) in enumerate(specs)]
+
+
+def pages(record):
+    return record["pages"]
+
+
+class TestPlanVolumes:
+    """Test cases for grouping per-file PDFs into volumes."""
+
+    def test_volumes_break_between_directories(self):
+        """Test that the files of a directory are kept in the same volume."""
+        volumes = plan_volumes(records(
+            ("a/one.py", 3), ("a/two.py", 3), ("b/one.py", 3), ("b/two.py", 3), ("c.py", 1)
+        ), 8, pages)
+
+        assert [[r["file"] for r in volume] for volume in volumes] == [
+            ["a/one.py", "a/two.py"], ["b/one.py", "b/two.py", "c.py"]
+        ]
+
+    def test_large_directory_is_split_between_files(self):
+        """Test that a directory above the limit fills volumes file by file."""
+        volumes = plan_volumes(records(
+            ("small.py", 2), ("big/1.py", 4), ("big/2.py", 4), ("big/3.py", 4), ("big/4.py", 20)
+        ), 10, pages)
+
+        assert [sum(pages(r) for r in volume) for volume in volumes] == [2, 8, 4, 20]
+
+    def test_contents_list_volume_of_each_file(self):
+        """Test that the master table of contents names the volume of every file."""
+        volumes = plan_volumes(records(("a/x.py", 5), ("b/y.py", 5)), 5, pages)
+        contents = format_contents(volumes, "merged")
+
+        assert "Volume 1: merged-01.pdf (1 files, 5 pages)\n    a/x.py" in contents
+        assert "Volume 2: merged-02.pdf (1 files, 5 pages)\n    b/y.py" in contents
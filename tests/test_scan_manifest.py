@@ -0,0 +1,61 @@
+"""Test suite for the persistent scan manifest (--scan-cache)."""
+
+import os
+from tests.conftest import run_command, create_test_files, read_output_file
+from scan_manifest import ScanFilters, scan
+
+FILES = {
+    "Makefile": "all:\n",
+    "src/main.py": "print('hello')\n",
+    "src/lib/util.js": "export const x = 1;\n",
+    "docs/notes.txt": "notes\n",
+    "node_modules/dep/index.js": "module.exports = {};\n",
+}
+
+
+def age_directories(root, timestamp=1_600_000_000):
+    """Date every directory back, as if the tree had not changed for a while."""
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (timestamp, timestamp))
+
+
+class TestScanManifest:
+    """Test cases for skipping unchanged directories when walking a tree."""
+
+    def test_only_changed_directories_listed(self, temp_dir):
+        """Test that a rescan lists only modified directories and finds the same files as a full walk."""
+        create_test_files(temp_dir, FILES)
+        age_directories(temp_dir)
+        filters = ScanFilters(ignore_folders=("node_modules",), ignore_types=("txt",))
+
+        paths, directories, listed = scan(temp_dir, filters)
+        assert paths == ["Makefile", "src/lib/util.js", "src/main.py"]
+        assert listed == 4
+
+        assert scan(temp_dir, filters, directories)[::2] == (paths, 0)
+
+        (temp_dir / "src" / "lib" / "extra.py").write_text("x = 1\n")
+        age_directories(temp_dir / "src" / "lib", 1_600_000_100)
+        paths, directories, listed = scan(temp_dir, filters, directories)
+        assert "src/lib/extra.py" in paths and listed == 1
+
+        changed = ScanFilters(ignore_folders=("node_modules",), include_types=("py",))
+        assert changed.fingerprint("code2txt") != filters.fingerprint("code2txt")
+        assert filters.fingerprint("code2pdf") != filters.fingerprint("code2txt")
+
+    def test_code2txt_scan_cache_matches_walk(self, code2txt_path, temp_dir, monkeypatch):
+        """Test that code2txt --scan-cache writes the same document on first and repeated runs."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(temp_dir / "cache"))
+        source = temp_dir / "src"
+        create_test_files(source, FILES)
+        outputs = [temp_dir / name for name in ("walk.txt", "first.txt", "again.txt")]
+
+        for output, options in zip(outputs, ([], ["--scan-cache"], ["--scan-cache"])):
+            returncode, _, stderr = run_command([str(code2txt_path), *options, "-o", str(output), str(source)])
+            assert returncode == 0, stderr
+
+        expected = read_output_file(outputs[0])
+        assert "src/main.py" in expected and "node_modules" not in expected
+        assert read_output_file(outputs[1]) == expected
+        assert read_output_file(outputs[2]) == expected
+        assert list((temp_dir / "cache" / "code2pdf" / "scans").glob("code2txt-*.json"))
@@ -0,0 +1,53 @@
+"""Test suite for the shard_jobs.py job selection."""
+
+import pytest
+from shard_jobs import assign_shards, job_list_hash, parse_shard
+
+
+def jobs(*sizes):
+    lines = [f"/src/f{i}.py\t/tmp/f{i}----py.pdf\tf{i}.py\t" for i in range(len(sizes))]
+    return lines, dict(zip(lines, sizes)).__getitem__
+
+
+class TestShardJobs:
+    """Test cases for splitting conversion jobs between shards."""
+
+    def test_every_job_once_and_balanced(self):
+        """Test that each job goes to one shard and shard sizes stay close."""
+        lines, size = jobs(900, 100, 400, 400, 300, 200, 200, 100)
+
+        assignment = assign_shards(lines, 3, size)
+
+        totals = [sum(size(line) for line, shard in zip(lines, assignment) if shard == number)
+                  for number in (1, 2, 3)]
+        assert len(assignment) == len(lines)
+        assert set(assignment) == {1, 2, 3}
+        assert sum(totals) == 2600
+        assert max(totals) - min(totals) <= 100
+
+    def test_assignment_is_deterministic(self):
+        """Test that the assignment does not depend on the order jobs were queued in."""
+        lines, size = jobs(5, 5, 5, 5, 3, 3)
+
+        forward = dict(zip(lines, assign_shards(lines, 4, size)))
+        backward = dict(zip(lines[::-1], assign_shards(lines[::-1], 4, size)))
+
+        assert forward == backward
+
+    def test_job_list_hash(self):
+        """Test that shards of one build agree on the job list hash, wherever they write, and others do not."""
+        lines, size = jobs(1, 2, 3)
+        elsewhere = [line.replace("\t/tmp/", "\t/mnt/build/") for line in lines]
+        _, edited = jobs(1, 2, 4)
+
+        assert job_list_hash(lines[::-1], size) == job_list_hash(lines, size)
+        assert job_list_hash(elsewhere, dict(zip(elsewhere, (1, 2, 3))).__getitem__) == job_list_hash(lines, size)
+        assert job_list_hash(lines[:2], size) != job_list_hash(lines, size)
+        assert job_list_hash(lines, edited) != job_list_hash(lines, size)
+
+    def test_parse_shard(self):
+        """Test that shards are numbered from 1 to N."""
+        assert parse_shard("2/4") == (2, 4)
+        for text in ("0/4", "5/4", "2", "a/b"):
+            with pytest.raises(ValueError):
+                parse_shard(text)
@@ -0,0 +1,50 @@
+"""Test suite for the selection rules and language names shared by all tools."""
+
+import re
+from tests.conftest import run_command, create_test_files, read_output_file
+from source_rules import DEFAULT_IGNORE_TYPES, DEFAULT_IGNORE_FOLDERS, language_for
+from code2pdf_api import scan, filter_files
+from scan_manifest import ScanFilters, scan as scan_tree
+
+FILES = {
+    "Dockerfile": "FROM scratch\n",
+    "Makefile": "all:\n",
+    "LICENSE": "MIT\n",
+    "analysis.R": "x <- 1\n",
+    "trailing.": "dot\n",
+    "notes.txt": "skipped\n",
+    "web/app.tsx": "export {};\n",
+    "web/style.sass": "a\n  color: red\n",
+    "lib/tool.cc": "int main() {}\n",
+    "lib/data.json": "{}\n",
+    "build/out.js": "skipped\n",
+    "node_modules/dep/index.js": "skipped\n",
+}
+
+
+class TestSourceRules:
+    """Test cases for keeping code2txt, the Python API and the scan manifest on one set of rules."""
+
+    def test_code2txt_uses_shared_defaults(self, code2txt_path):
+        """Test that code2txt's default filters are the ones in source_rules.py."""
+        returncode, stdout, _ = run_command([str(code2txt_path), "--help"])
+
+        assert returncode == 0
+        assert f"(default: {','.join(DEFAULT_IGNORE_TYPES)})" in stdout
+        assert f"(default: {','.join(DEFAULT_IGNORE_FOLDERS)})" in stdout
+
+    def test_tools_select_and_name_alike(self, code2txt_path, temp_dir):
+        """Test that code2txt, filter_files and the scan manifest pick the same files and languages."""
+        source = temp_dir / "src"
+        create_test_files(source, FILES)
+        output = temp_dir / "combined.txt"
+
+        returncode, _, stderr = run_command([str(code2txt_path), "-o", str(output), str(source)])
+        assert returncode == 0, stderr
+
+        sections = dict(re.findall(r"^## (.+)\n```(\w+)$", read_output_file(output), re.MULTILINE))
+        expected = filter_files(scan(source))
+        assert sorted(sections) == expected
+        assert sections == {path: language_for(path) for path in expected}
+        filters = ScanFilters(DEFAULT_IGNORE_FOLDERS, ignore_types=DEFAULT_IGNORE_TYPES)
+        assert scan_tree(source, filters)[0] == expected